@@ -0,0 +1,176 @@
+"""
+特徴量の数ごとの正解率と学習・推定の時間を比較する
+
+学習データで特徴量を順位付けし、上位 n 個の特徴量だけで学習・推定した結果を
+表にする. --save-subset を指定すると、--n-features 個の特徴量の部分集合を保存する.
+保存した部分集合は preprocess.py --features や pipeline.FEATURE_SUBSET_PATH で使う
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.feature_selection_report \\
+        --data-dir ./data/output/all/each_process2/features/segmentw120_segmentgap10 \\
+        --labels ./data/input/each_process/labels.csv \\
+        --counts 50 100 200 400 \\
+        --save-subset ./data/output/feature_subset.json --n-features 200
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.common.feature_store import FEATURE_STORE_SUFFIX, read_features
+from modules.common.labels import Labels
+from modules.estimation.evaluation import evaluate
+from modules.estimation.feature_selection import (
+    drop_redundant,
+    rank_features,
+    save_feature_subset,
+    select_features,
+)
+from modules.estimation.model import Model
+
+
+def load_split(data_dir: str, test_data_names: list[str]):
+    train_list: list[pd.DataFrame] = []
+    test_list: list[pd.DataFrame] = []
+
+    file_paths = glob.glob(os.path.join(data_dir, f"*{FEATURE_STORE_SUFFIX}"))
+    for file_path in sorted(file_paths):
+        data_name = os.path.basename(file_path)[: -len(FEATURE_STORE_SUFFIX)]
+        df = read_features(file_path)
+        if df.empty:
+            continue
+
+        if data_name in test_data_names:
+            test_list.append(df)
+        else:
+            train_list.append(df)
+
+    train = pd.concat(train_list, ignore_index=True)
+    test = pd.concat(test_list, ignore_index=True)
+
+    return (
+        train.drop("label", axis=1),
+        train["label"],
+        test.drop("label", axis=1),
+        test["label"],
+    )
+
+
+def measure(
+    model_type: str,
+    num_class: int,
+    feature_columns: list[str],
+    x_train: pd.DataFrame,
+    y_train: pd.Series,
+    x_test: pd.DataFrame,
+    y_test: pd.Series,
+    smooth_window_size: int,
+    k: int,
+):
+    clf = Model(model_type, num_class=num_class, feature_columns=feature_columns)
+
+    start = time.perf_counter()
+    clf.fit(x_train, y_train)
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pred, pred_proba = clf.predict_with_proba(x_test)
+    inference_time = time.perf_counter() - start
+
+    result = evaluate(pred_proba, y_test, [k], [smooth_window_size], pred=pred)
+    return {
+        "features": len(feature_columns),
+        "accuracy": result.accuracy,
+        "smoothed_accuracy": result.smoothed_accuracy[smooth_window_size],
+        f"top_{k}_accuracy": result.top_k_accuracy[k],
+        "train_time": train_time,
+        "inference_time": inference_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", type=str, required=True)
+    parser.add_argument("--labels", type=str, required=True)
+    parser.add_argument("--test", nargs="+", default=["4", "5"])
+    parser.add_argument(
+        "--model-type",
+        default="xgboost",
+        choices=["randomforest", "xgboost", "lightgbm"],
+    )
+    parser.add_argument(
+        "--method", default="importance", choices=["importance", "anova", "variance"]
+    )
+    parser.add_argument("--counts", type=int, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--smooth", type=int, default=36)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--output", type=str)
+    parser.add_argument("--save-subset", type=str)
+    parser.add_argument("--n-features", type=int)
+    args = parser.parse_args()
+
+    num_class = len(Labels(args.labels))
+    x_train, y_train, x_test, y_test = load_split(args.data_dir, args.test)
+
+    print(f"> Rank: {args.method}")
+    start = time.perf_counter()
+    ranking = rank_features(
+        x_train,
+        y_train,
+        method=args.method,
+        model=Model(args.model_type, num_class=num_class),
+    )
+    print(f">> {time.perf_counter() - start:.2f} s")
+
+    candidates = [
+        ("all", list(x_train.columns)),
+        ("without std", drop_redundant(list(x_train.columns))),
+    ] + [
+        (f"top {n}", select_features(ranking, n))
+        for n in sorted(set(args.counts))
+        if n < len(ranking)
+    ]
+
+    rows = []
+    for name, feature_columns in candidates:
+        print(f"> Measure: {name}")
+        row = measure(
+            args.model_type,
+            num_class,
+            feature_columns,
+            x_train,
+            y_train,
+            x_test,
+            y_test,
+            args.smooth,
+            args.top_k,
+        )
+        rows.append({"subset": name, **row})
+
+    report = pd.DataFrame(rows)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    if args.output is not None:
+        report.to_csv(args.output, index=False)
+        print(f">> Save: {args.output}")
+
+    if args.save_subset is not None:
+        n_features = args.n_features or len(ranking)
+        save_feature_subset(
+            args.save_subset,
+            select_features(ranking, n_features),
+            method=args.method,
+            model_type=args.model_type,
+            scores=[float(v) for v in np.asarray(ranking)[:n_features]],
+        )
+        print(f">> Save: {args.save_subset}")
+
+
+if __name__ == "__main__":
+    main()
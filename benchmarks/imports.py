@@ -0,0 +1,125 @@
+"""
+モジュールのインポートにかかる時間を計測する
+
+モジュールごとに新しいインタプリタを起動してインポートし, 時間 (repeat 回の最小値と中央値) と
+読み込まれた重いライブラリ (学習のバックエンド, matplotlib など) を表にする.
+推定だけを行う場合の modules.estimation.model は numpy の読み込みとほぼ同じ時間になる
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.imports --repeat 5
+    python -m benchmarks.imports modules.estimation.model --output ./imports.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+import pandas as pd
+
+# 比較の基準 (numpy だけ) と, このリポジトリのモジュール
+DEFAULT_MODULES = [
+    "numpy",
+    "modules.common.labels",
+    "modules.estimation.model_store",
+    "modules.estimation.model",
+    "modules.estimation.evaluation",
+    "modules.common.feature_store",
+    "preprocess",
+    "pipeline",
+    "train",
+]
+
+# 使うときに読み込むライブラリ
+HEAVY_MODULES = [
+    "pandas",
+    "scipy",
+    "sklearn",
+    "xgboost",
+    "lightgbm",
+    "matplotlib",
+    "japanize_matplotlib",
+]
+
+_MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": seconds, "heavy": heavy}}))
+"""
+
+
+def measure_import(module: str) -> dict:
+    """
+    新しいインタプリタでモジュールをインポートする時間を計測する
+
+    Parameters
+    ----------
+    module : str
+        モジュール名
+
+    Returns
+    -------
+    result : dict
+        seconds (インポートの時間) と heavy (読み込まれた重いライブラリ)
+    """
+
+    code = _MEASURE.format(statement=f"import {module}", heavy=HEAVY_MODULES)
+    # スクリプトがインポート時にコマンドライン引数を解析しないことも確かめる
+    output = subprocess.run(
+        [sys.executable, "-c", code, "--unknown-flag"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, help="結果を保存する JSON")
+    args = parser.parse_args()
+
+    rows = []
+    for module in args.modules:
+        print(f"> {module}")
+        results = [measure_import(module) for _ in range(args.repeat)]
+        milliseconds = [result["seconds"] * 1000 for result in results]
+        rows.append(
+            {
+                "module": module,
+                "best_ms": min(milliseconds),
+                "median_ms": statistics.median(milliseconds),
+                "heavy": ",".join(results[-1]["heavy"]),
+            }
+        )
+
+    report = pd.DataFrame(rows)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+
+    if args.output is not None:
+        content = {
+            "environment": {
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {"repeat": args.repeat},
+            "modules": rows,
+        }
+        with open(args.output, "w") as f:
+            json.dump(content, f, ensure_ascii=False, indent=2)
+        print(f">> Save: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+前処理から評価・描画までの各段階を個別に計測する
+
+合成データ (benchmarks.synthetic) または既存の入力ディレクトリを使い,
+段階ごとに時間, スループット (モーションのフレーム数 / 秒), ピークメモリを表にする.
+--output で保存した結果を --baseline に渡すと, 段階ごとの時間の比を表示する
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.stages --count 4 --minutes 10 --output ./baseline.json
+    python -m benchmarks.stages --count 4 --minutes 10 --baseline ./baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot as plt
+
+import preprocess
+from benchmarks.synthetic import DEFAULT_LABELS_PATH, FRAME_RATE, generate_dataset
+from modules.common.bvh import parse_bvh, to_motion_df
+from modules.common.feature_store import read_features, write_features
+from modules.common.labels import Labels, label_timeline
+from modules.common.plotting import plot_result
+from modules.estimation.evaluation import evaluate
+from modules.estimation.model import Model
+from modules.estimation.smoothing import smooth_result
+
+BENCHMARK_VERSION = 1
+
+
+class StageTimer:
+    """
+    段階ごとに時間とピークメモリを計測する
+
+    時間は repeat 回の最小値. ピークメモリは tracemalloc を有効にした別の1回で計測する
+    (tracemalloc は計測中の処理を遅くするため, 時間の計測とは分ける)
+
+    Parameters
+    ----------
+    repeat : int
+        時間を計測する回数
+    memory : bool
+        ピークメモリを計測するかどうか
+    """
+
+    def __init__(self, repeat=1, memory=True):
+        self.repeat = repeat
+        self.memory = memory
+        self.rows: list[dict] = []
+
+    def run(self, stage: str, fn, frames):
+        """
+        fn を実行して計測する
+
+        Parameters
+        ----------
+        stage : str
+            段階の名前
+        fn : Callable[[], Any]
+            計測する処理
+        frames : int | Callable[[Any], int]
+            処理したモーションのフレーム数 (スループットの計算に使う).
+            関数の場合は fn の返り値から求める
+
+        Returns
+        -------
+        result : Any
+            fn の返り値
+        """
+
+        print(f"> {stage}")
+        seconds = []
+        for _ in range(self.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            result = fn()
+            seconds.append(time.perf_counter() - start)
+
+        peak_mb = None
+        if self.memory:
+            del result
+            gc.collect()
+            tracemalloc.start()
+            try:
+                result = fn()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peak_mb = peak / 2**20
+
+        if callable(frames):
+            frames = frames(result)
+
+        best = min(seconds)
+        self.rows.append(
+            {
+                "stage": stage,
+                "seconds": best,
+                "frames": frames,
+                "fps": frames / best if best > 0 else float("inf"),
+                "peak_mb": peak_mb,
+            }
+        )
+        return result
+
+
+def run_stages(
+    input_dir: str,
+    work_dir: str,
+    timer: StageTimer,
+    window_size_frame: int,
+    gap_size_frame: int,
+    smooth_window_size: int,
+    model_types: list[str],
+):
+    labels = Labels(os.path.join(input_dir, "labels.csv"))
+    data_files_list = sorted(
+        preprocess.get_data_files(input_dir), key=lambda d: int(d["name"])
+    )
+    if len(data_files_list) < 2:
+        raise ValueError("at least 2 recordings are required")
+
+    # モーションの読み込み
+    parsed = timer.run(
+        "bvh_parse",
+        lambda: [parse_bvh(data_files["motion"]) for data_files in data_files_list],
+        frames=lambda parsed: sum(len(values) for values, _, _ in parsed),
+    )
+    total_frames = timer.rows[-1]["frames"]
+
+    tricks_list = []
+    for data_files in data_files_list:
+        with open(data_files["label"]) as f:
+            tricks_list.append(json.load(f)[0]["tricks"])
+
+    # ラベルの付与
+    timelines = timer.run(
+        "label_paint",
+        lambda: [
+            label_timeline(tricks, labels, len(values), 1 / frame_time)
+            for tricks, (values, _, frame_time) in zip(tricks_list, parsed)
+        ],
+        frames=total_frames,
+    )
+
+    motion_dfs = []
+    for (values, columns, frame_time), timeline in zip(parsed, timelines):
+        motion_df = to_motion_df(values, columns, frame_time)
+        motion_df["label"] = timeline
+        motion_dfs.append(motion_df)
+    del parsed
+
+    timer.run(
+        "split_motion_by_label",
+        lambda: [preprocess.split_motion_by_label(df, labels) for df in motion_dfs],
+        frames=total_frames,
+    )
+
+    # 特徴量の抽出
+    feature_dfs = timer.run(
+        "feature_extraction",
+        lambda: [
+            preprocess.extract_features(df, window_size_frame, gap_size_frame)
+            for df in motion_dfs
+        ],
+        frames=total_frames,
+    )
+    del motion_dfs
+
+    # 特徴量の入出力
+    features = pd.concat(feature_dfs, ignore_index=True)
+    csv_path = os.path.join(work_dir, "features.csv")
+    store_path = os.path.join(work_dir, "features.features")
+    timer.run(
+        "csv_write",
+        lambda: preprocess.export_csv(features, csv_path),
+        frames=total_frames,
+    )
+    timer.run("csv_read", lambda: pd.read_csv(csv_path), frames=total_frames)
+    timer.run(
+        "store_write", lambda: write_features([features], store_path), total_frames
+    )
+    timer.run(
+        "store_read",
+        lambda: read_features(store_path, mmap=False),
+        frames=total_frames,
+    )
+
+    # 最後の収録をテストデータにして学習・推定する
+    train = pd.concat(feature_dfs[:-1], ignore_index=True)
+    test = feature_dfs[-1]
+    x_train, y_train = train.drop("label", axis=1), train["label"]
+    x_test, y_test = test.drop("label", axis=1), test["label"]
+    train_frames = len(x_train) * gap_size_frame
+    test_frames = len(x_test) * gap_size_frame
+
+    pred = pred_proba = None
+    for model_type in model_types:
+        clf = Model(model_type, num_class=len(labels))
+        timer.run(f"fit_{model_type}", lambda: clf.fit(x_train, y_train), train_frames)
+        pred, pred_proba = timer.run(
+            f"predict_{model_type}",
+            lambda: clf.predict_with_proba(x_test),
+            frames=test_frames,
+        )
+
+    # スムージング・評価・描画は最後のモデルの推定結果で行う
+    smooth_window = int(smooth_window_size / gap_size_frame)
+    timer.run(
+        "smoothing",
+        lambda: smooth_result(pred_proba, smooth_window),
+        frames=test_frames,
+    )
+    timer.run(
+        "evaluation",
+        lambda: evaluate(pred_proba, y_test, [3], [smooth_window], pred=pred),
+        frames=test_frames,
+    )
+
+    def plot():
+        plot_result(y_test, pred, labels, os.path.join(work_dir, "result.png"))
+        plt.close("all")
+
+    timer.run("plotting", plot, frames=test_frames)
+
+
+def compare(rows: list[dict], baseline: dict, tolerance: float) -> pd.DataFrame:
+    """
+    ベースラインとのスループットの比 (1 より小さいと遅くなった)
+
+    データの長さが違っても比べられるように, 時間ではなくフレーム数 / 秒で比べる
+    """
+
+    baseline_fps = {row["stage"]: row["fps"] for row in baseline["stages"]}
+    comparison = []
+    for row in rows:
+        base = baseline_fps.get(row["stage"])
+        speedup = None if not base else row["fps"] / base
+        if speedup is None:
+            status = "new"
+        elif speedup < 1 - tolerance:
+            status = "slower"
+        elif speedup > 1 + tolerance:
+            status = "faster"
+        else:
+            status = "same"
+
+        comparison.append(
+            {
+                "stage": row["stage"],
+                "baseline_fps": base,
+                "fps": row["fps"],
+                "speedup": speedup,
+                "status": status,
+            }
+        )
+
+    return pd.DataFrame(comparison)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input",
+        type=str,
+        help="既存の入力ディレクトリ (省略すると合成データを生成する)",
+    )
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--labels", type=str, default=DEFAULT_LABELS_PATH)
+    parser.add_argument("--window", type=int, default=120)
+    parser.add_argument("--gap", type=int, default=10)
+    parser.add_argument("--smooth", type=int, default=360)
+    parser.add_argument(
+        "--model-types",
+        nargs="+",
+        default=["randomforest", "xgboost", "lightgbm"],
+        choices=["randomforest", "xgboost", "lightgbm"],
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", type=str, help="結果を保存する JSON")
+    parser.add_argument("--baseline", type=str, help="比較するベースラインの JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    timer = StageTimer(repeat=args.repeat, memory=not args.no_memory)
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = args.input
+        if input_dir is None:
+            input_dir = os.path.join(work_dir, "input")
+            frames = int(args.minutes * 60 * FRAME_RATE)
+            print(f"> Generate: {args.count} recordings x {frames} frames")
+            generate_dataset(input_dir, args.count, frames, labels_path=args.labels)
+
+        run_stages(
+            input_dir,
+            work_dir,
+            timer,
+            args.window,
+            args.gap,
+            args.smooth,
+            args.model_types,
+        )
+
+    report = pd.DataFrame(timer.rows)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(timer.rows, baseline, args.tolerance)
+        print(f"\n> Compare: {args.baseline}")
+        for key in ("count", "minutes", "window", "gap", "smooth"):
+            if baseline["config"].get(key) != getattr(args, key):
+                print(f"  (config differs: {key}={baseline['config'].get(key)})")
+        print(comparison.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    if args.output is not None:
+        content = {
+            "version": BENCHMARK_VERSION,
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "baseline")
+            },
+            "stages": timer.rows,
+        }
+        with open(args.output, "w") as f:
+            json.dump(content, f, ensure_ascii=False, indent=2)
+        print(f">> Save: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
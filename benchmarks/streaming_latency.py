@@ -0,0 +1,114 @@
+"""
+StreamingEstimator の1フレームあたりのレイテンシを計測する
+
+バッチの前処理と推定との一致は tests/test_streaming.py で確認する
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.streaming_latency --frames 6000 --model-type xgboost
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.estimation.model import Model
+from modules.estimation.streaming import StreamingEstimator
+from modules.feature.streaming import StreamingWindowFeatures
+from modules.feature.window import extract_window_features
+
+
+def random_motion(n_frames: int, n_channels: int, seed=0):
+    # ランダムウォークのモーション
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(size=(n_frames, n_channels)), axis=0)
+
+
+def percentiles(latencies: list[float]):
+    latencies_ms = np.array(latencies) * 1000
+    return (
+        ", ".join(
+            f"p{p}: {np.percentile(latencies_ms, p):.3f} ms" for p in [50, 95, 99]
+        )
+        + f", max: {latencies_ms.max():.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=6000)
+    parser.add_argument("--channels", type=int, default=27 * 6)
+    parser.add_argument("--window", type=int, default=120)
+    parser.add_argument("--gap", type=int, default=10)
+    parser.add_argument("--smooth", type=int, default=36)
+    parser.add_argument("--num-class", type=int, default=10)
+    parser.add_argument(
+        "--model-type",
+        default="xgboost",
+        choices=["randomforest", "xgboost", "lightgbm"],
+    )
+    args = parser.parse_args()
+
+    frame_time = 1 / 60
+    columns = [f"ch{i}" for i in range(args.channels)]
+    motion = random_motion(args.frames, args.channels)
+
+    # バッチの前処理の特徴量でモデルを学習する
+    values = np.column_stack([np.arange(args.frames) * frame_time, motion])
+    features, _ = extract_window_features(
+        values, np.zeros(args.frames, dtype=np.int64), args.window, args.gap
+    )
+    rng = np.random.default_rng(1)
+    labels = np.arange(len(features)) % args.num_class
+    rng.shuffle(labels)
+
+    estimator = StreamingEstimator(
+        Model(args.model_type, num_class=args.num_class),
+        columns,
+        args.window,
+        args.gap,
+        args.smooth,
+        frame_time,
+        args.num_class,
+    )
+    x = pd.DataFrame(features, columns=estimator.feature_columns)
+    estimator.model.fit(x, labels)
+
+    # 特徴量のみ. ブロックが埋まるフレームは後方の統計量を求めるため別に集計する
+    stream_features = StreamingWindowFeatures(values.shape[1], args.window, args.gap)
+    feature_latencies = []
+    block_latencies = []
+    for i, row in enumerate(values):
+        start = time.perf_counter()
+        stream_features.push(row)
+        elapsed = time.perf_counter() - start
+
+        if i % stream_features.length == stream_features.length - 1:
+            block_latencies.append(elapsed)
+        else:
+            feature_latencies.append(elapsed)
+
+    # 特徴量の更新と推定
+    frame_latencies = []
+    estimate_latencies = []
+    for frame in motion:
+        start = time.perf_counter()
+        result = estimator.push(frame)
+        elapsed = time.perf_counter() - start
+
+        if result is None:
+            frame_latencies.append(elapsed)
+        else:
+            estimate_latencies.append(elapsed)
+
+    print(f"frames: {args.frames}, estimates: {len(estimate_latencies)}")
+    print(f"features only: {percentiles(feature_latencies)}")
+    print(f"features only (block close): {percentiles(block_latencies)}")
+    print(f"frame without estimate: {percentiles(frame_latencies)}")
+    print(f"frame with estimate: {percentiles(estimate_latencies)}")
+
+
+if __name__ == "__main__":
+    main()
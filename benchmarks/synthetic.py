@@ -0,0 +1,257 @@
+"""
+ベンチマーク用の合成データ (motion.bvh と label.json) を生成する
+
+スケルトンは mocopi と同じ 27 関節の階層で, すべての関節が 6 チャンネルを持つ.
+動作ごとに関節の振動の振幅と周波数を変えるため, 学習すると偶然より高い精度になる
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.synthetic --output ./data/input/synthetic \\
+        --count 4 --minutes 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+FRAME_RATE = 60
+CHANNELS = [
+    "Xposition",
+    "Yposition",
+    "Zposition",
+    "Zrotation",
+    "Xrotation",
+    "Yrotation",
+]
+
+# (関節, 親の関節, 親からのオフセット [m])
+MOCOPI_JOINTS: list[tuple[str, str | None, tuple[float, float, float]]] = [
+    ("root", None, (0.0, 0.9, 0.0)),
+    ("torso_1", "root", (0.0, 0.05, 0.0)),
+    ("torso_2", "torso_1", (0.0, 0.05, 0.0)),
+    ("torso_3", "torso_2", (0.0, 0.05, 0.0)),
+    ("torso_4", "torso_3", (0.0, 0.05, 0.0)),
+    ("torso_5", "torso_4", (0.0, 0.05, 0.0)),
+    ("torso_6", "torso_5", (0.0, 0.05, 0.0)),
+    ("torso_7", "torso_6", (0.0, 0.05, 0.0)),
+    ("neck_1", "torso_7", (0.0, 0.05, 0.0)),
+    ("neck_2", "neck_1", (0.0, 0.05, 0.0)),
+    ("head", "neck_2", (0.0, 0.1, 0.0)),
+    ("l_shoulder", "torso_7", (0.05, 0.03, 0.0)),
+    ("l_up_arm", "l_shoulder", (0.12, 0.0, 0.0)),
+    ("l_low_arm", "l_up_arm", (0.28, 0.0, 0.0)),
+    ("l_hand", "l_low_arm", (0.25, 0.0, 0.0)),
+    ("r_shoulder", "torso_7", (-0.05, 0.03, 0.0)),
+    ("r_up_arm", "r_shoulder", (-0.12, 0.0, 0.0)),
+    ("r_low_arm", "r_up_arm", (-0.28, 0.0, 0.0)),
+    ("r_hand", "r_low_arm", (-0.25, 0.0, 0.0)),
+    ("l_up_leg", "root", (0.1, -0.05, 0.0)),
+    ("l_low_leg", "l_up_leg", (0.0, -0.4, 0.0)),
+    ("l_foot", "l_low_leg", (0.0, -0.4, 0.0)),
+    ("l_toes", "l_foot", (0.0, -0.05, 0.12)),
+    ("r_up_leg", "root", (-0.1, -0.05, 0.0)),
+    ("r_low_leg", "r_up_leg", (0.0, -0.4, 0.0)),
+    ("r_foot", "r_low_leg", (0.0, -0.4, 0.0)),
+    ("r_toes", "r_foot", (0.0, -0.05, 0.12)),
+]
+
+DEFAULT_LABELS_PATH = "./data/input/each_process/labels.csv"
+
+# 一度に書き出すフレーム数
+_WRITE_CHUNK_FRAMES = 10000
+
+
+def bvh_hierarchy() -> list[str]:
+    """
+    MOCOPI_JOINTS の HIERARCHY 部分の行
+    """
+
+    children: dict[str | None, list[str]] = {}
+    offsets = {}
+    for joint, parent, offset in MOCOPI_JOINTS:
+        children.setdefault(parent, []).append(joint)
+        offsets[joint] = offset
+
+    lines = ["HIERARCHY"]
+
+    def append_joint(joint: str, depth: int):
+        indent = "\t" * depth
+        keyword = "ROOT" if depth == 0 else "JOINT"
+        lines.append(f"{indent}{keyword} {joint}")
+        lines.append(f"{indent}{{")
+        lines.append(f"{indent}\tOFFSET {' '.join(f'{v:.6f}' for v in offsets[joint])}")
+        lines.append(f"{indent}\tCHANNELS {len(CHANNELS)} {' '.join(CHANNELS)}")
+        if joint in children:
+            for child in children[joint]:
+                append_joint(child, depth + 1)
+        else:
+            lines.append(f"{indent}\tEnd Site")
+            lines.append(f"{indent}\t{{")
+            lines.append(f"{indent}\t\tOFFSET 0.000000 0.050000 0.000000")
+            lines.append(f"{indent}\t}}")
+        lines.append(f"{indent}}}")
+
+    append_joint(children[None][0], 0)
+    return lines
+
+
+def generate_tricks(
+    duration: float, label_names: list[str], rng: np.random.Generator
+) -> list[dict]:
+    """
+    label.json の tricks (動作の区間) を生成する. 区間の間にはラベルのない時間がある
+    """
+
+    tricks = []
+    time = 0.0
+    while True:
+        start = time + rng.uniform(0.5, 3.0)
+        end = start + rng.uniform(2.0, 12.0)
+        if end >= duration:
+            break
+
+        label = label_names[rng.integers(len(label_names))]
+        tricks.append({"start": start, "end": end, "channel": 0, "labels": [label]})
+        time = end
+
+    return tricks
+
+
+def frame_label_index(
+    tricks: list[dict], label_names: list[str], frames: int
+) -> np.ndarray:
+    """
+    フレームごとの label_names のインデックス (区間外は len(label_names))
+    """
+
+    index = np.full(frames, len(label_names), dtype=np.int64)
+    label_index = {label: i for i, label in enumerate(label_names)}
+    for trick in tricks:
+        start = int(trick["start"] * FRAME_RATE)
+        end = min(int(trick["end"] * FRAME_RATE) + 1, frames)
+        index[start:end] = label_index[trick["labels"][0]]
+
+    return index
+
+
+def write_recording(
+    output_dir: str, frames: int, label_names: list[str], seed: int = 0
+):
+    """
+    1つの収録 (motion.bvh と label.json) を生成する
+
+    Parameters
+    ----------
+    output_dir : str
+        出力するディレクトリ
+    frames : int
+        フレーム数
+    label_names : list[str]
+        使うラベル名
+    seed : int
+        乱数のシード
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_channels = len(MOCOPI_JOINTS) * len(CHANNELS)
+
+    tricks = generate_tricks(frames / FRAME_RATE, label_names, rng)
+    label_index = frame_label_index(tricks, label_names, frames)
+
+    # ラベルごとの振動の振幅と周波数 (すべての収録で同じにする)
+    label_rng = np.random.default_rng(len(label_names))
+    amplitudes = label_rng.uniform(0.0, 5.0, size=(len(label_names) + 1, n_channels))
+    frequencies = label_rng.uniform(0.2, 2.0, size=(len(label_names) + 1, n_channels))
+    phases = rng.uniform(0.0, 2 * np.pi, size=n_channels)
+
+    with open(os.path.join(output_dir, "motion.bvh"), "w") as f:
+        f.write("\n".join(bvh_hierarchy()) + "\n")
+        f.write(f"MOTION\nFrames: {frames}\nFrame Time: {1 / FRAME_RATE:.7f}\n")
+
+        drift = np.zeros(n_channels)
+        for start in range(0, frames, _WRITE_CHUNK_FRAMES):
+            end = min(start + _WRITE_CHUNK_FRAMES, frames)
+            t = np.arange(start, end)[:, np.newaxis] / FRAME_RATE
+            labels = label_index[start:end]
+
+            walk = drift + np.cumsum(
+                rng.normal(0.0, 0.01, (end - start, n_channels)), 0
+            )
+            drift = walk[-1]
+            values = walk + amplitudes[labels] * np.sin(
+                2 * np.pi * frequencies[labels] * t + phases
+            )
+            np.savetxt(f, values, fmt="%.6f")
+
+    with open(os.path.join(output_dir, "label.json"), "w") as f:
+        json.dump([{"id": 1, "tricks": tricks}], f, ensure_ascii=False)
+
+
+def generate_dataset(
+    output_dir: str,
+    count: int,
+    frames: int,
+    labels_path: str = DEFAULT_LABELS_PATH,
+    first_name: int = 4,
+    seed: int = 0,
+) -> list[str]:
+    """
+    get_data_files で読み込める形式の合成データを生成する
+
+    Parameters
+    ----------
+    output_dir : str
+        出力するディレクトリ (labels.csv と収録ごとのディレクトリを作る)
+    count : int
+        収録の数
+    frames : int
+        収録ごとのフレーム数
+    labels_path : str
+        使うラベルの labels.csv
+    first_name : int
+        最初の収録のディレクトリ名 (連番)
+    seed : int
+        乱数のシード
+
+    Returns
+    -------
+    names : list[str]
+        生成した収録名
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    shutil.copyfile(labels_path, os.path.join(output_dir, "labels.csv"))
+    with open(labels_path) as f:
+        label_names = [line.strip() for line in f if line.strip()]
+
+    names = [str(first_name + i) for i in range(count)]
+    for i, name in enumerate(names):
+        write_recording(
+            os.path.join(output_dir, name), frames, label_names, seed=seed + i
+        )
+
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, required=True)
+    parser.add_argument("--count", type=int, default=4)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--labels", type=str, default=DEFAULT_LABELS_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    frames = int(args.minutes * 60 * FRAME_RATE)
+    names = generate_dataset(
+        args.output, args.count, frames, labels_path=args.labels, seed=args.seed
+    )
+    print(f">> Generate: {len(names)} recordings x {frames} frames in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
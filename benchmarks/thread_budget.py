@@ -0,0 +1,119 @@
+"""
+学習・推定のジョブを並列に実行するときのプロセス数とスレッド数の分け方を比較する
+
+pipeline.main のグリッドと同じく (モデル, テストデータ) ごとに学習・推定するジョブを,
+プロセス数 × スレッド数 がコア数になるすべての分け方で実行し, 時間を表にする
+
+使い方 (リポジトリのルートで実行する)::
+
+    python -m benchmarks.thread_budget \\
+        --data-dir ./data/output/all/each_process2/features/segmentw120_segmentgap10 \\
+        --labels ./data/input/each_process/labels.csv \\
+        --model-types randomforest xgboost lightgbm --test 4,5 6,7
+"""
+
+import argparse
+import time
+from functools import partial
+
+import pandas as pd
+
+from benchmarks.feature_selection_report import load_split
+from modules.common.labels import Labels
+from modules.common.parallel import ordered_map
+from modules.common.threads import available_cpus, limit_threads
+from modules.estimation.model import Model
+
+
+def run_job(job: tuple[str, list[str]], data_dir: str, num_class: int, threads: int):
+    model_type, test_data_names = job
+    x_train, y_train, x_test, _ = load_split(data_dir, test_data_names)
+
+    start = time.perf_counter()
+    clf = Model(model_type, num_class=num_class, n_jobs=threads)
+    clf.fit(x_train, y_train)
+    clf.predict_with_proba(x_test)
+
+    return time.perf_counter() - start
+
+
+def splits(total: int):
+    """
+    プロセス数 × スレッド数 = total となる分け方
+    """
+
+    return [(workers, total // workers) for workers in range(1, total + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", type=str, required=True)
+    parser.add_argument("--labels", type=str, required=True)
+    parser.add_argument(
+        "--model-types",
+        nargs="+",
+        default=["randomforest", "xgboost", "lightgbm"],
+        choices=["randomforest", "xgboost", "lightgbm"],
+    )
+    parser.add_argument(
+        "--test", nargs="+", default=["4,5"], help="カンマ区切りのテストデータ名"
+    )
+    parser.add_argument("--cpus", type=int, default=available_cpus())
+    parser.add_argument("--output", type=str)
+    args = parser.parse_args()
+
+    num_class = len(Labels(args.labels))
+    jobs = [
+        (model_type, names.split(","))
+        for model_type in args.model_types
+        for names in args.test
+    ]
+
+    rows = []
+    for workers, threads in splits(args.cpus):
+        if workers > len(jobs):
+            break
+
+        print(f"> workers: {workers}, threads: {threads}")
+        if workers == 1:
+            limit_threads(threads)
+
+        start = time.perf_counter()
+        job_times = list(
+            ordered_map(
+                partial(
+                    run_job,
+                    data_dir=args.data_dir,
+                    num_class=num_class,
+                    threads=threads,
+                ),
+                jobs,
+                workers=workers,
+                threads=threads,
+            )
+        )
+        rows.append(
+            {
+                "workers": workers,
+                "threads": threads,
+                "jobs": len(jobs),
+                "wall_time": time.perf_counter() - start,
+                "job_time_sum": sum(job_times),
+                "job_time_max": max(job_times),
+            }
+        )
+
+    report = pd.DataFrame(rows)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+    best = report.loc[report["wall_time"].idxmin()]
+    print(f">> Best: workers={int(best['workers'])}, threads={int(best['threads'])}")
+
+    if args.output is not None:
+        report.to_csv(args.output, index=False)
+        print(f">> Save: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,23 @@
+import argparse
 import os
 import glob
 
+import pandas as pd
+
+from modules.estimation.results_store import RESULTS_DB_FILE, ResultsStore
+
 OUTPUT_BASE_DIR = "./data/output/all/each_process2"
 
+# 古い結果ファイルの指標名 (綴りの誤りを含む) からデータベースの指標名への対応
+LEGACY_METRICS = {
+    "accuracy": "accuracy",
+    "smoothed_accurary": "smoothed_accuracy",
+    "top_k_accurary": "top_k_accuracy",
+}
+
 
 def get_result_files(output_dir: str):
-    return glob.glob(os.path.join(output_dir, "**/result_4_5.txt"))
+    return glob.glob(os.path.join(output_dir, "**/result_*.txt"))
 
 
 def get_data(file_path: str):
@@ -13,9 +25,12 @@ def get_data(file_path: str):
 
     basename = os.path.basename(os.path.dirname(file_path))
     metadata["model"] = basename.split("_")[0]
-    metadata["segment_window_size"] = int(basename.split("segmentw")[1].split("_")[0])
-    metadata["segment_gap_size"] = int(basename.split("segmentgap")[1].split("_")[0])
-    metadata["smooth_window_size"] = int(basename.split("smoothw")[1].split("_")[0])
+    metadata["segment_w"] = int(basename.split("segmentw")[1].split("_")[0])
+    metadata["segment_gap"] = int(basename.split("segmentgap")[1].split("_")[0])
+    metadata["smooth_w"] = int(basename.split("smoothw")[1].split("_")[0])
+    metadata["fold"] = os.path.splitext(os.path.basename(file_path))[0][
+        len("result_") :
+    ]
 
     with open(file_path, "r") as f:
         lines = f.readlines()
@@ -23,85 +38,96 @@ def get_data(file_path: str):
             key_, value_ = line.split(":")
             key = key_.strip()
             value = value_.strip()
-            metadata[key] = float(value)
+            metadata[LEGACY_METRICS.get(key, key)] = float(value)
 
     return metadata
 
 
-def group_by(data_list: list[dict[str, str | float]], key="model"):
-    grouped_data: dict[str | float, list[dict[str, str | float]]] = {}
-    for data in data_list:
-        model = data[key]
-        if model not in grouped_data:
-            grouped_data[model] = []
-        grouped_data[model].append(data)
+def import_result_files(store: ResultsStore, output_dir: str) -> int:
+    """
+    データベースがなかったときの結果ファイル (result_<fold>.txt) をデータベースに書き込む
 
-    return grouped_data
+    Returns
+    -------
+    count : int
+        読み込んだ結果ファイルの数
+    """
+
+    data_list = [get_data(file_path) for file_path in get_result_files(output_dir)]
+    store.write(data_list)
+    return len(data_list)
 
 
 def to_table(
-    data: dict[str, str | float],
-    row="segment_window_size",
-    column="smooth_window_size",
-    value="smoothed_accurary",
-):
-    column_values: list[str | float] = sorted(set([d[column] for d in data]))
-    column_values.insert(0, "")
-    table: list[list[str | float]] = [column_values]
-    for row_value in sorted(set([d[row] for d in data])):
-        row_data: list[str | float] = [row_value]
-        for column_value in sorted(set([d[column] for d in data])):
-            filtered_data = [
-                d for d in data if d[row] == row_value and d[column] == column_value
-            ]
-            if len(filtered_data) == 0:
-                row_data.append("N/A")
-            else:
-                row_data.append(filtered_data[0][value])
-        table.append(row_data)
-
-    return table
-
-
-def main():
-    result_files = get_result_files(OUTPUT_BASE_DIR)
-    data_list = [get_data(file_path) for file_path in result_files]
-
-    grouped_data = group_by(data_list, key="model")
-    for model, data in grouped_data.items():
-        print(f"\n== {model} ==")
-        table = to_table(data, value="smoothed_accurary")
-        # table = to_table(data, value="top_k_accurary")
-
-        cols = ", ".join([f'"{row / 60}s"' for row in table[0][1:]])
-        rows = ", ".join([f'"{row[0] / 60}s"' for row in table[1:]])
-        cells = ",\n".join(
-            [
-                f"({c})"
-                for c in [
-                    ", ".join(
-                        [
-                            f"[{cell:.3f}]" if type(cell) != str else f'"{cell}"'
-                            for cell in row[1:]
-                        ]
-                    )
-                    for row in table[1:]
-                ]
-            ]
-        )
-        print(
-            f"""
+    store: ResultsStore,
+    row="segment_w",
+    column="smooth_w",
+    value="smoothed_accuracy",
+    **filters,
+) -> dict[str, pd.DataFrame]:
+    """
+    モデルごとに row × column の指標の表を作る (複数のフォールドは平均する)
+    """
+
+    return store.pivot(value, index=row, columns=column, by="model", **filters)
+
+
+def print_table(table: pd.DataFrame):
+    cols = ", ".join([f'"{column / 60}s"' for column in table.columns])
+    rows = ", ".join([f'"{row / 60}s"' for row in table.index])
+    cells = ",\n".join(
+        "("
+        + ", ".join('"N/A"' if pd.isna(cell) else f"[{cell:.3f}]" for cell in values)
+        + ")"
+        for values in table.to_numpy()
+    )
+    print(f"""
 cols: ({cols}),
 rows: ({rows}),
-cells: ({cells}),"""
+cells: ({cells}),""")
+
+    print()
+    print(table.to_csv(na_rep="N/A"), end="")
+
+
+def main(output_dir=OUTPUT_BASE_DIR, metric="smoothed_accuracy", fold=None):
+    filters = {} if fold is None else {"fold": fold}
+    db_path = os.path.join(output_dir, RESULTS_DB_FILE)
+    # ResultsStore は存在しないデータベースを作るため, 先に確認する
+    if not os.path.exists(db_path):
+        print(
+            f"results db not found: {db_path} "
+            "(run pipeline.py, or use --import-files to import result_<fold>.txt)"
         )
+        return
+
+    with ResultsStore(db_path) as store:
+        if metric not in store.metrics():
+            print(f"metric not found: {metric} (available: {store.metrics()})")
+            return
 
-        print()
-        for row in table:
-            for cell in row:
-                print(cell, end=",")
-            print()
+        tables = to_table(store, value=metric, **filters)
+        for model, table in tables.items():
+            print(f"\n== {model} ==")
+            print_table(table)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-dir", type=str, default=OUTPUT_BASE_DIR)
+    parser.add_argument("--metric", type=str, default="smoothed_accuracy")
+    # parser.add_argument("--metric", type=str, default="top_k_accuracy")
+    parser.add_argument("--fold", type=str, help="フォールド (省略すると平均する)")
+    parser.add_argument(
+        "--import-files",
+        action="store_true",
+        help="結果ファイル (result_<fold>.txt) をデータベースに取り込む",
+    )
+    args = parser.parse_args()
+
+    if args.import_files:
+        with ResultsStore(os.path.join(args.output_dir, RESULTS_DB_FILE)) as store:
+            count = import_result_files(store, args.output_dir)
+        print(f">> Import: {count} result files")
+
+    main(args.output_dir, args.metric, args.fold)
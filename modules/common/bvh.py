@@ -0,0 +1,347 @@
+from itertools import islice
+import time
+from typing import Iterator, TextIO
+
+import numpy as np
+import pandas as pd
+
+# MOTION 部を一度に変換する行数
+BVH_CHUNK_ROWS = 8192
+
+
+class BVHHeader:
+    """
+    BVH ファイルの HIERARCHY 部と MOTION 部のヘッダ
+    """
+
+    def __init__(
+        self,
+        joints: list[str],
+        channels: dict[str, list[str]],
+        frames: int | None,
+        frame_time: float,
+    ):
+        self.joints = joints
+        self.channels = channels
+        self.frames = frames
+        self.frame_time = frame_time
+
+    @property
+    def columns(self) -> list[str]:
+        """
+        列名 (BVHparser.get_channels() と同じ並び)
+        """
+
+        return [f"{j}_{c}" for j in self.joints for c in self.channels[j]]
+
+    def select_columns(
+        self, joints: list[str] | None = None, channels: list[str] | None = None
+    ) -> list[str]:
+        """
+        指定した関節・チャンネルの列名を取得する
+
+        Parameters
+        ----------
+        joints : list[str], optional
+            関節名. None の場合はすべての関節
+        channels : list[str], optional
+            チャンネル名 (Xposition など). None の場合はすべてのチャンネル
+
+        Returns
+        -------
+        columns : list[str]
+            列名
+        """
+
+        return [
+            f"{j}_{c}"
+            for j in self.joints
+            for c in self.channels[j]
+            if (joints is None or j in joints) and (channels is None or c in channels)
+        ]
+
+
+def parse_hierarchy(tokens: list[str]):
+    """
+    HIERARCHY 部のトークンから関節とチャンネルを取得する
+
+    Parameters
+    ----------
+    tokens : list[str]
+        HIERARCHY 部のトークン
+
+    Returns
+    -------
+    joints : list[str]
+        関節名 (出現順)
+    channels : dict[str, list[str]]
+        関節ごとのチャンネル名
+    """
+
+    joints: list[str] = []
+    channels: dict[str, list[str]] = {}
+    joint_name = None
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in ("ROOT", "JOINT"):
+            joint_name = tokens[i + 1]
+            if joint_name not in channels:
+                joints.append(joint_name)
+                channels[joint_name] = []
+            i += 2
+        elif token == "CHANNELS":
+            if joint_name is None:
+                raise ValueError("CHANNELS appears before ROOT")
+
+            channels_num = int(tokens[i + 1])
+            channels[joint_name] += tokens[i + 2 : i + 2 + channels_num]
+            i += 2 + channels_num
+        else:
+            i += 1
+
+    return joints, channels
+
+
+def read_bvh_header(f: TextIO) -> BVHHeader:
+    """
+    BVH ファイルのヘッダを読み込む
+
+    読み込み後、f は MOTION 部の最初のフレームの行を指す
+
+    Parameters
+    ----------
+    f : TextIO
+        BVH ファイル
+
+    Returns
+    -------
+    header : BVHHeader
+        ヘッダ
+    """
+
+    tokens: list[str] = []
+    for line in f:
+        if line.strip() == "MOTION":
+            break
+        tokens += line.split()
+    else:
+        raise ValueError("MOTION section is not found")
+
+    joints, channels = parse_hierarchy(tokens)
+
+    frames = None
+    frame_time = None
+    for line in f:
+        if line.strip().startswith("Frames:"):
+            frames = int(line.split()[1])
+        elif line.strip().startswith("Frame Time:"):
+            frame_time = float(line.split()[2])
+            break
+
+    if frame_time is None:
+        raise ValueError("Frame Time is not found")
+
+    return BVHHeader(joints, channels, frames, frame_time)
+
+
+class BVHChunkReader:
+    """
+    BVH ファイルのヘッダを1回だけ読み込み、MOTION 部を chunk_rows 行ずつ返す
+
+    follow が True の場合は収録中の (追記される) ファイルを tail -f のように読み続け,
+    末尾に達するたびにそれまでの完全な行を返す. idle_timeout 秒追記がなければ終了する
+
+    Parameters
+    ----------
+    path : str
+        BVH ファイルのパス
+    joints : list[str], optional
+        読み込む関節. None の場合はすべての関節
+    channels : list[str], optional
+        読み込むチャンネル. None の場合はすべてのチャンネル
+    chunk_rows : int
+        一度に変換する行数
+    dtype : np.dtype
+        値の型
+    follow : bool
+        追記されるファイルを読み続けるかどうか
+    poll_interval : float
+        follow の場合に追記を確認する間隔 [s]
+    idle_timeout : float, optional
+        follow の場合に終了するまでの追記のない時間 [s]. None の場合は終了しない
+    """
+
+    def __init__(
+        self,
+        path: str,
+        joints: list[str] | None = None,
+        channels: list[str] | None = None,
+        chunk_rows=BVH_CHUNK_ROWS,
+        dtype=np.float64,
+        follow=False,
+        poll_interval=0.5,
+        idle_timeout: float | None = None,
+    ):
+        self.chunk_rows = chunk_rows
+        self.dtype = dtype
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+
+        self._f = open(path)
+        try:
+            self.header = read_bvh_header(self._f)
+        except Exception:
+            self._f.close()
+            raise
+
+        all_columns = self.header.columns
+        self.columns = self.header.select_columns(joints, channels)
+        self._usecols = None
+        if self.columns != all_columns:
+            column_index = {c: i for i, c in enumerate(all_columns)}
+            self._usecols = [column_index[c] for c in self.columns]
+
+    @property
+    def frame_time(self) -> float:
+        return self.header.frame_time
+
+    def _to_array(self, lines: list[str]):
+        return np.loadtxt(lines, dtype=self.dtype, usecols=self._usecols, ndmin=2)
+
+    def _iter_lines(self):
+        # 空行を除いた完全な行を chunk_rows 行ずつ返す
+        while True:
+            lines = [line for line in islice(self._f, self.chunk_rows) if line.strip()]
+            if len(lines) == 0:
+                return
+            yield lines
+
+    def _iter_follow_lines(self):
+        # 追記を待ちながら、改行まで書き込まれた行を返す
+        partial = ""
+        lines: list[str] = []
+        idle_since = time.monotonic()
+        while True:
+            line = self._f.readline()
+            if line.endswith("\n"):
+                line = partial + line
+                partial = ""
+                if line.strip():
+                    lines.append(line)
+                if len(lines) >= self.chunk_rows:
+                    yield lines
+                    lines = []
+                idle_since = time.monotonic()
+                continue
+
+            # 書き込み途中の行は次の読み込みまで保持する
+            partial += line
+            if len(lines) > 0:
+                yield lines
+                lines = []
+
+            if (
+                self.idle_timeout is not None
+                and time.monotonic() - idle_since >= self.idle_timeout
+            ):
+                if partial.strip():
+                    yield [partial]
+                return
+            time.sleep(self.poll_interval)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        iter_lines = self._iter_follow_lines if self.follow else self._iter_lines
+        for lines in iter_lines():
+            yield self._to_array(lines)
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def parse_bvh(
+    path: str,
+    joints: list[str] | None = None,
+    channels: list[str] | None = None,
+    chunk_rows=BVH_CHUNK_ROWS,
+    dtype=np.float64,
+):
+    """
+    BVH ファイルをパースする
+
+    MOTION 部は chunk_rows 行ずつ NumPy でまとめて変換する.
+    joints, channels を指定すると、その列だけを読み込む
+
+    Parameters
+    ----------
+    path : str
+        BVH ファイルのパス
+    joints : list[str], optional
+        読み込む関節. None の場合はすべての関節
+    channels : list[str], optional
+        読み込むチャンネル. None の場合はすべてのチャンネル
+    chunk_rows : int
+        一度に変換する行数
+    dtype : np.dtype
+        値の型
+
+    Returns
+    -------
+    values : np.ndarray
+        (フレーム数, 列数) の値
+    columns : list[str]
+        列名
+    frame_time : float
+        1フレームの時間 [s]
+    """
+
+    with BVHChunkReader(path, joints, channels, chunk_rows, dtype) as reader:
+        columns = reader.columns
+        values = np.empty((reader.header.frames or 0, len(columns)), dtype=dtype)
+        extra_chunks: list[np.ndarray] = []
+        rows = 0
+        for chunk in reader:
+            # Frames の値より多い行は別に保持しておく
+            n = max(min(len(chunk), len(values) - rows), 0)
+            values[rows : rows + n] = chunk[:n]
+            if n < len(chunk):
+                extra_chunks.append(chunk[n:])
+            rows += len(chunk)
+
+    if len(extra_chunks) > 0:
+        values = np.concatenate([values, *extra_chunks])
+
+    return values[:rows], columns, reader.frame_time
+
+
+def to_motion_df(values: np.ndarray, columns: list[str], frame_time: float):
+    """
+    パースした値を BVHparser.get_motion_df() と同じ形式の DataFrame に変換する
+
+    Parameters
+    ----------
+    values : np.ndarray
+        (フレーム数, 列数) の値
+    columns : list[str]
+        列名
+    frame_time : float
+        1フレームの時間 [s]
+
+    Returns
+    -------
+    motion_df : pd.DataFrame
+        先頭に time 列を持つモーションデータ
+    """
+
+    motion_df = pd.DataFrame(values, columns=columns, copy=False)
+    motion_df.insert(0, "time", np.arange(len(values)) * frame_time)
+
+    return motion_df
@@ -0,0 +1,301 @@
+import json
+import os
+import shutil
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+# 特徴量ストアの形式
+#
+# <name>.features/
+#   schema.json  列名・行数・型などのマニフェスト (最後に書き込む)
+#   values.npy   特徴量 (行数, 列数) の float64. 列ごとに連続する Fortran 順で保存する
+#   label.npy    ラベル (行数,) の int64
+FEATURE_STORE_VERSION = 1
+FEATURE_STORE_SUFFIX = ".features"
+
+SCHEMA_FILE = "schema.json"
+VALUES_FILE = "values.npy"
+LABEL_FILE = "label.npy"
+
+VALUES_DTYPE = np.dtype("<f8")
+LABEL_DTYPE = np.dtype("<i8")
+
+# 行優先の一時ファイルから列優先に並べ替えるときの行数
+_TRANSPOSE_CHUNK_ROWS = 64 * 1024
+
+
+class FeatureStoreWriter:
+    """
+    特徴量の DataFrame をブロックごとに追記して特徴量ストアを作成する
+
+    ブロックは一時ファイルに書き出すため、メモリ使用量は1ブロック分に収まる.
+    close するまでは path に何も作成されない
+    """
+
+    def __init__(self, path: str, label_col="label"):
+        self.path = path
+        self.label_col = label_col
+        self.columns: list[str] | None = None
+        self.rows = 0
+
+        self._tmp_dir = f"{path}.tmp"
+        if os.path.exists(self._tmp_dir):
+            shutil.rmtree(self._tmp_dir)
+        os.makedirs(self._tmp_dir)
+
+        self._values_file = open(os.path.join(self._tmp_dir, "values.raw"), "wb")
+        self._label_file = open(os.path.join(self._tmp_dir, "label.raw"), "wb")
+
+    def append(self, df: pd.DataFrame):
+        if df.empty:
+            return
+
+        columns = [c for c in df.columns if c != self.label_col]
+        if self.columns is None:
+            self.columns = columns
+        elif columns != self.columns:
+            raise ValueError("columns of the block do not match the feature store")
+
+        values = np.ascontiguousarray(df[columns].to_numpy(), dtype=VALUES_DTYPE)
+        label = np.ascontiguousarray(df[self.label_col].to_numpy(), dtype=LABEL_DTYPE)
+        self._values_file.write(values.tobytes())
+        self._label_file.write(label.tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        self._values_file.close()
+        self._label_file.close()
+
+        columns = self.columns or []
+        raw_values_path = os.path.join(self._tmp_dir, "values.raw")
+        raw_label_path = os.path.join(self._tmp_dir, "label.raw")
+
+        # 列ごとに読めるように Fortran 順の .npy に並べ替える
+        values = np.lib.format.open_memmap(
+            os.path.join(self._tmp_dir, VALUES_FILE),
+            mode="w+",
+            dtype=VALUES_DTYPE,
+            shape=(self.rows, len(columns)),
+            fortran_order=True,
+        )
+        if self.rows > 0 and len(columns) > 0:
+            raw_values = np.memmap(
+                raw_values_path,
+                dtype=VALUES_DTYPE,
+                mode="r",
+                shape=(self.rows, len(columns)),
+            )
+            for start in range(0, self.rows, _TRANSPOSE_CHUNK_ROWS):
+                end = start + _TRANSPOSE_CHUNK_ROWS
+                values[start:end] = raw_values[start:end]
+            del raw_values
+        values.flush()
+        del values
+
+        label = np.fromfile(raw_label_path, dtype=LABEL_DTYPE)
+        np.save(os.path.join(self._tmp_dir, LABEL_FILE), label)
+        os.remove(raw_values_path)
+        os.remove(raw_label_path)
+
+        schema = {
+            "version": FEATURE_STORE_VERSION,
+            "rows": self.rows,
+            "columns": columns,
+            "dtype": VALUES_DTYPE.str,
+            "label": self.label_col,
+            "label_dtype": LABEL_DTYPE.str,
+        }
+        with open(os.path.join(self._tmp_dir, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f, ensure_ascii=False)
+
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self._tmp_dir, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+
+        self._values_file.close()
+        self._label_file.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def write_features(blocks: Iterable[pd.DataFrame], path: str, label_col="label"):
+    """
+    特徴量の DataFrame を特徴量ストアに書き出す
+
+    Parameters
+    ----------
+    blocks : Iterable[pd.DataFrame]
+        出力する DataFrame (すべて同じ列を持つ)
+    path : str
+        特徴量ストアのパス
+    label_col : str
+        ラベルの列名
+
+    Returns
+    -------
+    None
+    """
+
+    output_dir = os.path.dirname(path)
+
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    with FeatureStoreWriter(path, label_col=label_col) as writer:
+        for block in blocks:
+            writer.append(block)
+
+
+def read_schema(path: str) -> dict:
+    """
+    特徴量ストアのマニフェストを読み込む
+
+    Parameters
+    ----------
+    path : str
+        特徴量ストアのパス
+
+    Returns
+    -------
+    schema : dict
+        列名・行数・型など
+    """
+
+    with open(os.path.join(path, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+
+    if schema["version"] != FEATURE_STORE_VERSION:
+        raise ValueError(f"unsupported feature store version: {schema['version']}")
+
+    return schema
+
+
+def read_feature_arrays(path: str, columns: list[str] | None = None, mmap=True):
+    """
+    特徴量ストアを配列として読み込む
+
+    mmap が True の場合はメモリマップで開くため、実際に参照した列だけが読み込まれる.
+    columns が連続する列であればコピーせずにビューを返す
+
+    Parameters
+    ----------
+    path : str
+        特徴量ストアのパス
+    columns : list[str], optional
+        読み込む列. None の場合はすべての列
+    mmap : bool
+        メモリマップで開くかどうか
+
+    Returns
+    -------
+    values : np.ndarray
+        (行数, 列数) の特徴量
+    label : np.ndarray
+        ラベル
+    columns : list[str]
+        values の列名
+    """
+
+    schema = read_schema(path)
+    mmap_mode = "r" if mmap else None
+
+    values = np.load(os.path.join(path, VALUES_FILE), mmap_mode=mmap_mode)
+    label = np.load(os.path.join(path, LABEL_FILE), mmap_mode=mmap_mode)
+
+    if columns is None:
+        return values, label, list(schema["columns"])
+
+    column_index = {c: i for i, c in enumerate(schema["columns"])}
+    missing = [c for c in columns if c not in column_index]
+    if len(missing) > 0:
+        raise KeyError(f"columns {missing} are missing in {path}")
+
+    indices = [column_index[c] for c in columns]
+    if len(indices) > 0 and indices == list(range(indices[0], indices[-1] + 1)):
+        values = values[:, indices[0] : indices[-1] + 1]
+    else:
+        values = values[:, indices]
+
+    return values, label, list(columns)
+
+
+def read_features(
+    path: str, columns: list[str] | None = None, mmap=True
+) -> pd.DataFrame:
+    """
+    特徴量ストアを DataFrame として読み込む
+
+    列の並びは export_csv で書き出した CSV と同じ (特徴量の後にラベル)
+
+    Parameters
+    ----------
+    path : str
+        特徴量ストアのパス
+    columns : list[str], optional
+        読み込む特徴量の列. None の場合はすべての列
+    mmap : bool
+        メモリマップで開くかどうか
+
+    Returns
+    -------
+    df : pd.DataFrame
+        特徴量とラベルの DataFrame. 行がない場合は空の DataFrame
+    """
+
+    schema = read_schema(path)
+    if schema["rows"] == 0:
+        return pd.DataFrame()
+
+    values, label, columns = read_feature_arrays(path, columns=columns, mmap=mmap)
+
+    df = pd.DataFrame(values, columns=columns, copy=False)
+    df[schema["label"]] = label
+
+    return df
+
+
+def read_features_csv(
+    path: str, columns: list[str] | None = None, label_col="label"
+) -> pd.DataFrame:
+    """
+    CSV で出力した特徴量を read_features と同じ形式の DataFrame として読み込む
+
+    Parameters
+    ----------
+    path : str
+        CSV ファイルのパス
+    columns : list[str], optional
+        読み込む特徴量の列. None の場合はすべての列
+    label_col : str
+        ラベルの列名
+
+    Returns
+    -------
+    df : pd.DataFrame
+        特徴量とラベルの DataFrame. 行がない場合は空の DataFrame
+    """
+
+    if os.path.getsize(path) <= 1:
+        # 空の DataFrame を出力した CSV
+        return pd.DataFrame()
+
+    if columns is None:
+        df = pd.read_csv(path)
+    else:
+        usecols = [*columns, label_col]
+        df = pd.read_csv(path, usecols=usecols)[usecols]
+    if df.empty:
+        return pd.DataFrame()
+
+    features = df.drop(columns=label_col).astype(VALUES_DTYPE)
+    features[label_col] = df[label_col].astype(LABEL_DTYPE)
+    return features
@@ -1,8 +1,25 @@
-import matplotlib.colors as mcolors
+from functools import cache
+
+import numpy as np
+
+
+@cache
+def css4_colors() -> list[str]:
+    """
+    matplotlib の CSS4 の色の名前 (ラベルの色に使う)
+
+    matplotlib は色を使うときに読み込む
+    """
+
+    import matplotlib.colors as mcolors
+
+    return list(mcolors.CSS4_COLORS)
 
 
 class Labels:
-    colors = list(mcolors.CSS4_COLORS)
+    @property
+    def colors(self) -> list[str]:
+        return css4_colors()
 
     def __init__(
         self,
@@ -16,16 +33,50 @@ class Labels:
         self.unuse_label = unuse_label
         self._unuse_id = -1
         self.group_labels = group_labels
+        # ラベル名 (グループに含まれるラベル名を含む) から id への索引
+        self._index: dict[str, int] = {}
+        self._reindex()
 
         with open(path) as f:
             for line in f:
                 self.append_unique(line.strip())
 
+    def _reindex(self):
+        self._index = {}
+        for i, label in enumerate(self.labels):
+            self._index.setdefault(label, i)
+
+        # グループに含まれるラベルはグループの id にする
+        for group, labels in self.group_labels.items():
+            if group in self._index:
+                for label in labels:
+                    self._index.setdefault(label, self._index[group])
+
     def id(self, label: str):
-        if label not in self.labels:
-            return self.other_id()
+        return self._index.get(label, self.other_id())
+
+    def ids(self, labels) -> np.ndarray:
+        """
+        ラベル名の配列を id の配列に変換する
+
+        Parameters
+        ----------
+        labels : array_like
+            ラベル名の配列
+
+        Returns
+        -------
+        ids : np.ndarray
+            id の配列 (int64)
+        """
 
-        return self.labels.index(label)
+        labels = np.asarray(labels)
+        if labels.size == 0:
+            return np.zeros(labels.shape, dtype=np.int64)
+
+        uniques, inverse = np.unique(labels, return_inverse=True)
+        lookup = np.array([self.id(label) for label in uniques], dtype=np.int64)
+        return lookup[inverse].reshape(labels.shape)
 
     def label(self, id: int):
         if id == self.unuse_id():
@@ -46,6 +97,7 @@ class Labels:
 
     def __setitem__(self, x, value):
         self.labels[x] = value
+        self._reindex()
 
     def append_unique(self, value):
         for group, labels in self.group_labels.items():
@@ -53,14 +105,15 @@ class Labels:
                 value = group
                 break
 
-        if value not in self.labels and value != self.unuse_label:
+        if value not in self._index and value != self.unuse_label:
             self.labels.append(value)
+            self._reindex()
 
     def other(self):
         return self.other_label
 
     def other_id(self):
-        return self.id(self.other_label)
+        return self._index[self.other_label]
 
     def unuse(self):
         return self.unuse_label
@@ -79,3 +132,47 @@ class Labels:
 
     def color_dict(self):
         return {label: self.colors[i] for i, label in enumerate(self.labels)}
+
+
+def label_timeline(
+    tricks: list[dict], labels: Labels, frames: int, frame_rate: float
+) -> np.ndarray:
+    """
+    label.json の区間 (tricks) をフレームごとのラベル id に変換する
+
+    区間は start から end のフレームまで (end を含む) とし、区間外は「その他」にする.
+    区間が重なる場合は label.json で後に書かれた区間のラベルにする
+
+    Parameters
+    ----------
+    tricks : list[dict]
+        label.json の tricks (start, end [s] と labels を持つ)
+    labels : Labels
+        ラベル
+    frames : int
+        フレーム数
+    frame_rate : float
+        フレームレート
+
+    Returns
+    -------
+    label_ids : np.ndarray
+        (フレーム数,) のラベル id (int64)
+    """
+
+    timeline = np.full(frames, labels.other_id(), dtype=np.int64)
+    if len(tricks) == 0:
+        return timeline
+
+    label_ids = labels.ids([trick["labels"][0] for trick in tricks])
+    starts = (np.array([trick["start"] for trick in tricks]) * frame_rate).astype(
+        np.int64
+    )
+    ends = (np.array([trick["end"] for trick in tricks]) * frame_rate).astype(np.int64)
+    np.clip(starts, 0, frames, out=starts)
+    np.clip(ends + 1, 0, frames, out=ends)
+
+    for start, end, label_id in zip(starts, ends, label_ids):
+        timeline[start:end] = label_id
+
+    return timeline
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from modules.common.bvh import parse_bvh, to_motion_df
+
+# パース済みモーションのキャッシュ
+#
+# <cache_dir>/
+#   entries/<sha1>/motion.npy   チャンネルの値 (フレーム数, チャンネル数) の float32
+#   entries/<sha1>/meta.json    列名・frame_time・フレーム数
+#   index/<sha1(path)>.json     BVH ファイルのサイズ・更新日時とハッシュの対応
+#   catalog/<sha1(path)>.json   収録ごとのフレーム数・フレームレート・ラベルの内訳
+#
+# ファイルは一時ファイルに書いてから置き換えるため、複数プロセスから同時に使える
+MOTION_CACHE_VERSION = 1
+MOTION_CACHE_DIR = "./data/cache/motion"
+MOTION_DTYPE = np.dtype("<f4")
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha1(path: str) -> str:
+    """
+    ファイルの内容の SHA-1 を計算する
+    """
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def _path_key(path: str) -> str:
+    return hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+
+
+def _file_stat(path: str) -> dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_json(path: str):
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path: str, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(content, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def motion_hash(motion_path: str, cache_dir=MOTION_CACHE_DIR) -> str:
+    """
+    BVH ファイルの内容のハッシュを取得する
+
+    サイズと更新日時が前回と同じであれば、記録してあるハッシュを使う
+
+    Parameters
+    ----------
+    motion_path : str
+        BVH ファイルのパス
+    cache_dir : str
+        キャッシュのディレクトリ
+
+    Returns
+    -------
+    sha1 : str
+        ハッシュ
+    """
+
+    stat = _file_stat(motion_path)
+    index_path = os.path.join(cache_dir, "index", f"{_path_key(motion_path)}.json")
+
+    index = _read_json(index_path)
+    if index is not None and index["stat"] == stat:
+        return index["sha1"]
+
+    sha1 = file_sha1(motion_path)
+    _write_json(
+        index_path, {"path": os.path.abspath(motion_path), "stat": stat, "sha1": sha1}
+    )
+
+    return sha1
+
+
+def _write_entry(entry_dir: str, values: np.ndarray, columns: list[str], frame_time):
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "motion.npy"), values.astype(MOTION_DTYPE))
+    meta = {
+        "version": MOTION_CACHE_VERSION,
+        "columns": columns,
+        "frame_time": frame_time,
+        "frames": len(values),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # 別のプロセスが先に書き込んだ
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_motion(motion_path: str, cache_dir=MOTION_CACHE_DIR, mmap=True):
+    """
+    キャッシュを使って BVH ファイルを読み込む
+
+    キャッシュがなければパースしてキャッシュに保存する.
+    値は float32 で保存し、2回目以降はメモリマップで読み込む
+
+    Parameters
+    ----------
+    motion_path : str
+        BVH ファイルのパス
+    cache_dir : str
+        キャッシュのディレクトリ
+    mmap : bool
+        メモリマップで読み込むかどうか
+
+    Returns
+    -------
+    values : np.ndarray
+        (フレーム数, チャンネル数) の float32 の値
+    columns : list[str]
+        チャンネル名
+    frame_time : float
+        1フレームの時間 [s]
+    """
+
+    entry_dir = os.path.join(cache_dir, "entries", motion_hash(motion_path, cache_dir))
+    meta = _read_json(os.path.join(entry_dir, "meta.json"))
+
+    if meta is None or meta["version"] != MOTION_CACHE_VERSION:
+        values, columns, frame_time = parse_bvh(motion_path)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        _write_entry(entry_dir, values, columns, frame_time)
+        meta = _read_json(os.path.join(entry_dir, "meta.json"))
+
+    values = np.load(
+        os.path.join(entry_dir, "motion.npy"), mmap_mode="r" if mmap else None
+    )
+
+    return values, meta["columns"], meta["frame_time"]
+
+
+def load_motion_df(motion_path: str, cache_dir=MOTION_CACHE_DIR):
+    """
+    キャッシュを使って BVH ファイルを DataFrame として読み込む
+
+    列は BVHparser.get_motion_df() と同じ (先頭に time 列)
+
+    Parameters
+    ----------
+    motion_path : str
+        BVH ファイルのパス
+    cache_dir : str
+        キャッシュのディレクトリ
+
+    Returns
+    -------
+    motion_df : pd.DataFrame
+        モーションデータ
+    frame_time : float
+        1フレームの時間 [s]
+    """
+
+    values, columns, frame_time = load_motion(motion_path, cache_dir)
+
+    return to_motion_df(values, columns, frame_time), frame_time
+
+
+def write_catalog(
+    data_files: dict[str, str],
+    frames: int,
+    frame_rate: float,
+    label_histogram: dict[str, int],
+    cache_dir=MOTION_CACHE_DIR,
+):
+    """
+    収録のフレーム数・フレームレート・ラベルごとのフレーム数を記録する
+
+    Parameters
+    ----------
+    data_files : dict
+        データファイルのパス
+    frames : int
+        フレーム数
+    frame_rate : float
+        フレームレート
+    label_histogram : dict
+        ラベルごとのフレーム数
+    cache_dir : str
+        キャッシュのディレクトリ
+    """
+
+    catalog = {
+        "name": data_files["name"],
+        "motion": _file_stat(data_files["motion"]),
+        "label": _file_stat(data_files["label"]),
+        "frames": frames,
+        "frame_rate": frame_rate,
+        "label_histogram": label_histogram,
+    }
+    catalog_path = os.path.join(
+        cache_dir, "catalog", f"{_path_key(data_files['motion'])}.json"
+    )
+    _write_json(catalog_path, catalog)
+
+
+def read_catalog(data_files: dict[str, str], cache_dir=MOTION_CACHE_DIR):
+    """
+    記録してある収録の情報を読み込む
+
+    BVH ファイルかラベルファイルが記録後に変更されている場合は None を返す
+
+    Parameters
+    ----------
+    data_files : dict
+        データファイルのパス
+    cache_dir : str
+        キャッシュのディレクトリ
+
+    Returns
+    -------
+    catalog : dict or None
+        frames, frame_rate, label_histogram を持つ辞書
+    """
+
+    catalog_path = os.path.join(
+        cache_dir, "catalog", f"{_path_key(data_files['motion'])}.json"
+    )
+    catalog = _read_json(catalog_path)
+    if catalog is None:
+        return None
+
+    if catalog["motion"] != _file_stat(data_files["motion"]) or catalog[
+        "label"
+    ] != _file_stat(data_files["label"]):
+        return None
+
+    return catalog
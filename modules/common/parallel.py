@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+from modules.common.threads import limit_threads
+
+
+def ordered_map(
+    fn: Callable[..., Any],
+    *iterables: Iterable[Any],
+    workers: int = 1,
+    threads: int | None = None,
+) -> Iterator[Any]:
+    """
+    map と同様に fn を適用し、入力と同じ順序で結果を返す
+
+    workers が 2 以上のときはプロセスプールで並列に実行する.
+    ワーカーで発生した例外は、その結果を取り出したときに呼び出し元で送出される
+
+    Parameters
+    ----------
+    fn : Callable
+        適用する関数 (プロセス間で受け渡すため、モジュールのトップレベルに定義する)
+    iterables : Iterable
+        fn の引数
+    workers : int
+        プロセス数
+    threads : int, optional
+        各ワーカーの BLAS / OpenMP のスレッド数 (None の場合は制限しない)
+
+    Returns
+    -------
+    results : Iterator
+        fn の返り値
+    """
+
+    if workers <= 1:
+        yield from map(fn, *iterables)
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=None if threads is None else limit_threads,
+        initargs=() if threads is None else (threads,),
+    )
+    try:
+        yield from executor.map(fn, *iterables)
+    finally:
+        # 途中で例外が発生した場合は未実行のタスクを取り消す
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,129 @@
+import numpy as np
+
+from modules.common.labels import Labels
+
+
+def pyplot():
+    """
+    matplotlib.pyplot を読み込む
+
+    描画するときに読み込むため, 描画しない処理では matplotlib を読み込まない.
+    japanize_matplotlib がインストールされている場合は日本語のフォントも設定する
+
+    Returns
+    -------
+    plt : module
+        matplotlib.pyplot
+    """
+
+    from matplotlib import pyplot as plt
+
+    try:
+        import japanize_matplotlib  # noqa: F401
+    except ImportError:
+        pass
+
+    return plt
+
+
+def run_lengths(values) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    同じ値が連続する区間に分ける (ランレングス符号化)
+
+    Parameters
+    ----------
+    values : array_like
+        ラベル id などの1次元の配列
+
+    Returns
+    -------
+    starts : np.ndarray
+        区間の先頭のインデックス
+    lengths : np.ndarray
+        区間の長さ
+    run_values : np.ndarray
+        区間の値
+    """
+
+    values = np.asarray(values)
+    if len(values) == 0:
+        return (
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64),
+            values[:0],
+        )
+
+    boundaries = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(values)]])
+
+    return starts, ends - starts, values[starts]
+
+
+def plot_label_spans(
+    ax, values, labels: Labels, ymin: float, ymax: float, alpha: float | None = None
+):
+    """
+    ラベル id の並びを色の帯として描画する
+
+    i 番目の値を axvspan(i, i + 1, ymin, ymax) で描いたものと同じ見た目になるが,
+    連続する区間ごとにまとめ, ラベルごとに1つの broken_barh で描画する.
+    描画の時間はフレーム数ではなくラベルの変化の数に比例する
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        描画する Axes
+    values : array_like
+        ラベル id の並び
+    labels : Labels
+        ラベル (色に使う)
+    ymin, ymax : float
+        帯の縦の範囲 (Axes に対する割合, axvspan と同じ)
+    alpha : float, optional
+        透明度
+    """
+
+    starts, lengths, run_values = run_lengths(values)
+    spans = np.column_stack([starts, lengths])
+
+    for label_id in np.unique(run_values):
+        ax.broken_barh(
+            spans[run_values == label_id],
+            (ymin, ymax - ymin),
+            color=labels.color_by_id(int(label_id)),
+            alpha=alpha,
+            # axvspan と同じく, 縦方向は Axes に対する割合で指定する
+            transform=ax.get_xaxis_transform(),
+        )
+
+
+def plot_result(y_test, pred: np.ndarray, labels: Labels, file_path="result.png"):
+    """
+    正解ラベル (上半分) と推定結果 (下半分) を並べて描画し, 保存する
+
+    Parameters
+    ----------
+    y_test : array_like
+        正解のラベル id
+    pred : np.ndarray
+        推定したラベル id
+    labels : Labels
+        ラベル (色に使う)
+    file_path : str
+        保存するファイルのパス
+    """
+
+    plt = pyplot()
+    plt.figure(figsize=(10, 3))
+    plt.xlim(0, len(y_test))
+    plt.ylim(0, 1)
+
+    # y_testに合わせて背景色を設定
+    plot_label_spans(plt.gca(), y_test, labels, 0.5, 1, alpha=0.5)
+
+    # 予測結果をプロット
+    plot_label_spans(plt.gca(), pred, labels, 0, 0.5)
+
+    print(f"export: {file_path}")
+    plt.savefig(file_path)
@@ -0,0 +1,209 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Literal
+
+# ワーカープロセスにも設定を引き継ぐため, 設定は環境変数に置く
+PROFILE_LOG_ENV = "PROFILE_LOG"
+PROFILE_STAGE_ENV = "PROFILE_STAGE"
+PROFILE_DIR_ENV = "PROFILE_DIR"
+PROFILE_FORMAT_ENV = "PROFILE_FORMAT"
+PROFILE_RUN_ENV = "PROFILE_RUN"
+
+ProfileFormat = Literal["cprofile", "pyinstrument"]
+
+# ネストした stage に付けるキー (モデル, ウィンドウサイズ, フォールドなど)
+_context: ContextVar[dict] = ContextVar("profiling_context", default={})
+_profile_count = 0
+
+
+def configure(
+    log_path: str | None,
+    profile_stage: str | None = None,
+    profile_dir: str = "./profiles",
+    profile_format: ProfileFormat = "cprofile",
+):
+    """
+    計測を有効にする
+
+    Parameters
+    ----------
+    log_path : str, optional
+        段階ごとの記録を追記する JSON Lines のパス. None の場合は計測しない
+    profile_stage : str, optional
+        プロファイルを保存する段階の名前
+    profile_dir : str
+        プロファイルを保存するディレクトリ
+    profile_format : str
+        "cprofile" (.prof) または "pyinstrument" (.html)
+    """
+
+    if log_path is None:
+        for name in (PROFILE_LOG_ENV, PROFILE_STAGE_ENV):
+            os.environ.pop(name, None)
+        return
+
+    os.environ[PROFILE_LOG_ENV] = log_path
+    os.environ[PROFILE_DIR_ENV] = profile_dir
+    os.environ[PROFILE_FORMAT_ENV] = profile_format
+    os.environ.setdefault(PROFILE_RUN_ENV, uuid.uuid4().hex[:12])
+    if profile_stage is not None:
+        os.environ[PROFILE_STAGE_ENV] = profile_stage
+
+    log_dir = os.path.dirname(log_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+
+def enabled() -> bool:
+    return PROFILE_LOG_ENV in os.environ
+
+
+def peak_rss_mb() -> float:
+    """
+    このプロセスの最大常駐メモリ [MB]
+    """
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB, macOS は byte
+    if sys.platform == "darwin":
+        return max_rss / 2**20
+    return max_rss / 2**10
+
+
+@contextmanager
+def context(**keys):
+    """
+    ブロック内の stage の記録に keys を付ける
+    """
+
+    token = _context.set({**_context.get(), **keys})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_keys() -> dict:
+    """
+    context で付けたキー (別のプロセスの stage に同じキーを付けるために使う)
+    """
+
+    return dict(_context.get())
+
+
+@contextmanager
+def _profile(name: str, keys: dict):
+    global _profile_count
+
+    profile_dir = os.environ.get(PROFILE_DIR_ENV, "./profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    _profile_count += 1
+    suffix = "_".join(str(v) for v in keys.values())
+    stem = f"{name}_{suffix}_{os.getpid()}_{_profile_count}".replace("/", "-")
+
+    if os.environ.get(PROFILE_FORMAT_ENV) == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(os.path.join(profile_dir, f"{stem}.html"), "w") as f:
+                f.write(profiler.output_html())
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, f"{stem}.prof"))
+
+
+@contextmanager
+def stage(name: str, rows: int | None = None, **keys):
+    """
+    段階の時間とメモリを計測して記録する
+
+    計測が有効でない場合は何もしない. ブロック内で record["rows"] に
+    処理した行数を設定できる
+
+    Parameters
+    ----------
+    name : str
+        段階の名前 (parse, label, split, feature_extraction, fit, predict など)
+    rows : int, optional
+        処理した行数
+    **keys
+        記録に付けるキー
+
+    Returns
+    -------
+    record : dict
+        記録 (ブロックを抜けると wall, cpu, peak_rss_mb などが追加される)
+    """
+
+    record = {"stage": name, "rows": rows}
+    if not enabled():
+        yield record
+        return
+
+    keys = {**_context.get(), **keys}
+    profile = name == os.environ.get(PROFILE_STAGE_ENV)
+    peak_rss_before = peak_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        if profile:
+            with _profile(name, keys):
+                yield record
+        else:
+            yield record
+    finally:
+        wall = time.perf_counter() - wall_start
+        record.update(
+            {
+                "run": os.environ.get(PROFILE_RUN_ENV),
+                "pid": os.getpid(),
+                "time": time.time(),
+                **keys,
+                "wall": wall,
+                "cpu": time.process_time() - cpu_start,
+                "peak_rss_mb": peak_rss_mb(),
+                "peak_rss_growth_mb": peak_rss_mb() - peak_rss_before,
+            }
+        )
+        if record["rows"] is not None and wall > 0:
+            record["rows_per_sec"] = record["rows"] / wall
+
+        # 1行ずつ追記する (複数のプロセスから書き込んでも行が混ざらない)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with open(os.environ[PROFILE_LOG_ENV], "a") as f:
+            f.write(line)
+
+
+def profiled(name: str):
+    """
+    関数全体を stage として計測するデコレータ
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,104 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable
+
+from modules.common import profiling
+from modules.common.plotting import pyplot
+
+
+def _init_worker():
+    # 画面のないプロセスで描画するため Agg バックエンドを使う
+    import matplotlib
+
+    matplotlib.use("Agg")
+    pyplot()
+
+
+def _render(fn: Callable[..., Any], args: tuple, kwargs: dict, keys: dict):
+    plt = pyplot()
+
+    # submit は完了を待たないため, 描画の時間はこのプロセスで計測する
+    try:
+        with profiling.context(**keys), profiling.stage("plotting"):
+            return fn(*args, **kwargs)
+    finally:
+        plt.close("all")
+
+
+class RenderQueue:
+    """
+    図の描画をバックグラウンドのプロセスで行う
+
+    submit した描画関数は Agg バックエンドのプロセスプールで実行され,
+    呼び出し元は描画の完了を待たずに次の処理に進める.
+    描画関数はモジュールのトップレベルに定義し, 引数は numpy の配列などの小さなデータにする.
+    計測が有効な場合, 描画の時間は submit した時点の profiling.context のキーを付けて
+    描画するプロセスで plotting として記録する
+
+    Parameters
+    ----------
+    workers : int
+        描画するプロセス数. 0 の場合は描画しない (--no-plots)
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._futures: list[Future] = []
+        self._executor = None
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs):
+        """
+        描画関数をキューに追加する
+
+        Returns
+        -------
+        future : Future | None
+            描画の Future. 描画しない場合は None
+        """
+
+        if self._executor is None:
+            return None
+
+        future = self._executor.submit(
+            _render, fn, args, kwargs, profiling.current_keys()
+        )
+        self._futures.append(future)
+        return future
+
+    def close(self):
+        """
+        すべての描画の完了を待つ
+
+        描画で発生した例外は、ここで呼び出し元に送出される
+        """
+
+        if self._executor is None:
+            return
+
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+
+        # 例外の場合は未実行の描画を取り消す
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
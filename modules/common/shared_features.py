@@ -0,0 +1,370 @@
+import glob
+import hashlib
+import json
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from modules.common.feature_store import (
+    FEATURE_STORE_SUFFIX,
+    LABEL_DTYPE,
+    LABEL_FILE,
+    SCHEMA_FILE,
+    VALUES_DTYPE,
+    VALUES_FILE,
+    read_feature_arrays,
+    read_schema,
+)
+
+# このプロセスで作成した共有メモリ (名前 -> SharedFeatureMatrix)
+_owned: dict[str, "SharedFeatureMatrix"] = {}
+
+
+def _store_stats(path: str) -> list:
+    # 特徴量ストアのファイルの大きさと更新時刻 (書き直されると変わる)
+    stats = []
+    for name in (SCHEMA_FILE, VALUES_FILE, LABEL_FILE):
+        stat = os.stat(os.path.join(path, name))
+        stats.append([name, stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def _fold_order(names: list[str], folds: list[list[str]] | None) -> list[str]:
+    # フォールドのテストデータの収録を順に先頭に並べ, 残りの収録を後ろに並べる
+    if folds is None:
+        return names
+
+    order: list[str] = []
+    for fold in folds:
+        order.extend(
+            name for name in sorted(fold) if name in names and name not in order
+        )
+    return order + [name for name in names if name not in order]
+
+
+class SharedFeatureMatrix:
+    """
+    すべての収録の特徴量を1つの共有メモリに並べた行列
+
+    収録ごとの行は連続しており, recording_ids と offsets で引ける.
+    handle をワーカープロセスに渡して attach すると, コピーせずに同じ行列を参照できる.
+
+    folds を指定して作成すると, フォールドのテストデータの収録をフォールドの順に
+    先頭に並べ, 最後のフォールドのテストデータより前の行を行列の後ろにもう1度置く.
+    テストデータ以外の行は「テストデータより後の行, 前の行」の順に連続するため,
+    split は学習データを連結せずに共有メモリのビューとして返せる
+
+    Parameters
+    ----------
+    buffer_values : np.ndarray
+        (行数 + 後ろに置いた行数, 列数) の特徴量 (共有メモリ上の配列)
+    buffer_label : np.ndarray
+        (行数 + 後ろに置いた行数,) のラベル (共有メモリ上の配列)
+    columns : list[str]
+        特徴量の列名
+    names : list[str]
+        収録名 (行の順)
+    offsets : np.ndarray
+        収録ごとの先頭の行 (最後に総行数を持つ)
+    shms : list[SharedMemory]
+        特徴量とラベルの共有メモリ
+    fingerprint : str
+        特徴量ストアのスキーマとファイルの情報から求めたハッシュ
+    """
+
+    def __init__(
+        self,
+        buffer_values: np.ndarray,
+        buffer_label: np.ndarray,
+        columns: list[str],
+        names: list[str],
+        offsets: np.ndarray,
+        shms: list[SharedMemory],
+        fingerprint: str,
+    ):
+        n_rows = int(offsets[-1])
+        self._buffer_values = buffer_values
+        self._buffer_label = buffer_label
+        self.values = buffer_values[:n_rows]
+        self.label = buffer_label[:n_rows]
+        self.columns = columns
+        self.names = names
+        self.offsets = offsets
+        self.recording_ids = np.repeat(np.arange(len(names)), np.diff(offsets))
+        self._shms = shms
+        self._fingerprint = fingerprint
+
+    @classmethod
+    def from_dir(
+        self,
+        data_dir: str,
+        columns: list[str] | None = None,
+        folds: list[list[str]] | None = None,
+    ):
+        """
+        ディレクトリ内の特徴量ストアを共有メモリに読み込む
+
+        Parameters
+        ----------
+        data_dir : str
+            特徴量ストアのディレクトリ
+        columns : list[str], optional
+            読み込む特徴量の列. None の場合はすべての列
+        folds : list[list[str]], optional
+            フォールドごとのテストデータの収録名. 指定すると split で学習データを
+            連結せずに返せるように並べる. None の場合は収録名の順に並べる
+
+        Returns
+        -------
+        matrix : SharedFeatureMatrix
+            作成した行列 (使い終わったら unlink する)
+        """
+
+        paths = {}
+        schemas = {}
+        for path in sorted(
+            glob.glob(os.path.join(data_dir, f"*{FEATURE_STORE_SUFFIX}"))
+        ):
+            schema = read_schema(path)
+            if schema["rows"] == 0:
+                continue
+            name = os.path.basename(path)[: -len(FEATURE_STORE_SUFFIX)]
+            paths[name] = path
+            schemas[name] = schema
+            if columns is None:
+                columns = list(schema["columns"])
+
+        names = _fold_order(list(paths), folds)
+        rows = [schemas[name]["rows"] for name in names]
+        offsets = np.concatenate([[0], np.cumsum(rows)]).astype(np.int64)
+        n_rows = int(offsets[-1])
+        n_columns = len(columns or [])
+
+        # 最後のフォールドのテストデータより前の行を, 行列の後ろにもう1度置く
+        tail = 0
+        if folds is not None and len(folds) > 0:
+            index = {name: i for i, name in enumerate(names)}
+            last = [index[name] for name in folds[-1] if name in index]
+            if len(last) > 0:
+                tail = int(offsets[min(last)])
+
+        values_shm = SharedMemory(
+            create=True,
+            size=max(1, (n_rows + tail) * n_columns * VALUES_DTYPE.itemsize),
+        )
+        label_shm = SharedMemory(
+            create=True, size=max(1, (n_rows + tail) * LABEL_DTYPE.itemsize)
+        )
+        values = np.ndarray(
+            (n_rows + tail, n_columns), dtype=VALUES_DTYPE, buffer=values_shm.buf
+        )
+        label = np.ndarray((n_rows + tail,), dtype=LABEL_DTYPE, buffer=label_shm.buf)
+
+        for name, start, end in zip(names, offsets[:-1], offsets[1:]):
+            store_values, store_label, _ = read_feature_arrays(
+                paths[name], columns=columns
+            )
+            values[start:end] = store_values
+            label[start:end] = store_label
+        values[n_rows:] = values[:tail]
+        label[n_rows:] = label[:tail]
+
+        # 特徴量の値ではなく, スキーマとファイルの情報からハッシュを求める
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(
+            json.dumps(
+                [
+                    list(columns or []),
+                    names,
+                    offsets.tolist(),
+                    [[schemas[name], _store_stats(paths[name])] for name in names],
+                ],
+                ensure_ascii=False,
+            ).encode()
+        )
+
+        matrix = self(
+            values,
+            label,
+            list(columns or []),
+            names,
+            offsets,
+            [values_shm, label_shm],
+            digest.hexdigest(),
+        )
+        _owned[values_shm.name] = matrix
+
+        return matrix
+
+    @property
+    def handle(self) -> dict:
+        """
+        attach に渡す共有メモリの情報 (プロセス間で受け渡せる)
+        """
+
+        return {
+            "values": self._shms[0].name,
+            "label": self._shms[1].name,
+            "columns": self.columns,
+            "names": self.names,
+            "offsets": self.offsets.tolist(),
+            "rows": len(self._buffer_label),
+            "fingerprint": self._fingerprint,
+        }
+
+    @classmethod
+    def attach(self, handle: dict):
+        """
+        handle の共有メモリの行列を開く
+
+        Parameters
+        ----------
+        handle : dict
+            作成したプロセスの SharedFeatureMatrix.handle
+
+        Returns
+        -------
+        matrix : SharedFeatureMatrix
+            共有メモリを参照する行列
+        """
+
+        # 同じプロセスで作成した行列はそのまま使う
+        if handle["values"] in _owned:
+            return _owned[handle["values"]]
+
+        shms = []
+        for name in (handle["values"], handle["label"]):
+            shm = SharedMemory(name=name)
+            # 共有メモリの削除は作成したプロセスが行うため, 追跡の対象から外す
+            resource_tracker.unregister(shm._name, "shared_memory")
+            shms.append(shm)
+
+        offsets = np.array(handle["offsets"], dtype=np.int64)
+        n_rows = handle["rows"]
+        values = np.ndarray(
+            (n_rows, len(handle["columns"])), dtype=VALUES_DTYPE, buffer=shms[0].buf
+        )
+        label = np.ndarray((n_rows,), dtype=LABEL_DTYPE, buffer=shms[1].buf)
+
+        matrix = self(
+            values,
+            label,
+            list(handle["columns"]),
+            list(handle["names"]),
+            offsets,
+            shms,
+            handle["fingerprint"],
+        )
+        _owned[handle["values"]] = matrix
+
+        return matrix
+
+    def fingerprint(self) -> str:
+        """
+        列名, 収録の並びと, 特徴量ストアのスキーマとファイルの大きさ・更新時刻から求めたハッシュ
+
+        特徴量ストアが書き直されない限り同じ値になるため, 保存済みの学習・推定の結果を
+        再利用できるかどうかの確認に使う. 行列の値は読まないため, 行数によらず一定の時間で求まる
+        """
+
+        return self._fingerprint
+
+    def recording_slices(self, names: list[str]) -> list[slice]:
+        """
+        names の収録の行のスライス (隣り合う収録はまとめる)
+        """
+
+        index = {name: i for i, name in enumerate(self.names)}
+        slices: list[slice] = []
+        for i in sorted(index[name] for name in names if name in index):
+            start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+            if len(slices) > 0 and slices[-1].stop == start:
+                slices[-1] = slice(slices[-1].start, end)
+            else:
+                slices.append(slice(start, end))
+
+        return slices
+
+    def take(self, slices: list[slice]):
+        """
+        スライスの行の特徴量とラベル
+
+        スライスが1つの場合は共有メモリのビューを返し, 複数の場合は連結する
+        """
+
+        if len(slices) == 1:
+            return self.values[slices[0]], self.label[slices[0]]
+        if len(slices) == 0:
+            return self.values[:0], self.label[:0]
+
+        return (
+            np.concatenate([self.values[s] for s in slices]),
+            np.concatenate([self.label[s] for s in slices]),
+        )
+
+    def split(self, test_data_names: list[str]):
+        """
+        テストデータの収録とそれ以外の収録に分ける
+
+        Parameters
+        ----------
+        test_data_names : list[str]
+            テストデータの収録名
+
+        Returns
+        -------
+        x_train, y_train, x_test, y_test
+            DataFrame と Series. テストデータが1つの区間の場合, 学習データは
+            テストデータより後の収録, 前の収録の順に並ぶ共有メモリのビューになる.
+            そうでない場合は収録の順に連結する
+        """
+
+        test_slices = self.recording_slices(test_data_names)
+        x_test, y_test = self.take(test_slices)
+
+        n_rows = len(self.label)
+        if len(test_slices) == 0:
+            x_train, y_train = self.values, self.label
+        elif len(test_slices) == 1 and n_rows + test_slices[0].start <= len(
+            self._buffer_label
+        ):
+            # テストデータより後の行と, 後ろに置いた前の行が連続する
+            start, stop = test_slices[0].start, test_slices[0].stop
+            x_train = self._buffer_values[stop : n_rows + start]
+            y_train = self._buffer_label[stop : n_rows + start]
+        else:
+            train_names = [name for name in self.names if name not in test_data_names]
+            x_train, y_train = self.take(self.recording_slices(train_names))
+
+        return (
+            pd.DataFrame(x_train, columns=self.columns, copy=False),
+            pd.Series(y_train, name="label", copy=False),
+            pd.DataFrame(x_test, columns=self.columns, copy=False),
+            pd.Series(y_test, name="label", copy=False),
+        )
+
+    def close(self):
+        _owned.pop(self._shms[0].name, None)
+        # 共有メモリを参照する配列を先に手放す
+        self.values = self.label = None
+        for shm in self._shms:
+            shm.close()
+
+    def unlink(self):
+        """
+        共有メモリを閉じて削除する (作成したプロセスで呼ぶ)
+        """
+
+        shms = self._shms
+        self.close()
+        for shm in shms:
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
@@ -0,0 +1,74 @@
+import os
+
+# BLAS / OpenMP のスレッド数を指定する環境変数
+THREAD_ENV_VARS = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def available_cpus() -> int:
+    """
+    このプロセスが使える CPU コア数
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def split_threads(workers: int, total: int | None = None) -> tuple[int, int]:
+    """
+    コア数をプロセス数と各プロセスのスレッド数に分ける
+
+    プロセス数 × スレッド数がコア数を超えないようにする
+
+    Parameters
+    ----------
+    workers : int
+        希望するプロセス数
+    total : int, optional
+        使うコア数 (None の場合は available_cpus)
+
+    Returns
+    -------
+    workers : int
+        プロセス数 (コア数以下)
+    threads : int
+        各プロセスのライブラリのスレッド数
+    """
+
+    if total is None:
+        total = available_cpus()
+
+    workers = max(1, min(workers, total))
+    return workers, max(1, total // workers)
+
+
+def limit_threads(threads: int):
+    """
+    このプロセスの BLAS / OpenMP のスレッド数を制限する
+
+    これから読み込まれるライブラリのために環境変数を設定し,
+    読み込み済みのライブラリは threadpoolctl で制限する.
+    ProcessPoolExecutor の initializer にも使う
+
+    Parameters
+    ----------
+    threads : int
+        スレッド数
+    """
+
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+
+    threadpool_limits(limits=threads)
@@ -0,0 +1,260 @@
+import numpy as np
+
+from modules.estimation.smoothing import smooth_result_batch
+
+
+class EvaluationResult:
+    """
+    評価結果
+
+    Attributes
+    ----------
+    accuracy : float
+        正解率
+    top_k_accuracy : dict[int, float]
+        k ごとの top-k 正解率
+    smoothed_accuracy : dict[int, float]
+        スムージングのウィンドウサイズごとの正解率
+    smoothed_pred : dict[int, np.ndarray]
+        スムージングのウィンドウサイズごとの予測クラス
+    confusion_matrix : np.ndarray
+        (クラス数, クラス数) の混同行列 (行が正解, 列が予測)
+    precision : np.ndarray
+        クラスごとの適合率
+    recall : np.ndarray
+        クラスごとの再現率
+    support : np.ndarray
+        クラスごとの正解の数
+    """
+
+    def __init__(
+        self,
+        accuracy: float,
+        top_k_accuracy: dict[int, float],
+        smoothed_accuracy: dict[int, float],
+        smoothed_pred: dict[int, np.ndarray],
+        confusion_matrix: np.ndarray,
+    ):
+        self.accuracy = accuracy
+        self.top_k_accuracy = top_k_accuracy
+        self.smoothed_accuracy = smoothed_accuracy
+        self.smoothed_pred = smoothed_pred
+        self.confusion_matrix = confusion_matrix
+        self.precision, self.recall, self.support = per_class_scores(confusion_matrix)
+
+    def f1(self):
+        return _safe_divide(
+            2 * self.precision * self.recall, self.precision + self.recall
+        )
+
+    def report(self, target_names: list[str] | None = None, digits=2):
+        """
+        classification_report と同じ形式の文字列を返す (正解も予測もないクラスは省く)
+        """
+
+        class_ids = np.flatnonzero(self.support + self.confusion_matrix.sum(axis=0) > 0)
+        names = [
+            str(target_names[i]) if target_names is not None else str(i)
+            for i in class_ids
+        ]
+        width = max([len(name) for name in names] + [len("weighted avg")])
+        headers = ["precision", "recall", "f1-score", "support"]
+
+        head_fmt = "{:>{width}s} " + " {:>9}" * 4
+        row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}"
+
+        lines = [head_fmt.format("", *headers, width=width), ""]
+        f1 = self.f1()
+        for name, i in zip(names, class_ids):
+            lines.append(
+                row_fmt.format(
+                    name,
+                    self.precision[i],
+                    self.recall[i],
+                    f1[i],
+                    self.support[i],
+                    width=width,
+                    digits=digits,
+                )
+            )
+        lines.append("")
+
+        total = self.support[class_ids].sum()
+        lines.append(
+            head_fmt.format(
+                "accuracy", "", "", f"{self.accuracy:.{digits}f}", total, width=width
+            )
+        )
+        for name, weights in [
+            ("macro avg", np.ones(len(class_ids))),
+            ("weighted avg", self.support[class_ids]),
+        ]:
+            scores = [
+                np.average(s[class_ids], weights=weights) if weights.sum() else 0.0
+                for s in (self.precision, self.recall, f1)
+            ]
+            lines.append(
+                row_fmt.format(name, *scores, total, width=width, digits=digits)
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray):
+    # 0 で割る場合は 0 にする (classification_report の zero_division=0 と同じ)
+    return np.divide(
+        numerator,
+        denominator,
+        out=np.zeros(np.shape(numerator), dtype=np.float64),
+        where=denominator != 0,
+    )
+
+
+def rank_hits(ranking: np.ndarray, y_true: np.ndarray):
+    """
+    各行の順位 (クラス id の並び) に正解が含まれるかどうか
+
+    Parameters
+    ----------
+    ranking : np.ndarray
+        (n, k) のクラス id
+    y_true : np.ndarray
+        (n,) の正解ラベル
+
+    Returns
+    -------
+    hits : np.ndarray
+        (n,) の bool
+    """
+
+    y_true = np.asarray(y_true)
+    return (np.asarray(ranking) == y_true[:, np.newaxis]).any(axis=1)
+
+
+def top_k_hits(pred_proba: np.ndarray, y_true: np.ndarray, ks: list[int]):
+    """
+    1回の argsort から、複数の k の top-k に正解が含まれるかどうかを求める
+
+    Returns
+    -------
+    hits : dict[int, np.ndarray]
+        k ごとの (n,) の bool
+    """
+
+    # 並び順は np.argsort(pred_proba, axis=1)[:, -k:] と同じ
+    order = np.argsort(pred_proba, axis=1)
+    return {k: rank_hits(order[:, order.shape[1] - k :], y_true) for k in ks}
+
+
+def confusion_matrix(y_true: np.ndarray, pred: np.ndarray, num_class: int):
+    """
+    np.bincount で混同行列を求める (行が正解, 列が予測)
+    """
+
+    y_true = np.asarray(y_true, dtype=np.int64)
+    pred = np.asarray(pred, dtype=np.int64)
+    num_class = max(
+        num_class,
+        int(y_true.max(initial=-1)) + 1,
+        int(pred.max(initial=-1)) + 1,
+    )
+
+    return np.bincount(
+        y_true * num_class + pred, minlength=num_class * num_class
+    ).reshape(num_class, num_class)
+
+
+def per_class_scores(confusion: np.ndarray):
+    """
+    混同行列からクラスごとの適合率, 再現率, 正解の数を求める
+    """
+
+    tp = np.diag(confusion)
+    support = confusion.sum(axis=1)
+    precision = _safe_divide(tp, confusion.sum(axis=0))
+    recall = _safe_divide(tp, support)
+
+    return precision, recall, support
+
+
+def classification_report(
+    y_true: np.ndarray,
+    pred: np.ndarray,
+    num_class=0,
+    target_names: list[str] | None = None,
+):
+    """
+    予測クラスだけから classification_report と同じ形式の文字列を求める
+    """
+
+    y_true = np.asarray(y_true)
+    pred = np.asarray(pred)
+    result = EvaluationResult(
+        float(np.mean(pred == y_true)),
+        {},
+        {},
+        {},
+        confusion_matrix(y_true, pred, num_class),
+    )
+    return result.report(target_names=target_names)
+
+
+def evaluate(
+    pred_proba: np.ndarray,
+    y_true: np.ndarray,
+    ks: list[int] | None = None,
+    smooth_window_sizes: list[int] | None = None,
+    pred: np.ndarray | None = None,
+):
+    """
+    予測確率と正解ラベルから、正解率, top-k 正解率, スムージング後の正解率,
+    混同行列, クラスごとの適合率と再現率をまとめて求める
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    y_true : np.ndarray
+        (n,) の正解ラベル (クラス id)
+    ks : list[int], optional
+        top-k の k のリスト. None の場合は [1]
+    smooth_window_sizes : list[int], optional
+        スムージングのウィンドウサイズのリスト. None の場合はスムージングしない
+    pred : np.ndarray | None
+        予測クラス. None の場合は pred_proba の argmax
+
+    Returns
+    -------
+    result : EvaluationResult
+        評価結果
+    """
+
+    if ks is None:
+        ks = [1]
+    if smooth_window_sizes is None:
+        smooth_window_sizes = []
+
+    pred_proba = np.asarray(pred_proba)
+    y_true = np.asarray(y_true)
+    if pred is None:
+        pred = np.argmax(pred_proba, axis=1)
+
+    accuracy = float(np.mean(pred == y_true))
+    top_k_accuracy = {
+        k: float(np.mean(hits))
+        for k, hits in top_k_hits(pred_proba, y_true, ks).items()
+    }
+
+    smoothed_pred = smooth_result_batch(pred_proba, smooth_window_sizes)
+    smoothed_accuracy = {
+        window_size: float(np.mean(sp == y_true[: len(sp)]))
+        for window_size, sp in smoothed_pred.items()
+    }
+
+    return EvaluationResult(
+        accuracy,
+        top_k_accuracy,
+        smoothed_accuracy,
+        smoothed_pred,
+        confusion_matrix(y_true, pred, pred_proba.shape[1]),
+    )
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+
+# pandas は順位付けで使うときに読み込む (モデルの読み込みでは使わない)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 保存する特徴量の部分集合の形式のバージョン
+FEATURE_SUBSET_VERSION = 1
+
+RankingMethod = Literal["importance", "anova", "variance"]
+
+
+def drop_redundant(columns: list[str]) -> list[str]:
+    """
+    冗長な特徴量の列を除く
+
+    std は var の単調変換で、決定木の分割は同じになるため、
+    同じ列の var がある場合は std を除く
+    """
+
+    column_set = set(columns)
+    return [
+        column
+        for column in columns
+        if not (
+            column.endswith("-std") and f"{column[: -len('-std')]}-var" in column_set
+        )
+    ]
+
+
+def rank_by_importance(model, x: pd.DataFrame, y: pd.Series) -> pd.Series:
+    """
+    モデルを学習し、特徴量の重要度の大きい順に列を並べる
+
+    Parameters
+    ----------
+    model : Model
+        学習していないモデル
+    x : pd.DataFrame
+        特徴量
+    y : pd.Series
+        ラベル
+
+    Returns
+    -------
+    ranking : pd.Series
+        列名をインデックスとする重要度 (大きい順)
+    """
+
+    import pandas as pd
+
+    model.fit(x, y)
+    importances = pd.Series(model.model.feature_importances_, index=x.columns)
+    return importances.sort_values(ascending=False, kind="stable")
+
+
+def rank_by_filter(x: pd.DataFrame, y: pd.Series, method="anova") -> pd.Series:
+    """
+    学習せずに求められる指標の大きい順に列を並べる
+
+    Parameters
+    ----------
+    x : pd.DataFrame
+        特徴量
+    y : pd.Series
+        ラベル
+    method : str
+        "anova" (クラス間の F 値) または "variance" (分散)
+
+    Returns
+    -------
+    ranking : pd.Series
+        列名をインデックスとする指標 (大きい順)
+    """
+
+    import pandas as pd
+
+    match method:
+        case "anova":
+            from sklearn.feature_selection import f_classif
+
+            scores, _ = f_classif(x, y)
+        case "variance":
+            scores = x.var().to_numpy()
+        case _:
+            raise ValueError(f"unknown method: {method}")
+
+    scores = np.nan_to_num(np.asarray(scores, dtype=np.float64), nan=0.0)
+    return pd.Series(scores, index=x.columns).sort_values(
+        ascending=False, kind="stable"
+    )
+
+
+def rank_features(
+    x: pd.DataFrame,
+    y: pd.Series,
+    method: RankingMethod = "importance",
+    model=None,
+    drop_std=True,
+) -> pd.Series:
+    """
+    特徴量の列を順位付けする
+
+    Parameters
+    ----------
+    x : pd.DataFrame
+        特徴量
+    y : pd.Series
+        ラベル
+    method : str
+        "importance" (モデルの重要度), "anova", "variance"
+    model : Model, optional
+        method が "importance" の場合に学習するモデル
+    drop_std : bool
+        冗長な std の列を除くかどうか
+
+    Returns
+    -------
+    ranking : pd.Series
+        列名をインデックスとする指標 (大きい順)
+    """
+
+    if drop_std:
+        x = x[drop_redundant(list(x.columns))]
+
+    if method == "importance":
+        if model is None:
+            raise ValueError("model is required for importance ranking")
+        return rank_by_importance(model, x, y)
+
+    return rank_by_filter(x, y, method)
+
+
+def select_features(ranking: pd.Series, n_features: int) -> list[str]:
+    """
+    順位の上位 n_features 個の列を選ぶ
+    """
+
+    return list(ranking.index[:n_features])
+
+
+def feature_subset_key(columns: list[str]) -> str:
+    """
+    特徴量の部分集合を区別する短いハッシュ (出力するディレクトリ名などに使う)
+    """
+
+    content = json.dumps(list(columns), ensure_ascii=False).encode()
+    return hashlib.sha1(content).hexdigest()[:12]
+
+
+def feature_subset_path(model_path: str):
+    """
+    モデルと一緒に保存する特徴量の部分集合のパス
+    """
+
+    return f"{os.path.splitext(model_path)[0]}.columns.json"
+
+
+def save_feature_subset(path: str, columns: list[str], **metadata):
+    """
+    特徴量の部分集合を JSON で保存する
+
+    Parameters
+    ----------
+    path : str
+        保存するパス
+    columns : list[str]
+        特徴量の列
+    **metadata
+        一緒に保存する情報 (順位付けの方法など)
+    """
+
+    content = {"version": FEATURE_SUBSET_VERSION, "columns": list(columns)}
+    content.update(metadata)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(content, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_feature_subset(path: str) -> list[str]:
+    """
+    保存した特徴量の部分集合を読み込む
+    """
+
+    with open(path) as f:
+        content = json.load(f)
+
+    if content.get("version") != FEATURE_SUBSET_VERSION:
+        raise ValueError(
+            f"unsupported feature subset version: {content.get('version')}"
+        )
+
+    return list(content["columns"])
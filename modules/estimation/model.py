@@ -1,49 +1,228 @@
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
-from lightgbm import LGBMClassifier
 from typing import Literal
+import os
 import pickle
+import sys
+import numpy as np
+
+from modules.estimation.feature_selection import (
+    feature_subset_path,
+    load_feature_subset,
+    save_feature_subset,
+)
+from modules.estimation.model_store import (
+    is_dataframe,
+    load_estimator,
+    read_meta,
+    write_model_store,
+)
 
 ModelType = Literal["randomforest", "xgboost", "lightgbm"]
 
 
+def _is_xgboost(estimator) -> bool:
+    # xgboost が読み込まれていなければ XGBClassifier ではない
+    xgboost = sys.modules.get("xgboost")
+    return xgboost is not None and isinstance(estimator, xgboost.XGBClassifier)
+
+
 class Model:
-    def __init__(self, type: ModelType, num_class: int | None = None):
+    def __init__(
+        self,
+        type: ModelType,
+        num_class: int | None = None,
+        feature_columns: list[str] | None = None,
+        n_jobs: int | None = None,
+    ):
+        self.type = type
+        self.num_class = num_class
+        # 学習・推定に使う特徴量の列 (None の場合はすべての列)
+        self.feature_columns = feature_columns
+        # 学習・推定のスレッド数 (None の場合はライブラリの既定値)
+        self.n_jobs = n_jobs
+        # open で開いたモデルは最初に使うときに読み込む
+        self._loader = None
+
+        # バックエンドは使うものだけを読み込む
         match type:
             case "randomforest":
-                self.model = RandomForestClassifier()
+                from sklearn.ensemble import RandomForestClassifier
+
+                self.model = RandomForestClassifier(n_jobs=n_jobs)
             case "xgboost":
+                from xgboost import XGBClassifier
+
                 self.model = XGBClassifier(
                     objective="multi:softmax",
                     num_class=num_class,
                     eval_metric="mlogloss",
+                    n_jobs=n_jobs,
                 )
             case "lightgbm":
                 if num_class is None:
                     raise ValueError("num_class is required for lightgbm")
 
+                from lightgbm import LGBMClassifier
+
                 self.model = LGBMClassifier(
-                    objective="multiclass", num_class=num_class, force_col_wise=True
+                    objective="multiclass",
+                    num_class=num_class,
+                    force_col_wise=True,
+                    n_jobs=n_jobs,
                 )
 
+    @property
+    def model(self):
+        if self._loader is not None:
+            self._model = self._loader()
+            self._loader = None
+
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._loader = None
+
+    def select(self, x):
+        if self.feature_columns is None:
+            return x
+        if is_dataframe(x):
+            return x[self.feature_columns]
+
+        # 列名のない配列は部分集合の列だけを持つ場合のみ使える
+        n_columns = np.shape(x)[1]
+        if n_columns != len(self.feature_columns):
+            raise ValueError(
+                f"array input has {n_columns} columns but the model uses a subset of "
+                f"{len(self.feature_columns)} features; pass a DataFrame to select them"
+            )
+        return x
+
     def predict(self, x):
-        return self.model.predict(x)
+        return self.model.predict(self.select(x))
 
     def predict_proba(self, x):
-        return self.model.predict_proba(x)
+        return self.model.predict_proba(self.select(x))
+
+    def predict_with_proba(self, x):
+        """
+        1回の推論で予測クラスと予測確率を求める
+
+        Parameters
+        ----------
+        x : pd.DataFrame
+            特徴量
+
+        Returns
+        -------
+        pred : np.ndarray
+            予測クラス (predict と同じ値)
+        pred_proba : np.ndarray
+            予測確率 (predict_proba と同じ値)
+        """
+
+        x = self.select(x)
+        if _is_xgboost(self.model):
+            from scipy.special import softmax
+
+            # multi:softmax の predict はマージンの argmax, predict_proba はマージンの softmax
+            margin = self.model.predict(x, output_margin=True)
+            pred = np.argmax(margin, axis=1).astype(np.int32)
+            return pred, softmax(margin, axis=1)
+
+        # RandomForest, LightGBM の predict は predict_proba の argmax をラベルに戻したもの
+        pred_proba = self.model.predict_proba(x)
+        pred = self.model.classes_[np.argmax(pred_proba, axis=1)]
+        return pred, pred_proba
 
     def fit(self, x, y):
-        return self.model.fit(x, y)
+        return self.model.fit(self.select(x), y)
 
     def dump(self, path: str):
         with open(path, "wb") as f:
             pickle.dump(self.model, f)
 
+        # 特徴量の部分集合をモデルと一緒に保存する
+        if self.feature_columns is not None:
+            save_feature_subset(feature_subset_path(path), self.feature_columns)
+
+    def save(self, path: str, labels: list[str] | None = None):
+        """
+        バックエンドごとのネイティブ形式でモデルを保存する
+
+        path のディレクトリにモデルのファイルと meta.json (クラス数, ラベル,
+        特徴量の列) を保存する. pickle と違い, 読み込みにモデルのクラスの復元が要らない
+
+        Parameters
+        ----------
+        path : str
+            保存するディレクトリ (.model)
+        labels : list[str], optional
+            クラス ID 順のラベル名
+        """
+
+        feature_names = getattr(self.model, "feature_names_in_", None)
+        meta = {
+            "type": self.type,
+            "num_class": self.num_class,
+            "labels": None if labels is None else list(labels),
+            "feature_columns": self.feature_columns,
+            "feature_names": None if feature_names is None else list(feature_names),
+            "classes": np.asarray(self.model.classes_).tolist(),
+        }
+        write_model_store(self.model, meta, path)
+
+    @classmethod
+    def open(self, path: str, mmap=True, n_jobs: int | None = None):
+        """
+        save で保存したモデルを開く
+
+        メタデータだけを読み込み, モデル本体は最初に推定するときに読み込む.
+        RandomForest の配列はメモリマップで開く
+
+        Parameters
+        ----------
+        path : str
+            save で保存したディレクトリ
+        mmap : bool
+            RandomForest の配列をメモリマップで開くかどうか
+        n_jobs : int, optional
+            推定のスレッド数 (None の場合はライブラリの既定値)
+
+        Returns
+        -------
+        model : Model
+            推定用のモデル (学習はできない)
+        """
+
+        meta = read_meta(path)
+        model = self.__new__(self)
+        model.type = meta["type"]
+        model.num_class = meta["num_class"]
+        model.feature_columns = meta.get("feature_columns")
+        model.n_jobs = n_jobs
+        model._model = None
+        model._loader = lambda: load_estimator(path, meta, mmap=mmap, n_jobs=n_jobs)
+
+        return model
+
     @classmethod
-    def load(self, path: str, type: ModelType, num_class: int | None = None):
+    def load(
+        self,
+        path: str,
+        type: ModelType,
+        num_class: int | None = None,
+        n_jobs: int | None = None,
+    ):
         # モデルのタイプに応じて初期化
-        model = self(type, num_class)
+        model = self(type, num_class, n_jobs=n_jobs)
         with open(path, "rb") as f:
             model.model = pickle.load(f)  # 保存されたモデルを読み込む
+        if n_jobs is not None:
+            model.model.set_params(n_jobs=n_jobs)
+
+        subset_path = feature_subset_path(path)
+        if os.path.exists(subset_path):
+            model.feature_columns = load_feature_subset(subset_path)
 
         return model
@@ -0,0 +1,330 @@
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+# ネイティブ形式のモデルのディレクトリの拡張子
+MODEL_STORE_SUFFIX = ".model"
+MODEL_STORE_VERSION = 1
+
+META_FILE = "meta.json"
+XGBOOST_FILE = "model.ubj"
+LIGHTGBM_FILE = "model.txt"
+
+# 決定木の森の配列 (すべての木のノードを連結したもの)
+FOREST_ARRAYS = [
+    "tree_offsets",
+    "children_left",
+    "children_right",
+    "feature",
+    "threshold",
+    "missing_go_to_left",
+    "leaf_index",
+    "leaf_values",
+    "classes",
+]
+
+
+def is_dataframe(x) -> bool:
+    """
+    x が pandas の DataFrame かどうか
+
+    pandas が読み込まれていなければ DataFrame ではない.
+    推定のためだけに pandas を読み込まないようにする
+    """
+
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(x, pandas.DataFrame)
+
+
+class NativeForest:
+    """
+    配列として保存した RandomForestClassifier で推定する
+
+    配列はメモリマップで開き、推定で参照したページだけが読み込まれる.
+    分岐は sklearn と同じく X を float32 にしてから threshold 以下を左とし,
+    木ごとの確率を木の順に足してから木の数で割るため、predict_proba と同じ値になる
+    """
+
+    def __init__(self, path: str, feature_names: list[str] | None = None, mmap=True):
+        mmap_mode = "r" if mmap else None
+        for name in FOREST_ARRAYS:
+            setattr(
+                self,
+                name,
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode),
+            )
+        self.feature_names = feature_names
+
+    @property
+    def classes_(self):
+        return self.classes
+
+    def _to_array(self, x) -> np.ndarray:
+        if is_dataframe(x):
+            if self.feature_names is not None:
+                x = x[self.feature_names]
+            x = x.to_numpy()
+        return np.asarray(x, dtype=np.float32)
+
+    def apply(self, x) -> np.ndarray:
+        """
+        (サンプル数, 木の数) の到達した葉のノード番号 (すべての木で通し番号)
+        """
+
+        x = self._to_array(x)
+        roots = np.asarray(self.tree_offsets[:-1])
+        nodes = np.tile(roots, len(x))
+        samples = np.repeat(np.arange(len(x)), len(roots))
+
+        # 葉に到達していないものだけを1段ずつ進める
+        active = np.arange(len(nodes))
+        while len(active) > 0:
+            node = nodes[active]
+            left = self.children_left[node]
+            internal = left >= 0
+            active, node, left = active[internal], node[internal], left[internal]
+
+            values = x[samples[active], self.feature[node]]
+            go_left = values <= self.threshold[node]
+            missing = np.isnan(values)
+            go_left[missing] = self.missing_go_to_left[node[missing]] != 0
+
+            nodes[active] = np.where(go_left, left, self.children_right[node])
+
+        return nodes.reshape(len(x), len(roots))
+
+    def predict_proba(self, x) -> np.ndarray:
+        leaves = self.apply(x)
+        proba = np.zeros((len(leaves), len(self.classes)))
+        for tree in range(leaves.shape[1]):
+            proba += self.leaf_values[self.leaf_index[leaves[:, tree]]]
+        proba /= leaves.shape[1]
+
+        return proba
+
+    def predict(self, x) -> np.ndarray:
+        return self.classes[np.argmax(self.predict_proba(x), axis=1)]
+
+
+class NativeLightGBM:
+    """
+    テキスト形式で保存した LightGBM のモデルで推定する
+    """
+
+    def __init__(
+        self,
+        path: str,
+        classes: np.ndarray,
+        feature_names: list[str] | None = None,
+        n_jobs: int | None = None,
+    ):
+        from lightgbm import Booster
+
+        self.booster = Booster(model_file=path)
+        self.classes = np.asarray(classes)
+        self.feature_names = feature_names
+        self.n_jobs = n_jobs
+
+    @property
+    def classes_(self):
+        return self.classes
+
+    def predict_proba(self, x) -> np.ndarray:
+        if is_dataframe(x) and self.feature_names is not None:
+            x = x[self.feature_names]
+        if self.n_jobs is not None:
+            return self.booster.predict(x, num_threads=self.n_jobs)
+        return self.booster.predict(x)
+
+    def predict(self, x) -> np.ndarray:
+        return self.classes[np.argmax(self.predict_proba(x), axis=1)]
+
+
+def _tree_value_is_proba() -> bool:
+    # sklearn 1.4 以降の tree_.value はクラスの割合, それより前は (重み付きの) サンプル数
+    import sklearn
+
+    major, minor = (int(v) for v in sklearn.__version__.split(".")[:2])
+    return (major, minor) >= (1, 4)
+
+
+def _leaf_proba(values: np.ndarray) -> np.ndarray:
+    """
+    tree_.value の (ノード数, クラス数) の値を, 葉ごとの確率にする
+
+    sklearn 1.4 より前はサンプル数のため, DecisionTreeClassifier.predict_proba と
+    同じく合計で割る. 1.4 以降は predict_proba もそのまま使うため割らない
+    """
+
+    if _tree_value_is_proba():
+        return values
+
+    normalizer = values.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return values / normalizer
+
+
+def _save_forest(estimator, path: str):
+    trees = [e.tree_ for e in estimator.estimators_]
+    node_counts = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(node_counts)]).astype(np.int64)
+
+    def concat_children(name: str):
+        # 子のノード番号をすべての木での通し番号にする (葉は -1 のまま)
+        return np.concatenate(
+            [
+                np.where(children >= 0, children + offset, -1)
+                for children, offset in (
+                    (getattr(tree, name), offset)
+                    for tree, offset in zip(trees, offsets)
+                )
+            ]
+        ).astype(np.int64)
+
+    children_left = concat_children("children_left")
+    is_leaf = children_left < 0
+    values = _leaf_proba(np.concatenate([tree.value[:, 0, :] for tree in trees]))
+
+    leaf_index = np.full(len(children_left), -1, dtype=np.int64)
+    leaf_index[is_leaf] = np.arange(is_leaf.sum())
+
+    arrays = {
+        "tree_offsets": offsets,
+        "children_left": children_left,
+        "children_right": concat_children("children_right"),
+        "feature": np.concatenate([tree.feature for tree in trees]).astype(np.int64),
+        "threshold": np.concatenate([tree.threshold for tree in trees]),
+        "missing_go_to_left": np.concatenate(
+            [
+                getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, np.uint8))
+                for tree in trees
+            ]
+        ).astype(np.uint8),
+        "leaf_index": leaf_index,
+        "leaf_values": np.ascontiguousarray(values[is_leaf], dtype=np.float64),
+        "classes": np.asarray(estimator.classes_),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+
+
+def save_estimator(estimator, type: str, path: str):
+    """
+    学習済みのモデルをバックエンドごとのネイティブ形式で保存する
+
+    Parameters
+    ----------
+    estimator : RandomForestClassifier | XGBClassifier | LGBMClassifier
+        学習済みのモデル
+    type : ModelType
+        モデルのタイプ
+    path : str
+        保存するディレクトリ
+
+    Returns
+    -------
+    files : list[str]
+        保存したファイル名
+    """
+
+    match type:
+        case "randomforest":
+            _save_forest(estimator, path)
+            return [f"{name}.npy" for name in FOREST_ARRAYS]
+        case "xgboost":
+            estimator.save_model(os.path.join(path, XGBOOST_FILE))
+            return [XGBOOST_FILE]
+        case "lightgbm":
+            estimator.booster_.save_model(os.path.join(path, LIGHTGBM_FILE))
+            return [LIGHTGBM_FILE]
+
+    raise ValueError(f"unknown model type: {type}")
+
+
+def load_estimator(path: str, meta: dict, mmap=True, n_jobs: int | None = None):
+    """
+    save_estimator で保存したモデルを読み込む
+
+    Parameters
+    ----------
+    path : str
+        保存したディレクトリ
+    meta : dict
+        read_meta で読み込んだメタデータ
+    mmap : bool
+        RandomForest の配列をメモリマップで開くかどうか
+    n_jobs : int, optional
+        XGBoost, LightGBM の推定のスレッド数
+
+    Returns
+    -------
+    estimator : NativeForest | XGBClassifier | NativeLightGBM
+        推定に使うモデル
+    """
+
+    match meta["type"]:
+        case "randomforest":
+            return NativeForest(path, meta.get("feature_names"), mmap=mmap)
+        case "xgboost":
+            from xgboost import XGBClassifier
+
+            estimator = XGBClassifier(n_jobs=n_jobs)
+            estimator.load_model(os.path.join(path, XGBOOST_FILE))
+            return estimator
+        case "lightgbm":
+            return NativeLightGBM(
+                os.path.join(path, LIGHTGBM_FILE),
+                np.array(meta["classes"]),
+                meta.get("feature_names"),
+                n_jobs,
+            )
+
+    raise ValueError(f"unknown model type: {meta['type']}")
+
+
+def write_model_store(estimator, meta: dict, path: str):
+    """
+    モデルとメタデータをディレクトリに保存する
+
+    書き込み中のディレクトリは一時ディレクトリに置き、完了してから置き換える
+
+    Parameters
+    ----------
+    estimator : RandomForestClassifier | XGBClassifier | LGBMClassifier
+        学習済みのモデル
+    meta : dict
+        メタデータ (type, num_class, labels, feature_columns など)
+    path : str
+        保存するディレクトリ
+    """
+
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    files = save_estimator(estimator, meta["type"], tmp_path)
+    content = {"version": MODEL_STORE_VERSION, **meta, "files": files}
+    with open(os.path.join(tmp_path, META_FILE), "w") as f:
+        json.dump(content, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def read_meta(path: str) -> dict:
+    """
+    モデルのメタデータを読み込む
+    """
+
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    if meta.get("version") != MODEL_STORE_VERSION:
+        raise ValueError(f"unsupported model store version: {meta.get('version')}")
+
+    return meta
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+# 結果のデータベースのファイル名 (pipeline の出力ディレクトリに置く)
+RESULTS_DB_FILE = "results.sqlite"
+RESULTS_DB_VERSION = 1
+
+# 結果を区別するキー (この組み合わせと metric で1つの値になる)
+RESULT_KEYS = ["model", "segment_w", "segment_gap", "smooth_w", "fold"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    model TEXT NOT NULL,
+    segment_w INTEGER NOT NULL,
+    segment_gap INTEGER NOT NULL,
+    smooth_w INTEGER NOT NULL,
+    fold TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (model, segment_w, segment_gap, smooth_w, fold, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_metric ON results (metric, model);
+"""
+
+_UPSERT = """
+INSERT INTO results (
+    model, segment_w, segment_gap, smooth_w, fold, metric, value, updated_at
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (model, segment_w, segment_gap, smooth_w, fold, metric)
+DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+
+class ResultsStore:
+    """
+    グリッドの結果を保存する SQLite のデータベース
+
+    1行は (モデル, ウィンドウサイズ, ウィンドウの間隔, スムージングの幅, フォールド) の
+    1つの指標の値. 指標は列ではなく行にするため, 任意の指標を追加できる.
+    同じキーの結果を書き込むと上書きする
+
+    Parameters
+    ----------
+    path : str
+        データベースのファイル
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, RESULTS_DB_VERSION):
+            self.connection.close()
+            raise ValueError(f"unsupported results db version: {version}")
+
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {RESULTS_DB_VERSION}")
+
+    def write(self, rows: list[dict] | pd.DataFrame):
+        """
+        結果を書き込む
+
+        Parameters
+        ----------
+        rows : list[dict] | pd.DataFrame
+            RESULT_KEYS と指標の列を持つ行 (results.csv と同じ形式).
+            RESULT_KEYS 以外の列はすべて指標として保存する
+        """
+
+        results = pd.DataFrame(rows)
+        if len(results) == 0:
+            return
+
+        missing = [key for key in RESULT_KEYS if key not in results.columns]
+        if missing:
+            raise ValueError(f"missing result keys: {missing}")
+
+        long = results.melt(id_vars=RESULT_KEYS, var_name="metric", value_name="value")
+        long = long.astype({"segment_w": int, "segment_gap": int, "smooth_w": int})
+        long["fold"] = long["fold"].astype(str)
+        long["value"] = long["value"].astype(float)
+        long["updated_at"] = time.time()
+
+        with self.connection:
+            self.connection.executemany(
+                _UPSERT,
+                long[[*RESULT_KEYS, "metric", "value", "updated_at"]].itertuples(
+                    index=False, name=None
+                ),
+            )
+
+    def metrics(self) -> list[str]:
+        """
+        保存されている指標の名前
+        """
+
+        rows = self.connection.execute("SELECT DISTINCT metric FROM results")
+        return sorted(metric for (metric,) in rows)
+
+    def query(self, metric: str | list[str] | None = None, **filters) -> pd.DataFrame:
+        """
+        結果を読み込む
+
+        Parameters
+        ----------
+        metric : str | list[str], optional
+            読み込む指標. None の場合はすべての指標
+        **filters
+            RESULT_KEYS の値で絞り込む (例: model="xgboost", fold="4_5")
+
+        Returns
+        -------
+        results : pd.DataFrame
+            RESULT_KEYS, metric, value の列を持つ表
+        """
+
+        conditions = []
+        params: list = []
+        if metric is not None:
+            metrics = [metric] if isinstance(metric, str) else list(metric)
+            conditions.append(f"metric IN ({', '.join('?' * len(metrics))})")
+            params.extend(metrics)
+
+        for key, value in filters.items():
+            if key not in RESULT_KEYS:
+                raise ValueError(f"unknown result key: {key}")
+            conditions.append(f"{key} = ?")
+            params.append(value)
+
+        sql = f"SELECT {', '.join(RESULT_KEYS)}, metric, value FROM results"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def pivot(
+        self,
+        metric: str,
+        index="segment_w",
+        columns="smooth_w",
+        by: str | None = "model",
+        aggfunc="mean",
+        **filters,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        1つの指標を index × columns の表にする
+
+        複数のフォールドなど, 同じセルに複数の値がある場合は aggfunc でまとめる
+
+        Parameters
+        ----------
+        metric : str
+            指標
+        index, columns : str
+            表の行と列にするキー
+        by : str, optional
+            表を分けるキー. None の場合は1つの表にする
+        aggfunc : str
+            同じセルの値のまとめ方 ("mean", "max", "count" など)
+        **filters
+            RESULT_KEYS の値で絞り込む
+
+        Returns
+        -------
+        tables : dict[str, pd.DataFrame]
+            by の値ごとの表 (by が None の場合はキーが "all")
+        """
+
+        results = self.query(metric, **filters)
+        if by is None:
+            groups = [("all", results)]
+        else:
+            groups = results.groupby(by, sort=True)
+
+        return {
+            str(name): group.pivot_table(
+                index=index, columns=columns, values="value", aggfunc=aggfunc
+            )
+            .sort_index(axis=0)
+            .sort_index(axis=1)
+            for name, group in groups
+        }
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,363 @@
+import numpy as np
+
+
+def _block_sums(x: np.ndarray, window_size: int, count: int) -> np.ndarray:
+    # x を window_size 行ごとのブロックに分け, i 番目から window_size 個の和を
+    # 「i を含むブロックの i 以降の和 + 次のブロックの先頭から i + window_size 未満の和」
+    # で求める. 1つの和に足す回数は window_size - 1 以下になる
+    n_columns = x.shape[1]
+    n_blocks = -(-(count + window_size) // window_size)
+    blocks = np.zeros((n_blocks, window_size, n_columns))
+    blocks.reshape(-1, n_columns)[: len(x)] = x
+
+    suffix = np.cumsum(blocks[:-1, ::-1], axis=1)[:, ::-1]
+    sums = np.zeros((n_blocks - 1, window_size, n_columns))
+    np.cumsum(blocks[1:, :-1], axis=1, out=sums[:, 1:])
+    sums += suffix
+
+    return sums.reshape(-1, n_columns)[:count]
+
+
+class WindowedProbaSum:
+    """
+    pred_proba の任意のウィンドウサイズの移動和を O(n·C) で求める
+
+    移動和はウィンドウサイズごとのブロックの前方・後方の累積和から求めるため,
+    丸め誤差はウィンドウサイズに比例し, 収録の長さには依存しない.
+    np.sum とは丸め誤差が異なるため, 順位に関わるクラスの差が誤差の範囲に
+    収まる位置だけ np.sum と同じ順で足し直し, 元の実装と同じ結果にする
+    """
+
+    def __init__(self, pred_proba: np.ndarray):
+        self.pred_proba = np.asarray(pred_proba, dtype=np.float64)
+        # 負の値がなければ, 和が 0 のクラスはウィンドウ内がすべて 0 で np.sum でも 0
+        self.nonnegative = bool((self.pred_proba >= 0).all())
+
+    def __len__(self):
+        return len(self.pred_proba)
+
+    def _range(self, window_size: int, start: int, stop: int | None):
+        n = len(self.pred_proba) - window_size
+        return start, max(n if stop is None else min(stop, n), start)
+
+    def sums(self, window_size: int, start=0, stop: int | None = None):
+        """
+        i 番目から window_size 個の和 (i = start, ..., stop - 1)
+
+        stop を省略した場合は len - window_size まで
+        """
+
+        if window_size < 0:
+            raise ValueError(f"window_size must not be negative: {window_size}")
+
+        start, stop = self._range(window_size, start, stop)
+        if window_size == 0:
+            # 元の実装と同じく, 空のウィンドウの和は 0
+            return np.zeros((stop - start, self.pred_proba.shape[1]))
+
+        return _block_sums(
+            self.pred_proba[start : stop + window_size], window_size, stop - start
+        )
+
+    def tolerance(self, sums: np.ndarray, window_size: int, start=0):
+        """
+        sums の各行で, 2つのクラスの大小が np.sum と変わりうる差の上限
+
+        sums と np.sum の誤差はどちらも (window_size - 1) · u · Σ|x| 以下
+        (u = eps / 2) のため, その2倍に余裕を持たせた値にする
+        """
+
+        if self.nonnegative or window_size == 0:
+            magnitude = sums.max(axis=1, initial=0.0)
+        else:
+            stop = start + len(sums)
+            x = np.abs(self.pred_proba[start : stop + window_size])
+            magnitude = _block_sums(x, window_size, len(sums)).max(axis=1, initial=0.0)
+
+        return 2 * (window_size + 1) * np.finfo(np.float64).eps * magnitude
+
+    def exact_sums(self, rows: np.ndarray, window_size: int):
+        """
+        指定した位置の和を元の実装 (np.sum(..., axis=0)) と同じく先頭の行から順に足す
+        """
+
+        sums = np.zeros((len(rows), self.pred_proba.shape[1]))
+        for offset in range(window_size):
+            sums += self.pred_proba[rows + offset]
+
+        return sums
+
+
+def _largest(sums: np.ndarray, count: int):
+    # 各行の大きい方から count 個の値 (昇順)
+    if count < sums.shape[1]:
+        sums = np.partition(sums, -count, axis=1)[:, -count:]
+    return np.sort(sums, axis=1)
+
+
+def _ambiguous_rows(
+    sorted_sums: np.ndarray, tolerance: np.ndarray, nonnegative: bool
+) -> np.ndarray:
+    # 隣り合う順位の差が誤差の範囲に収まる位置.
+    # ただし, どちらも 0 のクラス (ウィンドウ内がすべて 0) はどちらの計算でも 0 で同点になる
+    ambiguous = np.diff(sorted_sums, axis=1) <= tolerance[:, np.newaxis]
+    if nonnegative:
+        ambiguous &= sorted_sums[:, 1:] != 0
+    return np.flatnonzero(ambiguous.any(axis=1))
+
+
+def _exact_sums(
+    windowed: WindowedProbaSum,
+    sums: np.ndarray,
+    sorted_sums: np.ndarray,
+    window_size: int,
+) -> np.ndarray:
+    # 順位が変わりうる行だけ np.sum と同じ値にして, その行の番号を返す
+    tolerance = windowed.tolerance(sums, window_size)
+    rows = _ambiguous_rows(sorted_sums, tolerance, windowed.nonnegative)
+    if len(rows) > 0:
+        sums[rows] = windowed.exact_sums(rows, window_size)
+    return rows
+
+
+def _smooth_argmax(windowed: WindowedProbaSum, window_size: int):
+    if len(windowed) - window_size <= 0:
+        return np.array([])
+
+    sums = windowed.sums(window_size)
+    _exact_sums(windowed, sums, _largest(sums, 2), window_size)
+    return np.argmax(sums, axis=1)
+
+
+def _smooth_ranking(windowed: WindowedProbaSum, window_size: int):
+    if len(windowed) - window_size <= 0:
+        return np.array([])
+
+    sums = windowed.sums(window_size)
+    order = np.argsort(sums, axis=1)
+    sorted_sums = np.take_along_axis(sums, order, axis=1)
+    rows = _exact_sums(windowed, sums, sorted_sums, window_size)
+    if len(rows) > 0:
+        order[rows] = np.argsort(sums[rows], axis=1)
+
+    # 大きい順
+    return order[:, ::-1]
+
+
+def _candidates(sums: np.ndarray, count: int):
+    # 各行の大きい方から count 個のクラスと値 (大きい順)
+    n_classes = sums.shape[1]
+    if count < n_classes:
+        indices = np.argpartition(sums, n_classes - count, axis=1)[:, -count:]
+    else:
+        indices = np.broadcast_to(np.arange(n_classes), sums.shape)
+    values = np.take_along_axis(sums, indices, axis=1)
+
+    order = np.argsort(-values, axis=1)
+    return (
+        np.take_along_axis(indices, order, axis=1),
+        np.take_along_axis(values, order, axis=1),
+    )
+
+
+def _smooth_top_k(
+    windowed: WindowedProbaSum, window_size: int, k: int, start: int, stop: int
+):
+    n_classes = windowed.pred_proba.shape[1]
+    k = min(k, n_classes)
+    count = min(k + 1, n_classes)
+    dtype = np.min_scalar_type(max(n_classes - 1, 0))
+
+    # 上位 k + 1 個のクラスを argpartition で選び, その中だけを大きい順に並べる
+    sums = windowed.sums(window_size, start, stop)
+    indices, values = _candidates(sums, count)
+    tolerance = windowed.tolerance(sums, window_size, start)
+    rows = _ambiguous_rows(values[:, ::-1], tolerance, windowed.nonnegative)
+    if len(rows) > 0:
+        sums[rows] = windowed.exact_sums(rows + start, window_size)
+        indices[rows], values[rows] = _candidates(sums[rows], count)
+
+    top_k = indices[:, :k]
+    # 上位 k + 1 個に同点がある行は, 同点のクラスの順を smooth_results
+    # (np.argsort を逆順にしたもの) と同じにするため, その行だけ全体を並べる
+    ties = np.flatnonzero((np.diff(values, axis=1) == 0).any(axis=1))
+    if len(ties) > 0:
+        top_k[ties] = np.argsort(sums[ties], axis=1)[:, : -k - 1 : -1]
+
+    return top_k.astype(dtype)
+
+
+def smooth_top_k(pred_proba: np.ndarray, window_size: int, k: int):
+    """
+    window_size 個の pred_proba の和が大きい順に、上位 k 個のクラスを求める
+
+    smooth_results(pred_proba, window_size)[:, :k] と同じ値を (同点の順を含む),
+    全クラスを並べ替えずに小さい整数型の (n - window_size, k) 配列で返す
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_size : int
+        ウィンドウサイズ. 0 の場合は和がすべて 0 のウィンドウとして扱い, 負の場合は ValueError
+    k : int
+        求める順位の数
+
+    Returns
+    -------
+    top_k : np.ndarray
+        (n - window_size, k) のクラス
+    """
+
+    windowed = WindowedProbaSum(pred_proba)
+    return _smooth_top_k(
+        windowed, window_size, k, 0, max(len(windowed) - window_size, 0)
+    )
+
+
+def iter_smooth_top_k(
+    pred_proba: np.ndarray, window_size: int, k: int, chunk_size=64 * 1024
+):
+    """
+    smooth_top_k の結果を chunk_size 行ずつ返す
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_size : int
+        ウィンドウサイズ
+    k : int
+        求める順位の数
+    chunk_size : int
+        一度に返す行数
+
+    Returns
+    -------
+    top_k : Iterator[np.ndarray]
+        (chunk_size, k) のクラス
+    """
+
+    windowed = WindowedProbaSum(pred_proba)
+    n = len(windowed) - window_size
+    for start in range(0, n, chunk_size):
+        yield _smooth_top_k(windowed, window_size, k, start, start + chunk_size)
+
+
+def smooth_top_k_batch(pred_proba: np.ndarray, window_sizes: list[int], k: int):
+    """
+    複数のウィンドウサイズの smooth_top_k をまとめて求める
+
+    float64 への変換は1回だけ行う. 移動和の丸め誤差をウィンドウサイズに比例させるため,
+    移動和はウィンドウサイズごとのブロックで計算する
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_sizes : list[int]
+        ウィンドウサイズのリスト
+    k : int
+        求める順位の数
+
+    Returns
+    -------
+    results : dict[int, np.ndarray]
+        ウィンドウサイズごとの smooth_top_k の結果
+    """
+
+    windowed = WindowedProbaSum(pred_proba)
+    return {
+        w: _smooth_top_k(windowed, w, k, 0, max(len(windowed) - w, 0))
+        for w in window_sizes
+    }
+
+
+def smooth_result(pred_proba: np.ndarray, window_size=1 * 60):
+    """
+    window_size 個の pred_proba の和が最大のクラスを求める
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_size : int
+        ウィンドウサイズ. 0 の場合は元の実装と同じく和がすべて 0 のウィンドウとして扱い,
+        負の場合は ValueError
+
+    Returns
+    -------
+    result : np.ndarray
+        長さ n - window_size の予測クラス
+    """
+
+    return _smooth_argmax(WindowedProbaSum(pred_proba), window_size)
+
+
+def smooth_results(pred_proba: np.ndarray, window_size=1 * 60):
+    """
+    window_size 個の pred_proba の和が大きい順にクラスを並べる
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_size : int
+        ウィンドウサイズ. 0 の場合は元の実装と同じく和がすべて 0 のウィンドウとして扱い,
+        負の場合は ValueError
+
+    Returns
+    -------
+    result : np.ndarray
+        (n - window_size, クラス数) のクラスの順位
+    """
+
+    return _smooth_ranking(WindowedProbaSum(pred_proba), window_size)
+
+
+def smooth_result_batch(pred_proba: np.ndarray, window_sizes: list[int]):
+    """
+    複数のウィンドウサイズの smooth_result をまとめて求める
+
+    float64 への変換は1回だけ行う. 移動和の丸め誤差をウィンドウサイズに比例させるため,
+    移動和はウィンドウサイズごとのブロックで計算する
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_sizes : list[int]
+        ウィンドウサイズのリスト
+
+    Returns
+    -------
+    results : dict[int, np.ndarray]
+        ウィンドウサイズごとの smooth_result の結果
+    """
+
+    windowed = WindowedProbaSum(pred_proba)
+    return {w: _smooth_argmax(windowed, w) for w in window_sizes}
+
+
+def smooth_results_batch(pred_proba: np.ndarray, window_sizes: list[int]):
+    """
+    複数のウィンドウサイズの smooth_results をまとめて求める
+
+    float64 への変換は1回だけ行う. 移動和の丸め誤差をウィンドウサイズに比例させるため,
+    移動和はウィンドウサイズごとのブロックで計算する
+
+    Parameters
+    ----------
+    pred_proba : np.ndarray
+        (n, クラス数) の予測確率
+    window_sizes : list[int]
+        ウィンドウサイズのリスト
+
+    Returns
+    -------
+    results : dict[int, np.ndarray]
+        ウィンドウサイズごとの smooth_results の結果
+    """
+
+    windowed = WindowedProbaSum(pred_proba)
+    return {w: _smooth_ranking(windowed, w) for w in window_sizes}
@@ -0,0 +1,328 @@
+import numpy as np
+import pandas as pd
+
+from modules.common.bvh import BVH_CHUNK_ROWS, BVHChunkReader
+from modules.estimation.model import Model
+from modules.feature.streaming import (
+    ChunkedWindowFeatures,
+    StreamingWindowFeatures,
+    feature_columns,
+)
+
+
+class OnlineSmoother:
+    """
+    予測確率を1つずつ受け取り、smooth_result と同じスムージングを行う
+
+    直近 window_size 個の予測確率をリングバッファに保持し、その和を
+    古い行を引いて新しい行を足すことで 1 回あたり O(クラス数) で更新する.
+    引き算による丸め誤差が蓄積しないように, window_size 個ごとのブロックの先頭から
+    足した和で置き換える. 上位2クラスの差が誤差の範囲に収まる場合だけ,
+    smooth_result と同じ順の np.sum で足し直す
+    """
+
+    def __init__(self, window_size: int, num_class: int):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+
+        self.window_size = window_size
+        self.buffer = np.empty((window_size, num_class))
+        self.n = 0
+
+        # 直近 window_size 個の和と、現在のブロックの先頭からの和. それぞれの誤差の上限も持つ
+        self.sum = np.zeros(num_class)
+        self.error = 0.0
+        self.block_sum = np.zeros(num_class)
+        self.block_error = 0.0
+        # これまでの予測確率の絶対値の最大値 (np.sum の誤差の上限に使う)
+        self.max_abs = 0.0
+
+    def _tolerance(self):
+        # 2つのクラスの差が np.sum と変わりうる上限.
+        # np.sum の誤差は (window_size - 1) · u · Σ|x| 以下 (u = eps / 2)
+        eps = np.finfo(np.float64).eps
+        reference_error = (self.window_size + 1) * eps * self.window_size * self.max_abs
+        return 2 * (self.error + reference_error)
+
+    def push(self, pred_proba: np.ndarray):
+        """
+        予測確率を1つ追加する
+
+        Parameters
+        ----------
+        pred_proba : np.ndarray
+            (クラス数,) の予測確率
+
+        Returns
+        -------
+        smoothed_pred : int | None
+            直近 window_size 個の和が最大のクラス.
+            window_size 個に満たない場合は None
+        """
+
+        pred_proba = np.asarray(pred_proba, dtype=np.float64)
+        # 1回の足し算・引き算の誤差は u · |結果| 以下
+        u = np.finfo(np.float64).eps / 2
+        pos = self.n % self.window_size
+
+        if self.n >= self.window_size:
+            self.sum -= self.buffer[pos]
+            self.error += u * np.abs(self.sum).max()
+        self.sum += pred_proba
+        self.error += u * np.abs(self.sum).max()
+
+        if pos == 0:
+            self.block_sum[:] = pred_proba
+            self.block_error = 0.0
+        else:
+            self.block_sum += pred_proba
+            self.block_error += u * np.abs(self.block_sum).max()
+
+        self.buffer[pos] = pred_proba
+        self.max_abs = max(self.max_abs, float(np.abs(pred_proba).max()))
+        self.n += 1
+
+        if pos == self.window_size - 1:
+            # ブロックの和は直近 window_size 個の和と一致する
+            self.sum[:] = self.block_sum
+            self.error = self.block_error
+
+        if self.n < self.window_size:
+            return None
+
+        if len(self.sum) < 2:
+            return 0
+
+        second, first = np.partition(self.sum, -2)[-2:]
+        if first - second > self._tolerance():
+            return int(np.argmax(self.sum))
+
+        # 同点に近い場合は古い順に並べて和をとる
+        window = np.concatenate([self.buffer[pos + 1 :], self.buffer[: pos + 1]])
+        return int(np.argmax(np.sum(window, axis=0)))
+
+
+class StreamingEstimator:
+    """
+    モーションのフレームを1つずつ受け取り、リアルタイムに動作を推定する
+
+    gap_size_frame フレームごとにバッチの前処理と同じ特徴量を求めて Model で推定し、
+    直近 smooth_window_size 回の推定結果をスムージングする
+
+    Parameters
+    ----------
+    model : Model
+        学習済みのモデル
+    columns : list[str]
+        BVH のチャンネルの列名 (time 列を除く)
+    window_size_frame : int
+        ウィンドウサイズ
+    gap_size_frame : int
+        ウィンドウの間隔
+    smooth_window_size : int
+        スムージングのウィンドウサイズ (推定の回数)
+    frame_time : float
+        1フレームの時間 [s]
+    num_class : int
+        クラス数
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        columns: list[str],
+        window_size_frame: int,
+        gap_size_frame: int,
+        smooth_window_size: int,
+        frame_time: float,
+        num_class: int,
+    ):
+        self.model = model
+        self.frame_time = frame_time
+        self.n_frames = 0
+
+        # to_motion_df と同じく先頭に time 列を持つ
+        value_columns = ["time"] + list(columns)
+        self.feature_columns = feature_columns(value_columns)
+        self.features = StreamingWindowFeatures(
+            len(value_columns), window_size_frame, gap_size_frame
+        )
+        self.smoother = OnlineSmoother(smooth_window_size, num_class)
+        self._values = np.empty(len(value_columns))
+
+    def push(self, frame: np.ndarray):
+        """
+        1フレーム追加する
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            (チャンネル数,) のフレームの値
+
+        Returns
+        -------
+        result : tuple | None
+            推定した場合は (pred, pred_proba, smoothed_pred).
+            smoothed_pred は推定の回数が smooth_window_size に満たない場合は None.
+            推定しなかった場合は None
+        """
+
+        self._values[0] = self.n_frames * self.frame_time
+        self._values[1:] = frame
+        self.n_frames += 1
+
+        features = self.features.push(self._values)
+        if features is None:
+            return None
+
+        x = pd.DataFrame(features[np.newaxis], columns=self.feature_columns)
+        pred, pred_proba = self.model.predict_with_proba(x)
+        smoothed_pred = self.smoother.push(pred_proba[0])
+
+        return pred[0], pred_proba[0], smoothed_pred
+
+
+class ChunkedEstimator:
+    """
+    モーションのフレームをチャンクごとに受け取り、動作を推定する
+
+    StreamingEstimator と同じ推定をチャンク単位でまとめて行う
+
+    Parameters
+    ----------
+    model : Model
+        学習済みのモデル
+    columns : list[str]
+        BVH のチャンネルの列名 (time 列を除く)
+    window_size_frame : int
+        ウィンドウサイズ
+    gap_size_frame : int
+        ウィンドウの間隔
+    smooth_window_size : int
+        スムージングのウィンドウサイズ (推定の回数)
+    frame_time : float
+        1フレームの時間 [s]
+    num_class : int
+        クラス数
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        columns: list[str],
+        window_size_frame: int,
+        gap_size_frame: int,
+        smooth_window_size: int,
+        frame_time: float,
+        num_class: int,
+    ):
+        self.model = model
+        self.frame_time = frame_time
+        self.n_frames = 0
+
+        self.feature_columns = feature_columns(["time"] + list(columns))
+        self.features = ChunkedWindowFeatures(window_size_frame, gap_size_frame)
+        self.smoother = OnlineSmoother(smooth_window_size, num_class)
+
+    def push(self, frames: np.ndarray):
+        """
+        チャンクを追加する
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            (フレーム数, チャンネル数) のチャンクの値
+
+        Returns
+        -------
+        pred : np.ndarray
+            推定したウィンドウごとの予測クラス
+        pred_proba : np.ndarray
+            推定したウィンドウごとの予測確率
+        smoothed_pred : np.ndarray
+            スムージングした予測クラス (推定の回数が smooth_window_size に満たない分は含まない)
+        """
+
+        # to_motion_df と同じく先頭に time 列を追加する
+        times = np.arange(self.n_frames, self.n_frames + len(frames)) * self.frame_time
+        self.n_frames += len(frames)
+
+        features = self.features.push(np.column_stack([times, frames]))
+        if len(features) == 0:
+            return (
+                np.array([]),
+                np.empty((0, self.smoother.buffer.shape[1])),
+                np.array([]),
+            )
+
+        x = pd.DataFrame(features, columns=self.feature_columns)
+        pred, pred_proba = self.model.predict_with_proba(x)
+
+        smoothed_pred = [self.smoother.push(p) for p in pred_proba]
+        return (
+            pred,
+            pred_proba,
+            np.array([p for p in smoothed_pred if p is not None], dtype=np.int64),
+        )
+
+
+def iter_estimate_bvh(
+    model: Model,
+    path: str,
+    window_size_frame: int,
+    gap_size_frame: int,
+    smooth_window_size: int,
+    num_class: int,
+    chunk_rows=BVH_CHUNK_ROWS,
+    follow=False,
+    idle_timeout: float | None = None,
+):
+    """
+    BVH ファイルをチャンクごとに読み込みながら動作を推定する
+
+    読み込み, 特徴量, 推定のどれもチャンク単位で行うため, 収録の長さによらず
+    メモリ使用量は一定になる. follow が True の場合は収録中のファイルを読み続ける
+
+    Parameters
+    ----------
+    model : Model
+        学習済みのモデル
+    path : str
+        BVH ファイルのパス
+    window_size_frame : int
+        ウィンドウサイズ
+    gap_size_frame : int
+        ウィンドウの間隔
+    smooth_window_size : int
+        スムージングのウィンドウサイズ (推定の回数)
+    num_class : int
+        クラス数
+    chunk_rows : int
+        一度に読み込む行数
+    follow : bool
+        追記されるファイルを読み続けるかどうか
+    idle_timeout : float, optional
+        follow の場合に終了するまでの追記のない時間 [s]
+
+    Returns
+    -------
+    results : Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]
+        チャンクごとの (pred, pred_proba, smoothed_pred)
+    """
+
+    with BVHChunkReader(
+        path, chunk_rows=chunk_rows, follow=follow, idle_timeout=idle_timeout
+    ) as reader:
+        estimator = ChunkedEstimator(
+            model,
+            reader.columns,
+            window_size_frame,
+            gap_size_frame,
+            smooth_window_size,
+            reader.frame_time,
+            num_class,
+        )
+        for frames in reader:
+            pred, pred_proba, smoothed_pred = estimator.push(frames)
+            if len(pred) > 0:
+                yield pred, pred_proba, smoothed_pred
@@ -0,0 +1,222 @@
+import numpy as np
+
+from modules.feature.window import (
+    FEATURE_STATS,
+    feature_name,
+    sliding_max,
+    sliding_mean_var,
+    sliding_min,
+)
+
+
+class StreamingWindowFeatures:
+    """
+    フレームを1つずつ受け取り、extract_window_features と同じ特徴量を
+    gap_size_frame フレームごとに求める
+
+    ウィンドウは window_size_frame + 1 フレームのリングバッファに保持し、
+    van Herk / Gil-Werman 法 (window.py と同じブロック分割) のように
+    1つ前のブロックの後方の統計量と現在のブロックの前方の統計量を組み合わせて求める.
+    最大値と最小値は累積の極値、平均と不偏分散は前方を Welford 法の追加のみで更新し、
+    後方の平均と分散と Chan の式でまとめる. Welford 法の状態はブロックごとに
+    初めからやり直すため、削除による誤差が蓄積しない.
+
+    1 フレームあたりの計算量は O(列数) だが、ブロックが埋まるフレーム
+    (window_size_frame + 1 フレームに1回) だけは後方の統計量を求めるため
+    O((window_size_frame + 1) · 列数) になる. 償却すると 1 フレームあたり O(列数) で、
+    このフレームのレイテンシは benchmarks/streaming_latency.py で別に表示する
+    """
+
+    def __init__(self, n_columns: int, window_size_frame: int, gap_size_frame: int):
+        self.n_columns = n_columns
+        self.length = window_size_frame + 1
+        self.gap_size_frame = gap_size_frame
+        self.n_frames = 0
+
+        # リングバッファの位置は van Herk 法のブロック内の位置と一致する
+        self.buffer = np.empty((self.length, n_columns))
+
+        # 現在のブロックの前方の平均と偏差平方和, 1つ前のブロックの後方の平均と偏差平方和
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.suffix_mean = np.zeros((self.length, n_columns))
+        self.suffix_m2 = np.zeros((self.length, n_columns))
+
+        # 現在のブロックの前方からの極値と、1つ前のブロックの後方からの極値
+        self.prefix_max = np.full(n_columns, -np.inf)
+        self.prefix_min = np.full(n_columns, np.inf)
+        self.suffix_max = np.full((self.length, n_columns), -np.inf)
+        self.suffix_min = np.full((self.length, n_columns), np.inf)
+
+    def _update_mean_var(self, pos: int, values: np.ndarray):
+        if pos == 0:
+            self.mean[:] = values
+            self.m2[:] = 0
+            return
+
+        delta = values - self.mean
+        self.mean += delta / (pos + 1)
+        self.m2 += delta * (values - self.mean)
+
+    def _window_mean_var(self, pos: int):
+        if pos == self.length - 1:
+            # ウィンドウがブロックと一致する
+            return self.mean.copy(), self.m2.copy()
+
+        # 1つ前のブロックの後方 (pos + 1 以降) と現在のブロックの前方をまとめる
+        count_a, count_b = self.length - 1 - pos, pos + 1
+        mean_a, m2_a = self.suffix_mean[pos + 1], self.suffix_m2[pos + 1]
+        delta = self.mean - mean_a
+        mean = mean_a + delta * (count_b / self.length)
+        m2 = m2_a + self.m2 + np.square(delta) * (count_a * count_b / self.length)
+        return mean, m2
+
+    def _update_extreme(self, pos: int, values: np.ndarray):
+        if pos == 0:
+            self.prefix_max[:] = values
+            self.prefix_min[:] = values
+        else:
+            np.fmax(self.prefix_max, values, out=self.prefix_max)
+            np.fmin(self.prefix_min, values, out=self.prefix_min)
+
+    def _window_extreme(self, pos: int):
+        if pos == self.length - 1:
+            # ウィンドウがブロックと一致する
+            return self.prefix_max.copy(), self.prefix_min.copy()
+
+        return (
+            np.fmax(self.suffix_max[pos + 1], self.prefix_max),
+            np.fmin(self.suffix_min[pos + 1], self.prefix_min),
+        )
+
+    def _close_block(self):
+        # ブロックの後方からの極値, 平均と偏差平方和を求める
+        np.fmax.accumulate(self.buffer[::-1], axis=0, out=self.suffix_max[::-1])
+        np.fmin.accumulate(self.buffer[::-1], axis=0, out=self.suffix_min[::-1])
+
+        # 桁落ちを抑えるため、ブロックの平均からの差の累積和をとる
+        block_mean = self.buffer.mean(axis=0)
+        deviation = self.buffer - block_mean
+        counts = np.arange(self.length, 0, -1)[:, np.newaxis]
+        sum_ = np.cumsum(deviation[::-1], axis=0)[::-1]
+        square_sum = np.cumsum(np.square(deviation)[::-1], axis=0)[::-1]
+        self.suffix_mean = block_mean + sum_ / counts
+        self.suffix_m2 = np.maximum(square_sum - np.square(sum_) / counts, 0)
+
+    def push(self, values: np.ndarray):
+        """
+        1フレーム追加する
+
+        Parameters
+        ----------
+        values : np.ndarray
+            (列数,) のフレームの値
+
+        Returns
+        -------
+        features : np.ndarray | None
+            (列数 * 5,) の特徴量. 列は FEATURE_STATS の順に並ぶ.
+            ウィンドウが埋まっていない, または gap_size_frame の途中の場合は None
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        pos = self.n_frames % self.length
+
+        self._update_mean_var(pos, values)
+        self._update_extreme(pos, values)
+        self.buffer[pos] = values
+
+        max_, min_ = self._window_extreme(pos)
+        if pos == self.length - 1:
+            self._close_block()
+
+        self.n_frames += 1
+        end = self.n_frames - self.length
+        if end < 0 or end % self.gap_size_frame != 0:
+            return None
+
+        mean, m2 = self._window_mean_var(pos)
+        if self.length < 2:
+            var = np.full(self.n_columns, np.nan)
+        else:
+            var = np.maximum(m2 / (self.length - 1), 0)
+
+        return np.concatenate([mean, var, np.sqrt(var), max_, min_])
+
+
+def feature_columns(value_columns: list[str]):
+    """
+    segment_and_extract_feature と同じ特徴量の列名を返す
+    """
+
+    return [
+        feature_name(column, stat) for stat in FEATURE_STATS for column in value_columns
+    ]
+
+
+class ChunkedWindowFeatures:
+    """
+    フレームをチャンクごとに受け取り、extract_window_features と同じ特徴量を求める
+
+    次のウィンドウの開始フレーム以降 (window_size_frame フレーム未満) だけを
+    次のチャンクに持ち越すため、メモリ使用量はチャンクの大きさで決まる
+    """
+
+    def __init__(self, window_size_frame: int, gap_size_frame: int):
+        self.window_size_frame = window_size_frame
+        self.gap_size_frame = gap_size_frame
+        self.length = window_size_frame + 1
+
+        # 持ち越したフレームと、その先頭のフレーム番号
+        self.carry: np.ndarray | None = None
+        self.offset = 0
+        # 次のウィンドウの開始フレーム
+        self.next_start = 0
+
+    def push(self, values: np.ndarray):
+        """
+        チャンクを追加する
+
+        Parameters
+        ----------
+        values : np.ndarray
+            (フレーム数, 列数) のチャンクの値
+
+        Returns
+        -------
+        features : np.ndarray
+            (ウィンドウ数, 列数 * 5) の特徴量. 列は FEATURE_STATS の順に並ぶ
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if self.carry is not None and len(self.carry) > 0:
+            values = np.concatenate([self.carry, values])
+
+        # extract_window_features と同じく、フレーム番号が gap_size_frame の倍数から始まる
+        end = self.offset + len(values) - self.window_size_frame
+        starts = np.arange(
+            self.next_start, max(end, self.next_start), self.gap_size_frame
+        )
+        local_starts = starts - self.offset
+
+        mean, var = sliding_mean_var(values, local_starts, self.length)
+        features = np.concatenate(
+            [
+                mean,
+                var,
+                np.sqrt(var),
+                sliding_max(values, local_starts, self.length),
+                sliding_min(values, local_starts, self.length),
+            ],
+            axis=1,
+        )
+
+        if len(starts) > 0:
+            self.next_start = int(starts[-1]) + self.gap_size_frame
+
+        # 次のウィンドウの開始フレーム以降を持ち越す
+        keep_from = min(self.next_start - self.offset, len(values))
+        self.carry = values[keep_from:].copy()
+        self.offset += keep_from
+
+        return features
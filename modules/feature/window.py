@@ -0,0 +1,365 @@
+import numpy as np
+
+# segment_and_extract_feature が出力する統計量 (列の並び順)
+FEATURE_STATS = ["avg", "var", "std", "max", "min"]
+
+
+def window_starts(n_frames: int, window_size_frame: int, gap_size_frame: int):
+    """
+    各ウィンドウの開始フレームを取得する
+
+    Parameters
+    ----------
+    n_frames : int
+        フレーム数
+    window_size_frame : int
+        ウィンドウサイズ
+    gap_size_frame : int
+        ウィンドウの間隔
+
+    Returns
+    -------
+    starts : np.ndarray
+        ウィンドウの開始フレーム
+    """
+
+    return np.arange(0, max(n_frames - window_size_frame, 0), gap_size_frame)
+
+
+class _PrefixSums:
+    # 列ごとの平均を引いた値とその二乗の累積和
+    def __init__(self, values: np.ndarray):
+        n_frames, n_columns = values.shape
+        self.offset = values.mean(axis=0) if n_frames > 0 else np.zeros(n_columns)
+        centered = values - self.offset
+
+        self.cumsum = np.zeros((n_frames + 1, n_columns))
+        np.cumsum(centered, axis=0, out=self.cumsum[1:])
+
+        np.square(centered, out=centered)
+        self.cumsum_sq = np.zeros((n_frames + 1, n_columns))
+        np.cumsum(centered, axis=0, out=self.cumsum_sq[1:])
+
+    def mean_var(self, starts: np.ndarray, length: int):
+        window_sum = self.cumsum[starts + length] - self.cumsum[starts]
+        window_sq_sum = self.cumsum_sq[starts + length] - self.cumsum_sq[starts]
+
+        mean = window_sum / length + self.offset
+        if length < 2:
+            var = np.full_like(mean, np.nan)
+        else:
+            var = (window_sq_sum - window_sum * window_sum / length) / (length - 1)
+            np.maximum(var, 0, out=var)
+
+        return mean, var
+
+
+class _LabelCounts:
+    # ラベルごとの出現回数の累積和
+    def __init__(self, label_ids: np.ndarray):
+        self.uniques, inverse = np.unique(label_ids, return_inverse=True)
+
+        self.counts = np.zeros((len(label_ids) + 1, len(self.uniques)), dtype=np.int64)
+        self.counts[np.arange(1, len(label_ids) + 1), inverse] = 1
+        np.cumsum(self.counts, axis=0, out=self.counts)
+
+    def mode(self, starts: np.ndarray, length: int):
+        if len(starts) == 0:
+            return self.uniques[:0]
+
+        window_counts = self.counts[starts + length] - self.counts[starts]
+        return self.uniques[np.argmax(window_counts, axis=1)]
+
+
+def sliding_mean_var(values: np.ndarray, starts: np.ndarray, length: int):
+    """
+    累積和を使って各ウィンドウの平均と不偏分散を計算する
+
+    桁落ちを抑えるため、列ごとの平均を引いてから累積和をとる
+
+    Parameters
+    ----------
+    values : np.ndarray
+        (フレーム数, 列数) の配列
+    starts : np.ndarray
+        ウィンドウの開始フレーム
+    length : int
+        ウィンドウに含まれるフレーム数
+
+    Returns
+    -------
+    mean : np.ndarray
+        (ウィンドウ数, 列数) の平均
+    var : np.ndarray
+        (ウィンドウ数, 列数) の不偏分散
+    """
+
+    return _PrefixSums(values).mean_var(starts, length)
+
+
+def _sliding_extreme(values: np.ndarray, starts: np.ndarray, length: int, ufunc):
+    # van Herk / Gil-Werman 法: length ごとのブロックで前方・後方の累積極値をとり、
+    # 任意のウィンドウを 2 つの値の比較で求める
+    n_frames, n_columns = values.shape
+    if len(starts) == 0 or n_columns == 0:
+        return np.empty((len(starts), n_columns))
+
+    n_blocks = -(-n_frames // length)
+    fill = -np.inf if ufunc is np.fmax else np.inf
+    padded = np.full((n_blocks * length, n_columns), fill)
+    padded[:n_frames] = values
+    blocks = padded.reshape(n_blocks, length, n_columns)
+
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(-1, n_columns)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, n_columns)
+
+    return ufunc(suffix[starts], prefix[starts + length - 1])
+
+
+def sliding_max(values: np.ndarray, starts: np.ndarray, length: int):
+    """
+    各ウィンドウの最大値を計算する (NaN は無視する)
+    """
+
+    return _sliding_extreme(values, starts, length, np.fmax)
+
+
+def sliding_min(values: np.ndarray, starts: np.ndarray, length: int):
+    """
+    各ウィンドウの最小値を計算する (NaN は無視する)
+    """
+
+    return _sliding_extreme(values, starts, length, np.fmin)
+
+
+def sliding_mode(label_ids: np.ndarray, starts: np.ndarray, length: int):
+    """
+    one-hot の累積カウントを使って各ウィンドウで最も多いラベルを求める
+
+    同数の場合は値の小さいラベルを返す (pd.Series.mode().iloc[0] と同じ)
+
+    Parameters
+    ----------
+    label_ids : np.ndarray
+        フレームごとのラベル
+    starts : np.ndarray
+        ウィンドウの開始フレーム
+    length : int
+        ウィンドウに含まれるフレーム数
+
+    Returns
+    -------
+    mode : np.ndarray
+        ウィンドウごとのラベル
+    """
+
+    return _LabelCounts(label_ids).mode(starts, length)
+
+
+def feature_name(column: str, stat: str):
+    """
+    特徴量の列名 (segment_and_extract_feature と同じ)
+    """
+
+    return f"{column}-pos-{stat}"
+
+
+class FeatureSubset:
+    """
+    計算する特徴量の部分集合
+
+    列は FEATURE_STATS の順, 同じ統計量の中ではスケルトンの列の順に並べる
+    (すべての特徴量を計算した場合の並びから、含まれない列を除いたもの)
+
+    Parameters
+    ----------
+    value_columns : list[str]
+        スケルトンの列名
+    feature_columns : list[str]
+        計算する特徴量の列名
+    """
+
+    def __init__(self, value_columns: list[str], feature_columns: list[str]):
+        selected = set(feature_columns)
+        self.stat_columns = {
+            stat: np.array(
+                [
+                    i
+                    for i, column in enumerate(value_columns)
+                    if feature_name(column, stat) in selected
+                ],
+                dtype=np.intp,
+            )
+            for stat in FEATURE_STATS
+        }
+        self.columns = [
+            feature_name(value_columns[i], stat)
+            for stat in FEATURE_STATS
+            for i in self.stat_columns[stat]
+        ]
+
+        missing = selected - set(self.columns)
+        if len(missing) > 0:
+            raise KeyError(f"features {sorted(missing)} are not computable")
+
+        # 平均, 分散, 標準偏差は同じ累積和から求める
+        self.moment_columns = np.unique(
+            np.concatenate([self.stat_columns[stat] for stat in ["avg", "var", "std"]])
+        )
+
+
+class MultiWindowFeatures:
+    """
+    累積和とラベルの累積カウントを一度だけ計算し、
+    複数のウィンドウサイズ・間隔の特徴量を求める
+
+    ウィンドウは segment_and_extract_feature と同じく i から i + window_size_frame
+    まで (window_size_frame + 1 フレーム) とする.
+    subset を指定した場合は、その特徴量に必要な列だけを計算する
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        label_ids: np.ndarray,
+        subset: FeatureSubset | None = None,
+    ):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.label_ids = np.asarray(label_ids)
+        self.subset = subset
+        if subset is None:
+            self._prefix = _PrefixSums(self.values)
+        else:
+            self._prefix = _PrefixSums(self.values[:, subset.moment_columns])
+        self._label_counts = _LabelCounts(self.label_ids)
+
+    def extract(self, window_size_frame: int, gap_size_frame: int):
+        """
+        全ウィンドウの特徴量をまとめて計算する
+
+        Parameters
+        ----------
+        window_size_frame : int
+            ウィンドウサイズ
+        gap_size_frame : int
+            ウィンドウの間隔
+
+        Returns
+        -------
+        features : np.ndarray
+            (ウィンドウ数, 列数 * 5) の特徴量. 列は FEATURE_STATS の順に並ぶ
+        window_labels : np.ndarray
+            ウィンドウごとのラベル
+        """
+
+        starts = window_starts(len(self.values), window_size_frame, gap_size_frame)
+        length = window_size_frame + 1
+
+        mean, var = self._prefix.mean_var(starts, length)
+        if self.subset is None:
+            features = np.concatenate(
+                [
+                    mean,
+                    var,
+                    np.sqrt(var),
+                    sliding_max(self.values, starts, length),
+                    sliding_min(self.values, starts, length),
+                ],
+                axis=1,
+            )
+        else:
+            features = self._extract_subset(starts, length, mean, var)
+
+        return features, self._label_counts.mode(starts, length)
+
+    def _extract_subset(
+        self, starts: np.ndarray, length: int, mean: np.ndarray, var: np.ndarray
+    ):
+        stat_columns = self.subset.stat_columns
+        moment_index = {
+            stat: np.searchsorted(self.subset.moment_columns, stat_columns[stat])
+            for stat in ["avg", "var", "std"]
+        }
+
+        return np.concatenate(
+            [
+                mean[:, moment_index["avg"]],
+                var[:, moment_index["var"]],
+                np.sqrt(var[:, moment_index["std"]]),
+                sliding_max(self.values[:, stat_columns["max"]], starts, length),
+                sliding_min(self.values[:, stat_columns["min"]], starts, length),
+            ],
+            axis=1,
+        )
+
+
+def extract_window_features(
+    values: np.ndarray,
+    label_ids: np.ndarray,
+    window_size_frame: int,
+    gap_size_frame: int,
+    subset: FeatureSubset | None = None,
+):
+    """
+    全ウィンドウの特徴量をまとめて計算する
+
+    Parameters
+    ----------
+    values : np.ndarray
+        (フレーム数, 列数) のスケルトンの値
+    label_ids : np.ndarray
+        フレームごとのラベル
+    window_size_frame : int
+        ウィンドウサイズ
+    gap_size_frame : int
+        ウィンドウの間隔
+    subset : FeatureSubset, optional
+        計算する特徴量. None の場合はすべての特徴量
+
+    Returns
+    -------
+    features : np.ndarray
+        (ウィンドウ数, 列数 * 5) の特徴量. 列は FEATURE_STATS の順に並ぶ
+    window_labels : np.ndarray
+        ウィンドウごとのラベル
+    """
+
+    return MultiWindowFeatures(values, label_ids, subset).extract(
+        window_size_frame, gap_size_frame
+    )
+
+
+def extract_multi_window_features(
+    values: np.ndarray,
+    label_ids: np.ndarray,
+    windows: list[tuple[int, int]],
+    subset: FeatureSubset | None = None,
+):
+    """
+    複数のウィンドウサイズ・間隔の特徴量を1回の走査で計算する
+
+    Parameters
+    ----------
+    values : np.ndarray
+        (フレーム数, 列数) のスケルトンの値
+    label_ids : np.ndarray
+        フレームごとのラベル
+    windows : list[tuple[int, int]]
+        (ウィンドウサイズ, ウィンドウの間隔) のリスト
+    subset : FeatureSubset, optional
+        計算する特徴量. None の場合はすべての特徴量
+
+    Returns
+    -------
+    features : dict[tuple[int, int], tuple[np.ndarray, np.ndarray]]
+        (ウィンドウサイズ, ウィンドウの間隔) ごとの (特徴量, ウィンドウごとのラベル)
+    """
+
+    multi_window_features = MultiWindowFeatures(values, label_ids, subset)
+
+    return {
+        (window_size_frame, gap_size_frame): multi_window_features.extract(
+            window_size_frame, gap_size_frame
+        )
+        for window_size_frame, gap_size_frame in windows
+    }
@@ -1,20 +1,33 @@
-import glob
+import argparse
+from functools import partial
 from itertools import product
+import json
 import os
-from matplotlib import pyplot as plt
 import numpy as np
 import pandas as pd
 
+from modules.common.feature_store import FEATURE_STORE_SUFFIX
 from modules.common.labels import Labels
+from modules.estimation.feature_selection import (
+    feature_subset_key,
+    load_feature_subset,
+)
 from modules.estimation.model import Model, ModelType
-from preprocess import (
-    export_csv,
-    get_data_files,
-    segment_and_extract_feature,
-    split_motion_by_label,
-    to_dataframe,
+from modules.estimation.model_store import MODEL_STORE_SUFFIX
+from modules.estimation.results_store import RESULTS_DB_FILE, ResultsStore
+from modules.common import profiling
+from modules.common.parallel import ordered_map
+from modules.common.plotting import pyplot
+from modules.common.render import RenderQueue
+from modules.common.shared_features import SharedFeatureMatrix
+from modules.common.threads import split_threads
+from preprocess import get_data_files, preprocess_recording_multi
+from modules.estimation.evaluation import (
+    EvaluationResult,
+    evaluate,
+    rank_hits,
 )
-from train import smooth_result, smooth_results
+from modules.estimation.smoothing import smooth_top_k_batch
 
 top_k = 3
 # test_data_group_list = [["4", "5"], ["6", "7"], ["8", "9"], ["10", "11"], ["12", "13"]]
@@ -24,9 +37,13 @@ model_types = ["randomforest", "xgboost", "lightgbm"]
 segment_window_size_list = [60, 120, 180, 240, 300, 360, 420, 480, 540]
 segment_gap_size_list = [10]
 smooth_window_size_list = [60, 120, 180, 240, 300, 360, 420, 480, 540]
+# 実行する組み合わせのキー (None の場合はすべての組み合わせ)
+target_keys: list[str] | None = ["xgboost_segmentw120_segmentgap10_smoothw360"]
 
 INPUT_DIR = "./data/input/each_process"
 OUTPUT_BASE_DIR = "./data/output/all/each_process2"
+# 学習・推定に使う特徴量の部分集合 (None の場合はすべての特徴量)
+FEATURE_SUBSET_PATH: str | None = None
 
 
 # すべての組み合わせを返す
@@ -34,71 +51,89 @@ def all_combinations(*args):
     return list(product(*args))
 
 
-def preprocess(window_size: int, gap_size: int, labels: Labels, output_dir: str):
-    data_files_list = get_data_files(INPUT_DIR)
-
-    for i, data_files in enumerate(data_files_list):
-        output_path = os.path.join(output_dir, f"{data_files['name']}.csv")
-
-        if os.path.exists(output_path):
-            continue
-
-        df = to_dataframe(data_files, labels)
-        grouped_df_list = split_motion_by_label(df, labels)
+def to_key(model_type: str, segment_wsize: int, segment_gsize: int, smooth_wsize: int):
+    return f"{model_type}_segmentw{segment_wsize}_segmentgap{segment_gsize}_smoothw{smooth_wsize}"
 
-        data_df = pd.DataFrame()
-        for i, grouped_df in enumerate(grouped_df_list):
-            # print(f">> to feature values: {i+1}/{len(grouped_df_list)}")
-            feature_values_df = segment_and_extract_feature(
-                grouped_df, window_size_frame=window_size, gap_size_frame=gap_size
-            )
-            data_df = pd.concat([data_df, feature_values_df])
 
-        print(f">>> Export: {output_path}")
-        export_csv(data_df, output_path)
+def feature_dir(
+    segment_wsize: int,
+    segment_gsize: int,
+    feature_columns: list[str] | None = None,
+):
+    name = f"segmentw{segment_wsize}_segmentgap{segment_gsize}"
+    # 特徴量の部分集合はすべての特徴量と別のディレクトリに出力する
+    if feature_columns is not None:
+        name += f"_subset{feature_subset_key(feature_columns)}"
 
-    return output_dir
+    return os.path.join(OUTPUT_BASE_DIR, "features", name)
 
 
-def load_data(data_dir: str, test_data_names: list[str]):
+def preprocess(
+    windows: list[tuple[int, int]],
+    labels: Labels,
+    workers=1,
+    threads: int | None = None,
+    feature_columns: list[str] | None = None,
+):
     """
-    指定したディレクトリ内のデータを読み込む
+    すべての収録データを特徴量に変換する
+
+    収録ごとにモーションを1回だけ読み込み、windows のすべての
+    (ウィンドウサイズ, ウィンドウの間隔) の特徴量をまとめて計算する.
+    出力済みの特徴量は計算しない
 
     Parameters
     ----------
-    data_dir : str
-        データが保存されているディレクトリのパス
-    test_data_name : str
-        テストデータのフォルダ名
+    windows : list[tuple[int, int]]
+        (ウィンドウサイズ, ウィンドウの間隔) のリスト
+    labels : Labels
+        ラベル
+    workers : int
+        プロセス数
+    threads : int, optional
+        各プロセスの BLAS / OpenMP のスレッド数
+    feature_columns : list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
 
     Returns
     -------
+    data_dirs : dict[tuple[int, int], str]
+        (ウィンドウサイズ, ウィンドウの間隔) ごとの特徴量のディレクトリ
     """
 
-    train = pd.DataFrame()
-    test = pd.DataFrame()
+    data_dirs = {window: feature_dir(*window, feature_columns) for window in windows}
 
-    file_paths = glob.glob(os.path.join(data_dir, "*.csv"))
-    for file_path in file_paths:
-        data_name = os.path.basename(file_path).split(".")[0]
-        if data_name in ["pred", "pred_proba", "smoothed_pred_proba"]:
-            continue
+    data_files_list = []
+    output_paths_list = []
+    for data_files in get_data_files(INPUT_DIR):
+        output_paths = {}
+        for window, data_dir in data_dirs.items():
+            output_path = os.path.join(
+                data_dir, f"{data_files['name']}{FEATURE_STORE_SUFFIX}"
+            )
+            if not os.path.exists(output_path):
+                output_paths[window] = output_path
 
-        try:
-            df = pd.read_csv(file_path)
-            if data_name in test_data_names:
-                test = pd.concat([test, df], ignore_index=True)
-            else:
-                train = pd.concat([train, df], ignore_index=True)
-        except pd.errors.EmptyDataError:
+        if len(output_paths) == 0:
             continue
 
-    x_train = train.drop("label", axis=1)
-    y_train = train["label"]
-    x_test = test.drop("label", axis=1)
-    y_test = test["label"]
+        data_files_list.append(data_files)
+        output_paths_list.append(output_paths)
+
+    results = ordered_map(
+        partial(
+            preprocess_recording_multi, labels=labels, feature_columns=feature_columns
+        ),
+        data_files_list,
+        output_paths_list,
+        workers=workers,
+        threads=threads,
+    )
+    for output_paths in results:
+        for output_path in output_paths.values():
+            print(f">>> Export: {output_path}")
 
-    return x_train, y_train, x_test, y_test
+    return data_dirs
 
 
 def train(
@@ -108,125 +143,156 @@ def train(
     model_type: ModelType,
     output_dir: str,
     test_data_names: list[str],
+    feature_columns: list[str] | None = None,
+    n_jobs: int | None = None,
+    reuse=True,
 ):
-    model_path = os.path.join(output_dir, f"{'-'.join(test_data_names)}_model_2.pkl")
+    model_path = os.path.join(
+        output_dir, f"{'-'.join(test_data_names)}_model_2{MODEL_STORE_SUFFIX}"
+    )
 
-    if os.path.exists(model_path):
+    # reuse が False の場合は保存済みのモデルを使わずに学習し直す
+    if reuse and os.path.exists(model_path):
         print(f">> Load model: {model_path}")
-        clf = Model.load(model_path, model_type, num_class=len(labels))
+        with profiling.stage("load_model"):
+            clf = Model.open(model_path, n_jobs=n_jobs)
         return clf
 
-    clf = Model(model_type, num_class=len(labels))
-    clf.fit(x_train, y_train)
+    clf = Model(
+        model_type,
+        num_class=len(labels),
+        feature_columns=feature_columns,
+        n_jobs=n_jobs,
+    )
+    with profiling.stage("fit", rows=len(x_train)):
+        clf.fit(x_train, y_train)
 
     # モデルの保存
-    clf.dump(model_path)
+    with profiling.stage("save_model"):
+        clf.save(model_path, labels=list(labels))
 
     return clf
 
 
-def test(clf, x_test, y_test, smooth_window_size: int, k: int):
-    pred = clf.predict(x_test)
-    pred_proba = clf.predict_proba(x_test)
-
-    # スムージング
-    smoothed_pred = smooth_result(pred_proba, window_size=smooth_window_size)
-
-    # 評価
-    accurary = np.mean(pred == y_test)
-    smoothed_accurary = np.mean(smoothed_pred == y_test[: len(smoothed_pred)])
-    top_k = np.argsort(pred_proba, axis=1)[:, -k:]
-    top_k_accurary = np.mean([y in top_k[i] for i, y in enumerate(y_test)])
-
-    return accurary, smoothed_accurary, top_k_accurary, pred, pred_proba, smoothed_pred
+def predict(clf: Model, x_test: pd.DataFrame):
+    with profiling.stage("predict", rows=len(x_test)):
+        return clf.predict_with_proba(x_test)
 
 
 def to_top_k_pred(pred_proba: np.ndarray, y_test: pd.Series, k: int):
     y_test_ = np.array(y_test)
-    pred_proba_ = np.array(pred_proba)
+    pred_proba_ = np.array(pred_proba, dtype=np.int64)
 
     top_k = pred_proba_[:, :k]
-    print(top_k)
     result = pred_proba_[:, 0]
 
     # top_kのうち正解があればそれに置き換える
-    mask = np.array([y_test_[i] in tk for i, tk in enumerate(top_k)])
+    mask = rank_hits(top_k, y_test_)
     result[mask] = y_test_[mask]
 
     return result, mask
 
 
-def save_result(
-    accuracy: float,
-    smoothed_accurary: float,
-    top_k_accurary: float,
+def save_prediction(
     pred: np.ndarray,
     pred_proba: np.ndarray,
-    smoothed_pred_proba: np.ndarray,
     output_dir: str,
+    test_data_names: list[str],
+    meta: dict | None = None,
 ):
+    fold_name = "_".join(test_data_names)
+
     # pred を保存
-    pred_file_path = os.path.join(output_dir, "pred.csv")
+    pred_file_path = os.path.join(output_dir, f"pred_{fold_name}.npy")
     print(f">> Save: {pred_file_path}")
-    np.savetxt(pred_file_path, pred, delimiter=",")
+    np.save(pred_file_path, pred)
 
     # pred_proba を保存
-    pred_proba_file_path = os.path.join(output_dir, "pred_proba.csv")
+    pred_proba_file_path = os.path.join(output_dir, f"pred_proba_{fold_name}.npy")
     print(f">> Save: {pred_proba_file_path}")
-    np.savetxt(pred_proba_file_path, pred_proba, delimiter=",")
-
-    # smoothed_pred_proba を保存
-    smoothed_pred_proba_file_path = os.path.join(output_dir, "smoothed_pred_proba.csv")
-    print(f">> Save: {smoothed_pred_proba_file_path}")
-    np.savetxt(
-        smoothed_pred_proba_file_path,
-        smoothed_pred_proba,
-        delimiter=",",
-    )
+    np.save(pred_proba_file_path, pred_proba)
 
-    # accuracy を保存
-    result_file_path = os.path.join(output_dir, "result_4_5.txt")
-    print(f">> Save: {result_file_path}")
-    with open(result_file_path, "w") as f:
-        print(f"accuracy: {accuracy}", file=f)
-        print(f"smoothed_accurary: {smoothed_accurary}", file=f)
-        print(f"top_k_accurary: {top_k_accurary}", file=f)
+    # 予測結果 (とモデル) を作った特徴量を最後に保存する
+    if meta is not None:
+        with open(prediction_meta_path(output_dir, test_data_names), "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
 
 
-def load_result(output_dir: str):
-    result_file_path = os.path.join(output_dir, "result.txt")
-    result: dict[str, str | float] = {}
+def prediction_meta_path(output_dir: str, test_data_names: list[str]):
+    return os.path.join(output_dir, f"pred_meta_{'_'.join(test_data_names)}.json")
 
-    if not os.path.exists(result_file_path):
-        return result
 
-    with open(result_file_path, "r") as f:
-        lines = f.readlines()
-        for line in lines:
-            key_, value_ = line.split(":")
-            key = key_.strip()
-            value = value_.strip()
-            result[key] = float(value)
+def is_prediction_current(output_dir: str, test_data_names: list[str], meta: dict):
+    """
+    保存済みの予測結果とモデルが meta (特徴量の列とデータのハッシュ) で作られたものかどうか
+    """
 
-    return result
+    meta_path = prediction_meta_path(output_dir, test_data_names)
+    if not os.path.exists(meta_path):
+        return False
 
+    with open(meta_path, "r") as f:
+        return json.load(f) == meta
 
-def plot_result(y_test, pred: np.ndarray, labels: Labels, output_dir: str):
-    plt.figure(figsize=(10, 3))
-    plt.xlim(0, len(y_test))
-    plt.ylim(0, 1)
 
-    for i, label_id in enumerate(y_test):
-        # y_testに合わせて背景色を設定
-        plt.axvspan(i, i + 1, 0.5, 1, color=labels.color_by_id(label_id), alpha=0.5)
+def load_prediction(
+    output_dir: str, test_data_names: list[str], meta: dict | None = None
+):
+    fold_name = "_".join(test_data_names)
+    pred_file_path = os.path.join(output_dir, f"pred_{fold_name}.npy")
+    pred_proba_file_path = os.path.join(output_dir, f"pred_proba_{fold_name}.npy")
 
-    # 予測結果をプロット
-    for i, label_id in enumerate(pred):
-        plt.axvspan(i, i + 1, 0, 0.5, color=labels.color_by_id(label_id))
+    if not os.path.exists(pred_file_path) or not os.path.exists(pred_proba_file_path):
+        return None
 
-    file_path = os.path.join(output_dir, "result.png")
-    plt.savefig(file_path)
-    print(f">> Save: {file_path}")
+    # 特徴量の列やデータが変わった場合は再利用しない
+    if meta is not None and not is_prediction_current(
+        output_dir, test_data_names, meta
+    ):
+        print(f">> Stale prediction: {pred_proba_file_path}")
+        return None
+
+    print(f">> Load prediction: {pred_proba_file_path}")
+    return np.load(pred_file_path), np.load(pred_proba_file_path)
+
+
+def save_result(
+    accuracy: float,
+    smoothed_accurary: float,
+    top_k_accurary: float,
+    smoothed_pred: np.ndarray,
+    output_dir: str,
+    test_data_names: list[str],
+):
+    fold_name = "_".join(test_data_names)
+
+    # smoothed_pred を保存
+    smoothed_pred_file_path = os.path.join(output_dir, f"smoothed_pred_{fold_name}.csv")
+    print(f">> Save: {smoothed_pred_file_path}")
+    np.savetxt(smoothed_pred_file_path, smoothed_pred, delimiter=",")
+
+    # accuracy を保存
+    result_file_path = os.path.join(output_dir, f"result_{fold_name}.txt")
+    print(f">> Save: {result_file_path}")
+    with open(result_file_path, "w") as f:
+        print(f"accuracy: {accuracy}", file=f)
+        print(f"smoothed_accurary: {smoothed_accurary}", file=f)
+        print(f"top_k_accurary: {top_k_accurary}", file=f)
+
+
+def save_report(
+    result: EvaluationResult,
+    labels: Labels,
+    output_dir: str,
+    test_data_names: list[str],
+):
+    # クラスごとの適合率, 再現率を保存
+    report_file_path = os.path.join(
+        output_dir, f"report_{'_'.join(test_data_names)}.txt"
+    )
+    print(f">> Save: {report_file_path}")
+    with open(report_file_path, "w") as f:
+        f.write(result.report(target_names=list(labels)))
 
 
 def plot_result_by_graph(
@@ -239,6 +305,7 @@ def plot_result_by_graph(
     fontsize = 20
     line_width = 2
 
+    plt = pyplot()
     plt.figure(figsize=(10, 4))
 
     x_pred = [x / 60 / 6 for x in np.arange(len(pred))]
@@ -320,7 +387,7 @@ def plot_one_graph(ax, title, pred, y_test, labels, fontsize, line_width=2):
 def plot_results_by_graph(
     title_list: list[str],
     pred_list: list[np.ndarray],
-    y_test: pd.Series,
+    y_test: pd.Series | np.ndarray,
     labels: Labels,
     file_path: str,
     fontsize=28,
@@ -340,6 +407,7 @@ def plot_results_by_graph(
     """
 
     num_plots = len(pred_list)
+    plt = pyplot()
     fig, axes = plt.subplots(nrows=num_plots, ncols=1, figsize=(10, 6.8 * num_plots))
 
     for title, pred, ax in zip(title_list, pred_list, axes.flat):
@@ -351,67 +419,131 @@ def plot_results_by_graph(
     print(f">> Save: {file_path}")
 
 
-def main():
-    labels = Labels(os.path.join(INPUT_DIR, "labels.csv"))
+def model_dir_of(model_type: str, segment_wsize: int, segment_gsize: int):
+    model_key = f"{model_type}_segmentw{segment_wsize}_segmentgap{segment_gsize}"
+    return os.path.join(OUTPUT_BASE_DIR, "models", model_key)
+
+
+def run_fold(
+    job: tuple[str, int, int, list[str]],
+    handles: dict[tuple[int, int], dict],
+    labels: Labels,
+    fingerprints: dict[tuple[int, int], str],
+    feature_columns: list[str] | None = None,
+    n_jobs: int | None = None,
+):
+    """
+    1つのフォールドを学習・推定する (ワーカープロセスで実行する)
+
+    特徴量は共有メモリの行列から取り出す. 保存済みの予測結果とモデルは,
+    同じ特徴量の列とデータ (fingerprints) から作ったものだけを再利用する
+
+    Parameters
+    ----------
+    job : tuple[str, int, int, list[str]]
+        (モデル, セグメントのウィンドウサイズ, 間隔, テストデータ名)
+    handles : dict[tuple[int, int], dict]
+        (ウィンドウサイズ, 間隔) ごとの SharedFeatureMatrix.handle
+    labels : Labels
+        ラベル
+    fingerprints : dict[tuple[int, int], str]
+        (ウィンドウサイズ, 間隔) ごとの SharedFeatureMatrix.fingerprint
+    feature_columns : list[str], optional
+        学習・推定に使う特徴量の列
+    n_jobs : int, optional
+        学習・推定のスレッド数
 
-    for model_type, segment_wsize, segment_gsize, smooth_wsize in all_combinations(
-        model_types,
-        segment_window_size_list,
-        segment_gap_size_list,
-        smooth_window_size_list,
+    Returns
+    -------
+    pred : np.ndarray
+        予測クラス
+    pred_proba : np.ndarray
+        予測確率
+    """
+
+    model_type, segment_wsize, segment_gsize, test_data_names = job
+    model_dir = model_dir_of(model_type, segment_wsize, segment_gsize)
+
+    meta = {
+        "feature_columns": feature_columns,
+        "data": fingerprints[(segment_wsize, segment_gsize)],
+    }
+    current = is_prediction_current(model_dir, test_data_names, meta)
+    prediction = load_prediction(model_dir, test_data_names, meta)
+    if prediction is not None:
+        return prediction
+
+    with profiling.context(
+        model=model_type,
+        segment_w=segment_wsize,
+        segment_gap=segment_gsize,
+        fold="_".join(test_data_names),
     ):
-        smooth_wsize_min = int(smooth_wsize / segment_gsize)
-        key = f"{model_type}_segmentw{segment_wsize}_segmentgap{segment_gsize}_smoothw{smooth_wsize}"
-        if key not in [
-            "xgboost_segmentw120_segmentgap10_smoothw360",
-        ]:
-            continue
-        print(f"\n== {key} ==")
+        with profiling.stage("split"):
+            matrix = SharedFeatureMatrix.attach(handles[(segment_wsize, segment_gsize)])
+            x_train, y_train, x_test, _ = matrix.split(test_data_names)
 
-        output_dir = os.path.join(OUTPUT_BASE_DIR, key)
-        os.makedirs(output_dir, exist_ok=True)
+        print(
+            f"> Train: {model_type} w{segment_wsize} g{segment_gsize} {test_data_names}"
+        )
+        clf = train(
+            x_train,
+            y_train,
+            labels,
+            model_type,
+            model_dir,
+            test_data_names,
+            feature_columns=feature_columns,
+            n_jobs=n_jobs,
+            reuse=current,
+        )
+        prediction = predict(clf, x_test)
+        with profiling.stage("save_prediction"):
+            save_prediction(*prediction, model_dir, test_data_names, meta)
 
-        # 前処理
-        print("> Preprocess")
-        data_dir = preprocess(segment_wsize, segment_gsize, labels, output_dir)
+    return prediction
 
-        # データの読み込み
-        for test_data_names in test_data_group_list:
-            print(f"> LoadData: {test_data_names}")
-            x_train, y_train, x_test, y_test = load_data(data_dir, test_data_names)
 
-            # 学習
-            print("> Train")
-            clf = train(
-                x_train, y_train, labels, model_type, output_dir, test_data_names
-            )
+def plot_fold(
+    renderer: RenderQueue,
+    model_type: str,
+    segment_wsize: int,
+    segment_gsize: int,
+    pred_proba: np.ndarray,
+    y_test: pd.Series,
+    smooth_wsizes_min: dict[int, int],
+    labels: Labels,
+):
+    """
+    フォールドの推定結果をスムージングしてプロットする
+
+    描画は renderer のバックグラウンドのプロセスで行い、完了を待たない
+    """
 
-            # テスト
-            print("> Test")
-            (
-                accuracy,
-                smoothed_accurary,
-                top_k_accurary,
-                pred,
-                pred_proba,
-                smoothed_pred,
-            ) = test(clf, x_test, y_test, smooth_wsize_min, top_k)
-
-        # 結果のプロット
-        print("> PlotResult")
-
-        start = int(len(y_test) / 2) + 500
-        smooth_pred_proba = smooth_results(pred_proba, window_size=smooth_wsize_min)
+    # 結果のプロット
+    print("> PlotResult")
+
+    start = int(len(y_test) / 2) + 500
+    with profiling.stage("smoothing", rows=len(pred_proba), model=model_type):
+        smooth_pred_probas = smooth_top_k_batch(
+            pred_proba, list(smooth_wsizes_min.values()), k=top_k
+        )
+    for smooth_wsize, smooth_wsize_min in smooth_wsizes_min.items():
+        key = to_key(model_type, segment_wsize, segment_gsize, smooth_wsize)
+        smooth_pred_proba = smooth_pred_probas[smooth_wsize_min]
         y_test_ = y_test[int(smooth_wsize_min / 2) : -int(smooth_wsize_min / 2)]
         smoothed_top_1_pred, mask1 = to_top_k_pred(smooth_pred_proba, y_test_, 1)
         smoothed_top_3_pred, mask3 = to_top_k_pred(smooth_pred_proba, y_test_, 3)
-        plot_results_by_graph(
-            ["XGboost の Top-1の結果", "XGboost の Top-3の結果"],
-            [smoothed_top_1_pred[start:], smoothed_top_3_pred[start:]],
-            y_test_[start:],
-            labels,
-            file_path=f"./images/{model_type}_top1_top3.png",  # "result_graph_top_k.png",
-        )
+        # 描画の時間は renderer のプロセスで plotting として計測する
+        with profiling.context(model=model_type, smooth_w=smooth_wsize):
+            renderer.submit(
+                plot_results_by_graph,
+                ["XGboost の Top-1の結果", "XGboost の Top-3の結果"],
+                [smoothed_top_1_pred[start:], smoothed_top_3_pred[start:]],
+                np.asarray(y_test_[start:]),
+                labels,
+                file_path=f"./images/{key}_top1_top3.png",  # "result_graph_top_k.png",
+            )
 
         # mask3 を表示
         # plt.figure(figsize=(10, 3))
@@ -419,5 +551,202 @@ def main():
         # plt.show()
 
 
+def main(workers=1, cpus: int | None = None, plots=True):
+    """
+    Parameters
+    ----------
+    workers : int
+        前処理と学習・推定のプロセス数
+    cpus : int, optional
+        使うコア数 (None の場合はすべてのコア).
+        workers のプロセスで分け, 残りはライブラリのスレッドで使う
+    plots : bool
+        結果をプロットするかどうか
+    """
+
+    workers, threads = split_threads(workers, cpus)
+
+    labels = Labels(os.path.join(INPUT_DIR, "labels.csv"))
+
+    combinations = [
+        combination
+        for combination in all_combinations(
+            model_types,
+            segment_window_size_list,
+            segment_gap_size_list,
+            smooth_window_size_list,
+        )
+        if target_keys is None or to_key(*combination) in target_keys
+    ]
+
+    feature_columns = None
+    if FEATURE_SUBSET_PATH is not None:
+        feature_columns = load_feature_subset(FEATURE_SUBSET_PATH)
+
+    # 前処理 (必要なウィンドウサイズの特徴量をまとめて計算する)
+    print("> Preprocess")
+    windows = sorted(set((w, g) for _, w, g, _ in combinations))
+    with profiling.stage("preprocess"):
+        data_dirs = preprocess(
+            windows,
+            labels,
+            workers=workers,
+            threads=threads,
+            feature_columns=feature_columns,
+        )
+
+    # (モデル, セグメントのウィンドウサイズ, 間隔) ごとにスムージングのウィンドウサイズをまとめる
+    smooth_wsizes_by_model: dict[tuple[str, int, int], list[int]] = {}
+    for model_type, segment_wsize, segment_gsize, smooth_wsize in combinations:
+        smooth_wsizes_by_model.setdefault(
+            (model_type, segment_wsize, segment_gsize), []
+        ).append(smooth_wsize)
+
+    # 学習と予測は (モデル, ウィンドウ, フォールド) ごとに1回だけ行い、すべてのスムージングで共有する
+    jobs = [
+        (model_type, segment_wsize, segment_gsize, test_data_names)
+        for model_type, segment_wsize, segment_gsize in smooth_wsizes_by_model
+        for test_data_names in test_data_group_list
+    ]
+    for model_type, segment_wsize, segment_gsize in smooth_wsizes_by_model:
+        os.makedirs(
+            model_dir_of(model_type, segment_wsize, segment_gsize), exist_ok=True
+        )
+
+    # すべての収録の特徴量を共有メモリに1回だけ読み込み、ワーカーで共有する.
+    # フォールドの順に並べ、学習データを連結せずにビューで取り出せるようにする
+    print("> LoadData")
+    matrices = {}
+    for window in windows:
+        with profiling.stage("load_features") as record:
+            matrices[window] = SharedFeatureMatrix.from_dir(
+                data_dirs[window],
+                columns=feature_columns,
+                folds=test_data_group_list,
+            )
+            record["rows"] = len(matrices[window].label)
+    fingerprints = {window: matrix.fingerprint() for window, matrix in matrices.items()}
+    try:
+        # 図は学習・推定と並行してバックグラウンドで描画する.
+        # 結果はフォールドごとにデータベースに書き込む
+        with (
+            RenderQueue(workers=1 if plots else 0) as renderer,
+            ResultsStore(os.path.join(OUTPUT_BASE_DIR, RESULTS_DB_FILE)) as store,
+        ):
+            handles = {window: matrix.handle for window, matrix in matrices.items()}
+            predictions = ordered_map(
+                partial(
+                    run_fold,
+                    handles=handles,
+                    labels=labels,
+                    fingerprints=fingerprints,
+                    feature_columns=feature_columns,
+                    n_jobs=threads,
+                ),
+                jobs,
+                workers=workers,
+                threads=threads,
+            )
+
+            rows = []
+            for job, (pred, pred_proba) in zip(jobs, predictions):
+                model_type, segment_wsize, segment_gsize, test_data_names = job
+                matrix = matrices[(segment_wsize, segment_gsize)]
+                _, y_test = matrix.take(matrix.recording_slices(test_data_names))
+                y_test = pd.Series(np.array(y_test), name="label")
+
+                smooth_wsizes_min = {
+                    smooth_wsize: int(smooth_wsize / segment_gsize)
+                    for smooth_wsize in smooth_wsizes_by_model[
+                        (model_type, segment_wsize, segment_gsize)
+                    ]
+                }
+
+                keys = {
+                    "model": model_type,
+                    "segment_w": segment_wsize,
+                    "segment_gap": segment_gsize,
+                    "fold": "_".join(test_data_names),
+                }
+                print(f"> Evaluate: {model_type} w{segment_wsize} {test_data_names}")
+                with profiling.stage("evaluation", rows=len(y_test), **keys):
+                    result = evaluate(
+                        pred_proba,
+                        y_test,
+                        [top_k],
+                        list(smooth_wsizes_min.values()),
+                        pred=pred,
+                    )
+                with profiling.stage("save_result", **keys):
+                    fold_rows = []
+                    save_report(
+                        result,
+                        labels,
+                        model_dir_of(model_type, segment_wsize, segment_gsize),
+                        test_data_names,
+                    )
+                    for smooth_wsize, smooth_wsize_min in smooth_wsizes_min.items():
+                        key = to_key(
+                            model_type, segment_wsize, segment_gsize, smooth_wsize
+                        )
+                        output_dir = os.path.join(OUTPUT_BASE_DIR, key)
+                        os.makedirs(output_dir, exist_ok=True)
+                        save_result(
+                            result.accuracy,
+                            result.smoothed_accuracy[smooth_wsize_min],
+                            result.top_k_accuracy[top_k],
+                            result.smoothed_pred[smooth_wsize_min],
+                            output_dir,
+                            test_data_names,
+                        )
+                        fold_rows.append(
+                            {
+                                "model": model_type,
+                                "segment_w": segment_wsize,
+                                "segment_gap": segment_gsize,
+                                "smooth_w": smooth_wsize,
+                                "fold": "_".join(test_data_names),
+                                "accuracy": result.accuracy,
+                                "smoothed_accuracy": result.smoothed_accuracy[
+                                    smooth_wsize_min
+                                ],
+                                "top_k_accuracy": result.top_k_accuracy[top_k],
+                            }
+                        )
+                    store.write(fold_rows)
+                    rows.extend(fold_rows)
+
+                # 最後のフォールドの結果をプロットする
+                if plots and test_data_names == test_data_group_list[-1]:
+                    plot_fold(
+                        renderer,
+                        model_type,
+                        segment_wsize,
+                        segment_gsize,
+                        pred_proba,
+                        y_test,
+                        smooth_wsizes_min,
+                        labels,
+                    )
+
+            # すべての結果を1つの表にまとめる (描画の完了は待たない)
+            results = pd.DataFrame(rows)
+            results.to_csv(os.path.join(OUTPUT_BASE_DIR, "results.csv"), index=False)
+            print(results.to_string(index=False))
+    finally:
+        for matrix in matrices.values():
+            matrix.unlink()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cpus", type=int)
+    parser.add_argument("--profile-log", type=str)
+    parser.add_argument("--profile-stage", type=str)
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    profiling.configure(args.profile_log, args.profile_stage)
+    with profiling.stage("pipeline"):
+        main(workers=args.workers, cpus=args.cpus, plots=not args.no_plots)
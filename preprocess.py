@@ -1,23 +1,49 @@
 import os
 import json
 import shutil
+import numpy as np
 import pandas as pd
-from mcp_persor import BVHparser
 import argparse
-
-from modules.common.labels import Labels
-
-parser = argparse.ArgumentParser()
-parser.add_argument("--key", type=str, default="default")
-parser.add_argument("--pick", type=str)
-args = parser.parse_args()
-
-KEY = args.key
-PICK_DIR = args.pick
+from contextlib import ExitStack
+from functools import partial
+from typing import Iterable, Iterator
+
+from modules.common.bvh import parse_bvh, to_motion_df
+from modules.common.feature_store import (
+    FEATURE_STORE_SUFFIX,
+    FeatureStoreWriter,
+    write_features,
+)
+from modules.common.labels import Labels, label_timeline
+from modules.common.motion_cache import load_motion_df, read_catalog, write_catalog
+from modules.common import profiling
+from modules.common.parallel import ordered_map
+from modules.common.threads import split_threads
+from modules.estimation.feature_selection import load_feature_subset
+from modules.feature.window import (
+    FEATURE_STATS,
+    FeatureSubset,
+    extract_multi_window_features,
+    extract_window_features,
+)
+
+# コマンドライン引数 (__main__ で上書きする)
+KEY = "default"
+PICK_DIR: str | None = None
+WORKERS = 1
+EXPORT_FORMAT = "npy"
+MIN_FRAMES = 0
+USE_CACHE = True
+REPORT = False
+# 計算する特徴量の部分集合 (feature_selection で保存した JSON)
+FEATURE_SUBSET_PATH: str | None = None
 
 INPUT_DIR = os.path.join("./data/input/", KEY)
 OUTPUT_DIR = os.path.join("./data/output/", KEY)
 
+# 出力形式ごとの拡張子
+EXPORT_SUFFIXES = {"npy": FEATURE_STORE_SUFFIX, "csv": ".csv"}
+
 BVH_CHANNELS = {
     "POSITION": ["Xposition", "Yposition", "Zposition"],
     "ROTATION": ["Zrotation", "Xrotation", "Yrotation"],
@@ -32,7 +58,7 @@ BVH_CHANNELS = {
 }
 
 
-def get_data_files(input_dir: str) -> list[dict[str, str]]:
+def get_data_files(input_dir: str, min_frames=0) -> list[dict[str, str]]:
     """
     データファイルのパスを取得する
 
@@ -40,6 +66,8 @@ def get_data_files(input_dir: str) -> list[dict[str, str]]:
     ----------
     input_dir : str
         データファイルが格納されているディレクトリのパス
+    min_frames : int
+        フレーム数がこれより少ない収録を除く (カタログにない収録は除かない)
 
     Returns
     -------
@@ -63,21 +91,65 @@ def get_data_files(input_dir: str) -> list[dict[str, str]]:
         if PICK_DIR is not None and data_name != PICK_DIR:
             continue
 
-        data_files_list.append(
-            {"label": label_path, "motion": motion_path, "name": data_name}
-        )
+        data_files = {"label": label_path, "motion": motion_path, "name": data_name}
+
+        if min_frames > 0:
+            catalog = read_catalog(data_files)
+            if catalog is not None and catalog["frames"] < min_frames:
+                continue
+
+        data_files_list.append(data_files)
 
     return data_files_list
 
 
-def to_dataframe(data_files: dict[str, str], labels: Labels) -> pd.DataFrame:
+def report_data_files(data_files_list: list[dict[str, str]]):
+    """
+    カタログに記録してある収録の情報を表示する
+
+    Parameters
+    ----------
+    data_files_list : list
+        データファイルのパスのリスト
+
+    Returns
+    -------
+    None
+    """
+
+    for data_files in data_files_list:
+        catalog = read_catalog(data_files)
+        if catalog is None:
+            print(f"- {data_files['name']}: (not cataloged)")
+            continue
+
+        frames = catalog["frames"]
+        frame_rate = catalog["frame_rate"]
+        print(
+            f"- {data_files['name']}: {frames} frames, {frame_rate:.1f} fps,"
+            f" {frames / frame_rate / 60:.1f} min"
+        )
+        for label, count in catalog["label_histogram"].items():
+            print(f"    {label}: {count}")
+
+
+def to_dataframe(
+    data_files: dict[str, str], labels: Labels, use_cache=True
+) -> pd.DataFrame:
     """
     データファイルを DataFrame に変換する
 
+    use_cache が True の場合はパース済みモーションのキャッシュを使い、
+    収録のフレーム数とラベルの内訳をカタログに記録する
+
     Parameters
     ----------
     data_files : list
         データファイルのリスト
+    labels : Labels
+        ラベル
+    use_cache : bool
+        キャッシュを使うかどうか
 
     Returns
     -------
@@ -85,29 +157,67 @@ def to_dataframe(data_files: dict[str, str], labels: Labels) -> pd.DataFrame:
         データファイルを結合した DataFrame
     """
 
-    bvhp = BVHparser(data_files["motion"])
-    motion_df = bvhp.get_motion_df()
-    frame_rate = 1 / bvhp.frame_time
+    with profiling.stage("parse") as record:
+        if use_cache:
+            motion_df, frame_time = load_motion_df(data_files["motion"])
+        else:
+            values, columns, frame_time = parse_bvh(data_files["motion"])
+            motion_df = to_motion_df(values, columns, frame_time)
+        record["rows"] = len(motion_df)
+    frame_rate = 1 / frame_time
 
     # motion_df にラベルを追加
-    motion_df["label"] = labels.other_id()
-
     with open(data_files["label"]) as f:
         content = json.load(f)
         tricks = content[0]["tricks"]
 
-    for trick in tricks:
-        start_s = trick["start"]
-        end_s = trick["end"]
-        label = trick["labels"][0]
-        label_id = labels.id(label)
+    with profiling.stage("label", rows=len(motion_df)):
+        motion_df["label"] = label_timeline(tricks, labels, len(motion_df), frame_rate)
+
+    if use_cache:
+        label_ids, counts = np.unique(motion_df["label"], return_counts=True)
+        write_catalog(
+            data_files,
+            frames=len(motion_df),
+            frame_rate=frame_rate,
+            label_histogram={
+                labels.label(int(label_id)): int(count)
+                for label_id, count in zip(label_ids, counts)
+            },
+        )
 
-        start = int(start_s * frame_rate)
-        end = int(end_s * frame_rate)
+    return motion_df
 
-        motion_df.loc[start:end, "label"] = label_id
 
-    return motion_df
+def iter_motion_by_label(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    """
+    ラベルが連続する区間ごとにデータを1つずつ返す
+
+    順序は split_motion_by_label と同じ (ラベル順, 同じラベルの中では時系列順)
+
+    Parameters
+    ----------
+    df : DataFrame
+        ラベルが追加された DataFrame
+
+    Returns
+    -------
+    grouped_df : Iterator[pd.DataFrame]
+        ラベルが連続する区間の DataFrame
+    """
+
+    label = df["label"].to_numpy()
+    if len(label) == 0:
+        return
+
+    with profiling.stage("split", rows=len(label)):
+        boundaries = np.flatnonzero(label[1:] != label[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(label)]])
+        order = np.lexsort((starts, label[starts]))
+
+    for i in order:
+        yield df.iloc[starts[i] : ends[i]]
 
 
 def split_motion_by_label(df: pd.DataFrame, labels: Labels) -> list[pd.DataFrame]:
@@ -125,18 +235,7 @@ def split_motion_by_label(df: pd.DataFrame, labels: Labels) -> list[pd.DataFrame
         ラベルごとに分割された DataFrame のリスト
     """
 
-    df["group"] = (df["label"] != df["label"].shift()).cumsum()
-    grouped_df_list = [group for _, group in df.groupby(["label", "group"])]
-
-    # group 列を削除
-    for grouped_df in grouped_df_list:
-        label = grouped_df["label"].iloc[0]
-        if label == labels.unuse_id():
-            continue
-
-        grouped_df.drop(columns=["group"], inplace=True)
-
-    return grouped_df_list
+    return list(iter_motion_by_label(df))
 
 
 def get_index_names(index: pd.Index | pd.MultiIndex, suffix: str) -> list[str]:
@@ -164,10 +263,69 @@ def get_index_names(index: pd.Index | pd.MultiIndex, suffix: str) -> list[str]:
     )
 
 
+def to_feature_subset(
+    value_columns: pd.Index, feature_columns: list[str] | None
+) -> FeatureSubset | None:
+    """
+    計算する特徴量の列から FeatureSubset を作る (None の場合はすべての特徴量)
+    """
+
+    if feature_columns is None:
+        return None
+
+    return FeatureSubset(list(value_columns), feature_columns)
+
+
+def to_feature_df(
+    features: np.ndarray,
+    window_labels: np.ndarray,
+    value_columns: pd.Index,
+    subset: FeatureSubset | None = None,
+) -> pd.DataFrame:
+    """
+    特徴量の配列を DataFrame に変換する
+
+    Parameters
+    ----------
+    features : np.ndarray
+        (ウィンドウ数, 列数 * 5) の特徴量
+    window_labels : np.ndarray
+        ウィンドウごとのラベル
+    value_columns : pd.Index
+        スケルトンの列名
+    subset : FeatureSubset, optional
+        計算した特徴量. None の場合はすべての特徴量
+
+    Returns
+    -------
+    feature_values_df : pd.DataFrame
+        特徴量の DataFrame. ウィンドウがない場合は空の DataFrame
+    """
+
+    if len(features) == 0:
+        return pd.DataFrame()
+
+    if subset is not None:
+        feature_values_df = pd.DataFrame(features, columns=subset.columns)
+        feature_values_df["label"] = window_labels
+        return feature_values_df
+
+    columns = sum(
+        [get_index_names(value_columns, f"pos-{stat}") for stat in FEATURE_STATS],
+        [],
+    )
+    feature_values_df = pd.DataFrame(features, columns=columns)
+    # 最も多いラベル
+    feature_values_df["label"] = window_labels
+
+    return feature_values_df
+
+
 def segment_and_extract_feature(
     df: pd.DataFrame,
     window_size_frame=3 * 60,  # ウィンドウサイズ
     gap_size_frame=1 * 1,  # ウィンドウの間隔
+    feature_columns: list[str] | None = None,
 ) -> pd.DataFrame:
     """
     スケルトンのDaraFrameを特徴量のDataFrameに変換する
@@ -180,56 +338,20 @@ def segment_and_extract_feature(
         ウィンドウサイズ, by default 100
     gap_size_frame: int, optional
         ウィンドウの間隔, by default 10
+    feature_columns: list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
     """
 
-    feature_values_df = pd.DataFrame()
-
-    end = len(df) - window_size_frame
-    for i in range(0, end, gap_size_frame):
-        label_df = df.iloc[i : i + window_size_frame + 1]["label"]
-        part_df = df.iloc[i : i + window_size_frame + 1].drop(columns=["label"])
-        ## 平均
-        pos_part_df_avg = part_df.mean()
-        pos_part_avg_names = get_index_names(pos_part_df_avg.index, "pos-avg")
-        ## 分散
-        pos_part_df_var = part_df.var()
-        pos_part_var_names = get_index_names(pos_part_df_var.index, "pos-var")
-        ## 標準偏差
-        pos_part_df_std = part_df.std()
-        pos_part_std_names = get_index_names(pos_part_df_std.index, "pos-std")
-        ## 最大値
-        pos_part_df_max = part_df.max()
-        pos_part_max_names = get_index_names(pos_part_df_max.index, "pos-max")
-        ## 最小値
-        pos_part_df_min = part_df.min()
-        pos_part_min_names = get_index_names(pos_part_df_min.index, "pos-min")
-
-        line = (
-            pd.concat(
-                [
-                    pos_part_df_avg,
-                    pos_part_df_var,
-                    pos_part_df_std,
-                    pos_part_df_max,
-                    pos_part_df_min,
-                ],
-            )
-            .to_frame()
-            .T
-        )
-        line.columns = (
-            pos_part_avg_names
-            + pos_part_var_names
-            + pos_part_std_names
-            + pos_part_max_names
-            + pos_part_min_names
-        )
-
-        # 最も多いラベルを取得
-        label = label_df.mode().iloc[0]
-        line["label"] = label
-
-        feature_values_df = pd.concat([feature_values_df, line])
+    value_df = df.drop(columns=["label"])
+    subset = to_feature_subset(value_df.columns, feature_columns)
+    features, window_labels = extract_window_features(
+        value_df.to_numpy(dtype=np.float64),
+        df["label"].to_numpy(),
+        window_size_frame,
+        gap_size_frame,
+        subset,
+    )
+    feature_values_df = to_feature_df(features, window_labels, value_df.columns, subset)
 
     # for i in range(0, end, gap_size_frame):
     #     part_df = df.iloc[i : i + window_size_frame]
@@ -323,6 +445,111 @@ def segment_and_extract_feature(
     return feature_values_df
 
 
+def iter_feature_blocks(
+    df: pd.DataFrame,
+    window_size_frame: int,
+    gap_size_frame: int,
+    feature_columns: list[str] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    ラベルが連続する区間ごとに特徴量の DataFrame を1つずつ返す
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        ラベルが追加されたスケルトンの DataFrame
+    window_size_frame: int
+        ウィンドウサイズ
+    gap_size_frame: int
+        ウィンドウの間隔
+    feature_columns: list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
+
+    Returns
+    -------
+    feature_values_df : Iterator[pd.DataFrame]
+        特徴量の DataFrame (空の区間は返さない)
+    """
+
+    for grouped_df in iter_motion_by_label(df):
+        feature_values_df = segment_and_extract_feature(
+            grouped_df,
+            window_size_frame=window_size_frame,
+            gap_size_frame=gap_size_frame,
+            feature_columns=feature_columns,
+        )
+        if not feature_values_df.empty:
+            yield feature_values_df
+
+
+def iter_multi_window_feature_blocks(
+    df: pd.DataFrame,
+    windows: list[tuple[int, int]],
+    feature_columns: list[str] | None = None,
+) -> Iterator[dict[tuple[int, int], pd.DataFrame]]:
+    """
+    ラベルが連続する区間ごとに、複数のウィンドウサイズ・間隔の特徴量を返す
+
+    区間ごとに累積和を一度だけ計算し、すべてのウィンドウで共有する
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        ラベルが追加されたスケルトンの DataFrame
+    windows : list[tuple[int, int]]
+        (ウィンドウサイズ, ウィンドウの間隔) のリスト
+    feature_columns: list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
+
+    Returns
+    -------
+    blocks : Iterator[dict[tuple[int, int], pd.DataFrame]]
+        (ウィンドウサイズ, ウィンドウの間隔) ごとの特徴量の DataFrame
+    """
+
+    for grouped_df in iter_motion_by_label(df):
+        value_df = grouped_df.drop(columns=["label"])
+        subset = to_feature_subset(value_df.columns, feature_columns)
+        multi_window_features = extract_multi_window_features(
+            value_df.to_numpy(dtype=np.float64),
+            grouped_df["label"].to_numpy(),
+            windows,
+            subset,
+        )
+        yield {
+            window: to_feature_df(features, window_labels, value_df.columns, subset)
+            for window, (features, window_labels) in multi_window_features.items()
+        }
+
+
+def extract_features(
+    df: pd.DataFrame, window_size_frame: int, gap_size_frame: int
+) -> pd.DataFrame:
+    """
+    スケルトンの DataFrame 全体を特徴量の DataFrame に変換する
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        ラベルが追加されたスケルトンの DataFrame
+    window_size_frame: int
+        ウィンドウサイズ
+    gap_size_frame: int
+        ウィンドウの間隔
+
+    Returns
+    -------
+    feature_values_df : pd.DataFrame
+        特徴量の DataFrame
+    """
+
+    blocks = list(iter_feature_blocks(df, window_size_frame, gap_size_frame))
+    if len(blocks) == 0:
+        return pd.DataFrame()
+
+    return pd.concat(blocks, ignore_index=True)
+
+
 def export_csv(df: pd.DataFrame, output_path: str):
     """
     DataFrame を CSV ファイルに出力する
@@ -347,6 +574,182 @@ def export_csv(df: pd.DataFrame, output_path: str):
     df.to_csv(output_path, index=False)
 
 
+def export_csv_blocks(blocks: Iterable[pd.DataFrame], output_path: str):
+    """
+    DataFrame を1ブロックずつ CSV ファイルに書き出す
+
+    結合してから export_csv した場合と同じ内容になる.
+    書き込み中のファイルは一時ファイルに置き、完了してから置き換える
+
+    Parameters
+    ----------
+    blocks : Iterable[pd.DataFrame]
+        出力する DataFrame (すべて同じ列を持つ)
+    output_path : str
+        出力するファイルのパス
+
+    Returns
+    -------
+    None
+    """
+
+    output_dir = os.path.dirname(output_path)
+
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with open(tmp_path, "w", newline="") as f:
+            header = True
+            for block in blocks:
+                block.to_csv(f, index=False, header=header)
+                header = False
+
+            # ブロックが1つもない場合は空の DataFrame と同じ内容にする
+            if header:
+                pd.DataFrame().to_csv(f, index=False)
+    except BaseException:
+        # 途中で失敗した場合は書きかけの一時ファイルを残さない
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, output_path)
+
+
+def export_feature_blocks(blocks: Iterable[pd.DataFrame], output_path: str):
+    """
+    特徴量の DataFrame を1ブロックずつ出力する
+
+    output_path の拡張子が .csv の場合は CSV, それ以外は特徴量ストアに出力する
+
+    Parameters
+    ----------
+    blocks : Iterable[pd.DataFrame]
+        出力する DataFrame (すべて同じ列を持つ)
+    output_path : str
+        出力するファイルのパス
+
+    Returns
+    -------
+    None
+    """
+
+    if output_path.endswith(".csv"):
+        export_csv_blocks(blocks, output_path)
+    else:
+        write_features(blocks, output_path)
+
+
+def preprocess_recording(
+    data_files: dict[str, str],
+    output_path: str,
+    labels: Labels,
+    window_size_frame: int,
+    gap_size_frame: int,
+    use_cache=True,
+    feature_columns: list[str] | None = None,
+) -> str:
+    """
+    1つの収録データを特徴量に変換して出力する
+
+    Parameters
+    ----------
+    data_files : dict
+        データファイルのパス
+    output_path : str
+        出力するファイルのパス
+    labels : Labels
+        ラベル
+    window_size_frame: int
+        ウィンドウサイズ
+    gap_size_frame: int
+        ウィンドウの間隔
+    use_cache : bool
+        パース済みモーションのキャッシュを使うかどうか
+    feature_columns : list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
+
+    Returns
+    -------
+    output_path : str
+        出力したファイルのパス
+    """
+
+    with profiling.context(recording=data_files["name"]):
+        df = to_dataframe(data_files, labels, use_cache=use_cache)
+
+        # 特徴量は区間ごとに計算しながら書き出すため, 書き出しの時間を含む
+        with profiling.stage(
+            "feature_extraction",
+            rows=len(df),
+            segment_w=window_size_frame,
+            segment_gap=gap_size_frame,
+        ):
+            blocks = iter_feature_blocks(
+                df, window_size_frame, gap_size_frame, feature_columns
+            )
+            export_feature_blocks(blocks, output_path)
+
+    return output_path
+
+
+def preprocess_recording_multi(
+    data_files: dict[str, str],
+    output_paths: dict[tuple[int, int], str],
+    labels: Labels,
+    use_cache=True,
+    feature_columns: list[str] | None = None,
+) -> dict[tuple[int, int], str]:
+    """
+    1つの収録データを複数のウィンドウサイズ・間隔の特徴量に変換して出力する
+
+    モーションの読み込みと累積和の計算は1回だけ行う.
+    出力は特徴量ストアの形式
+
+    Parameters
+    ----------
+    data_files : dict
+        データファイルのパス
+    output_paths : dict[tuple[int, int], str]
+        (ウィンドウサイズ, ウィンドウの間隔) ごとの出力するファイルのパス
+    labels : Labels
+        ラベル
+    use_cache : bool
+        パース済みモーションのキャッシュを使うかどうか
+    feature_columns : list[str], optional
+        計算する特徴量の列. None の場合はすべての特徴量
+
+    Returns
+    -------
+    output_paths : dict[tuple[int, int], str]
+        出力したファイルのパス
+    """
+
+    with profiling.context(recording=data_files["name"]):
+        df = to_dataframe(data_files, labels, use_cache=use_cache)
+
+        with ExitStack() as stack:
+            writers = {}
+            for window, output_path in output_paths.items():
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                writers[window] = stack.enter_context(FeatureStoreWriter(output_path))
+
+            with profiling.stage("feature_extraction", rows=len(df)):
+                for blocks in iter_multi_window_feature_blocks(
+                    df, list(output_paths), feature_columns
+                ):
+                    for window, block in blocks.items():
+                        writers[window].append(block)
+
+            # 特徴量ストアを列優先に並べ替えて書き出す
+            with profiling.stage("write_features", rows=len(df)):
+                stack.close()
+
+    return output_paths
+
+
 def main():
     labels = Labels(
         os.path.join(INPUT_DIR, "labels.csv"),
@@ -360,27 +763,43 @@ def main():
         #     ],
         # },
     )
-    data_files_list = get_data_files(INPUT_DIR)
+    data_files_list = get_data_files(INPUT_DIR, min_frames=MIN_FRAMES)
 
-    for i, data_files in enumerate(data_files_list):
+    if REPORT:
+        report_data_files(data_files_list)
+        return
+
+    feature_columns = None
+    if FEATURE_SUBSET_PATH is not None:
+        feature_columns = load_feature_subset(FEATURE_SUBSET_PATH)
+
+    output_paths = [
+        os.path.join(
+            OUTPUT_DIR, data_files["name"], f"output{EXPORT_SUFFIXES[EXPORT_FORMAT]}"
+        )
+        for data_files in data_files_list
+    ]
+    workers, threads = split_threads(WORKERS)
+
+    results = ordered_map(
+        partial(
+            preprocess_recording,
+            labels=labels,
+            window_size_frame=240,
+            gap_size_frame=1,
+            use_cache=USE_CACHE,
+            feature_columns=feature_columns,
+        ),
+        data_files_list,
+        output_paths,
+        workers=workers,
+        threads=threads,
+    )
+    for i, (data_files, output_path) in enumerate(zip(data_files_list, results)):
         print(f"\n--- [{i + 1}/{len(data_files_list)}] {data_files['name']} ---")
         print(f"- label: {data_files['label']}")
         print(f"- motion: {data_files['motion']}")
-
-        df = to_dataframe(data_files, labels)
-        grouped_df_list = split_motion_by_label(df, labels)
-
-        train_df = pd.DataFrame()
-        for i, grouped_df in enumerate(grouped_df_list):
-            print(f"> to feature values: {i+1}/{len(grouped_df_list)}")
-            feature_values_df = segment_and_extract_feature(
-                grouped_df, window_size_frame=240, gap_size_frame=1
-            )
-            train_df = pd.concat([train_df, feature_values_df])
-
-        output_path = os.path.join(OUTPUT_DIR, data_files["name"], "output.csv")
         print(f">> Export: {output_path}")
-        export_csv(train_df, output_path)
 
 
 def remove_output_dir():
@@ -390,6 +809,38 @@ def remove_output_dir():
 
 
 if __name__ == "__main__":
-    if PICK_DIR is None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--key", type=str, default=KEY)
+    parser.add_argument("--pick", type=str)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(EXPORT_SUFFIXES),
+        default=EXPORT_FORMAT,
+        help="出力形式 (npy: 特徴量ストア, csv: CSV. どちらも train.py で読み込める)",
+    )
+    parser.add_argument("--min-frames", type=int, default=MIN_FRAMES)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--report", action="store_true")
+    parser.add_argument("--features", type=str)
+    parser.add_argument("--profile-log", type=str)
+    parser.add_argument("--profile-stage", type=str)
+    args = parser.parse_args()
+
+    KEY = args.key
+    PICK_DIR = args.pick
+    WORKERS = args.workers
+    EXPORT_FORMAT = args.format
+    MIN_FRAMES = args.min_frames
+    USE_CACHE = not args.no_cache
+    REPORT = args.report
+    FEATURE_SUBSET_PATH = args.features
+    INPUT_DIR = os.path.join("./data/input/", KEY)
+    OUTPUT_DIR = os.path.join("./data/output/", KEY)
+
+    profiling.configure(args.profile_log, args.profile_stage)
+    if PICK_DIR is None and not REPORT:
         remove_output_dir()
-    main()
+    with profiling.stage("preprocess"):
+        main()
@@ -0,0 +1,20 @@
+import os
+
+import pytest
+
+from benchmarks.synthetic import generate_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    # get_data_files で読み込める小さな合成データ (収録 3 つ)
+    input_dir = tmp_path_factory.mktemp("synthetic")
+    generate_dataset(
+        str(input_dir),
+        count=3,
+        frames=1500,
+        labels_path=os.path.join(ROOT, "data/input/each_process/labels.csv"),
+    )
+    return str(input_dir)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_recording
+from modules.common.bvh import parse_bvh, to_motion_df
+
+# ルートだけが位置を持ち, End Site を含む小さな BVH
+SMALL_BVH = """HIERARCHY
+ROOT Hips
+{
+  OFFSET 0.0 0.0 0.0
+  CHANNELS 6 Xposition Yposition Zposition Zrotation Xrotation Yrotation
+  JOINT Spine
+  {
+    OFFSET 0.0 10.0 0.0
+    CHANNELS 3 Zrotation Xrotation Yrotation
+    JOINT Head
+    {
+      OFFSET 0.0 5.0 0.0
+      CHANNELS 3 Zrotation Xrotation Yrotation
+      End Site
+      {
+        OFFSET 0.0 2.0 0.0
+      }
+    }
+  }
+  JOINT LeftLeg
+  {
+    OFFSET 3.0 -1.0 0.0
+    CHANNELS 3 Zrotation Xrotation Yrotation
+    End Site
+    {
+      OFFSET 0.0 -8.0 0.0
+    }
+  }
+}
+MOTION
+Frames: 4
+Frame Time: 0.0083333
+0.1 90.5 -3.25 1 2 3 4 5 6 7 8 9 10 11 12
+0.2 90.6 -3.5 -1 -2 -3 -4 -5 -6 -7 -8 -9 -10 -11 -12
+1e-3 90.7 -3.75 0 0 0 0 0 0 0 0 0 0 0 0
+0.4 90.8 -4 1.5 2.5 3.5 4.5 5.5 6.5 7.5 8.5 9.5 10.5 11.5 12.5
+"""
+
+
+def reference_motion(path):
+    from mcp_persor import BVHparser
+
+    bvhp = BVHparser(path)
+    return bvhp.get_motion_df(), bvhp.frame_time
+
+
+@pytest.fixture(params=["small", "synthetic"])
+def bvh_path(request, tmp_path):
+    if request.param == "small":
+        path = tmp_path / "small.bvh"
+        path.write_text(SMALL_BVH)
+        return str(path)
+
+    write_recording(str(tmp_path / "rec"), frames=300, label_names=["a", "b"])
+    return str(tmp_path / "rec" / "motion.bvh")
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 8192])
+def test_matches_reference_reader(bvh_path, chunk_rows):
+    pytest.importorskip("mcp_persor")
+    expected_df, expected_frame_time = reference_motion(bvh_path)
+
+    values, columns, frame_time = parse_bvh(bvh_path, chunk_rows=chunk_rows)
+    motion_df = to_motion_df(values, columns, frame_time)
+
+    assert list(motion_df.columns) == list(expected_df.columns)
+    assert frame_time == expected_frame_time
+    np.testing.assert_array_equal(
+        motion_df.drop(columns="time").to_numpy(),
+        expected_df.drop(columns="time").to_numpy(dtype=np.float64),
+    )
+    np.testing.assert_allclose(motion_df["time"], expected_df["time"], rtol=1e-12)
+
+
+def test_select_columns(tmp_path):
+    path = tmp_path / "small.bvh"
+    path.write_text(SMALL_BVH)
+
+    values, columns, _ = parse_bvh(
+        str(path), joints=["Hips", "Head"], channels=["Xrotation", "Yposition"]
+    )
+
+    assert columns == ["Hips_Yposition", "Hips_Xrotation", "Head_Xrotation"]
+    np.testing.assert_array_equal(values[:, 0], [90.5, 90.6, 90.7, 90.8])
+    np.testing.assert_array_equal(values[:, 2], [8, -8, 0, 8.5])
+
+
+def test_missing_motion_section(tmp_path):
+    path = tmp_path / "bad.bvh"
+    path.write_text(SMALL_BVH.split("MOTION")[0])
+
+    with pytest.raises(ValueError, match="MOTION"):
+        parse_bvh(str(path))
+
+
+def test_missing_frame_time(tmp_path):
+    path = tmp_path / "bad.bvh"
+    path.write_text(SMALL_BVH.split("Frame Time")[0])
+
+    with pytest.raises(ValueError, match="Frame Time"):
+        parse_bvh(str(path))
+
+
+def test_truncated_frame_row(tmp_path):
+    # 最後の行が途中で切れている
+    path = tmp_path / "truncated.bvh"
+    path.write_text(SMALL_BVH.rstrip("\n")[:-12])
+
+    with pytest.raises(ValueError):
+        parse_bvh(str(path))
+
+
+def test_fewer_frames_than_declared(tmp_path):
+    # 収録の途中で終わったファイルは, 書き込まれたフレームだけを返す
+    path = tmp_path / "short.bvh"
+    path.write_text("\n".join(SMALL_BVH.splitlines()[:-2]) + "\n")
+
+    values, columns, _ = parse_bvh(str(path))
+
+    assert values.shape == (2, len(columns))
+    np.testing.assert_array_equal(values[:, 0], [0.1, 0.2])
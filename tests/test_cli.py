@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_script(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True
+    )
+
+
+@pytest.mark.parametrize(
+    "script, flags, other_flags",
+    [
+        # --key は preprocess.py, train.py だけの引数
+        ("pipeline.py", ["--workers", "2"], ["--key"]),
+        ("pipeline.py", ["--cpus", "4"], ["--key"]),
+        ("preprocess.py", ["--workers", "2"], ["--no-plots"]),
+    ],
+)
+def test_script_parses_its_own_flags(script, flags, other_flags):
+    # 読み込んだ他のスクリプトが引数を解析すると, そのスクリプトの usage が表示される
+    result = run_script(script, *flags, "--help")
+
+    assert result.returncode == 0, result.stderr
+    for flag in flags[::2]:
+        assert flag in result.stdout
+    for flag in other_flags:
+        assert flag not in result.stdout
+
+
+@pytest.mark.parametrize("module", ["pipeline", "preprocess", "train"])
+@pytest.mark.parametrize("flags", [["--workers", "2"], ["--cpus", "4"]])
+def test_import_does_not_parse_arguments(module, flags):
+    result = run_script("-c", f"import {module}", *flags, "--unknown-flag")
+
+    assert result.returncode == 0, result.stderr
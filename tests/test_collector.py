@@ -0,0 +1,33 @@
+import os
+
+import collector
+from modules.estimation.results_store import RESULTS_DB_FILE, ResultsStore
+
+
+def test_main_does_not_create_missing_db(tmp_path, capsys):
+    collector.main(str(tmp_path))
+
+    assert not os.path.exists(tmp_path / RESULTS_DB_FILE)
+    assert "results db not found" in capsys.readouterr().out
+
+
+def test_main_prints_table(tmp_path, capsys):
+    with ResultsStore(str(tmp_path / RESULTS_DB_FILE)) as store:
+        store.write(
+            [
+                {
+                    "model": "xgboost",
+                    "segment_w": 120,
+                    "segment_gap": 10,
+                    "smooth_w": 360,
+                    "fold": "4_5",
+                    "smoothed_accuracy": 0.5,
+                }
+            ]
+        )
+
+    collector.main(str(tmp_path))
+
+    output = capsys.readouterr().out
+    assert "== xgboost ==" in output
+    assert "[0.500]" in output
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn import metrics
+
+from modules.estimation.evaluation import (
+    classification_report,
+    confusion_matrix,
+    evaluate,
+)
+
+NUM_CLASS = 6
+TARGET_NAMES = [f"trick_{i}" for i in range(NUM_CLASS)]
+
+
+def random_labels(seed, absent=()):
+    # absent のクラスは正解にも予測にも現れない. 2 は正解だけ, 3 は予測だけに現れる
+    rng = np.random.default_rng(seed)
+    classes = [c for c in range(NUM_CLASS) if c not in absent]
+    y_true = rng.choice([c for c in classes if c != 3], size=500)
+    pred = np.where(rng.random(500) < 0.6, y_true, rng.choice(classes, size=500))
+    pred[pred == 2] = 3 if 3 in classes else 0
+    return y_true, pred
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("absent", [(), (5,), (0, 4)])
+def test_confusion_matrix_matches_sklearn(seed, absent):
+    y_true, pred = random_labels(seed, absent)
+
+    np.testing.assert_array_equal(
+        confusion_matrix(y_true, pred, NUM_CLASS),
+        metrics.confusion_matrix(y_true, pred, labels=range(NUM_CLASS)),
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("absent", [(), (5,), (0, 4)])
+def test_report_matches_sklearn(seed, absent):
+    y_true, pred = random_labels(seed, absent)
+    # sklearn は正解か予測に現れるクラスだけを表示する
+    present = np.union1d(y_true, pred)
+
+    expected = metrics.classification_report(
+        y_true,
+        pred,
+        target_names=[TARGET_NAMES[i] for i in present],
+        zero_division=0,
+    )
+    assert classification_report(y_true, pred, NUM_CLASS, TARGET_NAMES) == expected
+
+    pred_proba = np.eye(NUM_CLASS)[pred]
+    result = evaluate(pred_proba, y_true, pred=pred)
+    assert result.report(target_names=TARGET_NAMES) == expected
+    assert result.report() == metrics.classification_report(
+        y_true, pred, zero_division=0
+    )
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.common.feature_store import (
+    read_feature_arrays,
+    read_features,
+    read_features_csv,
+    read_schema,
+    write_features,
+)
+from preprocess import export_csv_blocks
+
+
+@pytest.fixture
+def blocks():
+    rng = np.random.default_rng(0)
+    columns = ["a-avg", "b-avg", "a-var", "b-var", "a-max"]
+    return [
+        pd.DataFrame(rng.normal(size=(rows, len(columns))), columns=columns).assign(
+            label=rng.integers(0, 5, size=rows)
+        )
+        for rows in [7, 0, 30, 1]
+    ]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, blocks, mmap):
+    path = str(tmp_path / "x.features")
+    write_features(iter(blocks), path)
+
+    expected = pd.concat(blocks, ignore_index=True)
+    df = read_features(path, mmap=mmap)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+    assert df["label"].dtype == np.int64
+    assert read_schema(path)["rows"] == len(expected)
+
+    values, label, columns = read_feature_arrays(path, mmap=mmap)
+    assert isinstance(values, np.memmap) == mmap
+    assert values.flags.f_contiguous
+    np.testing.assert_array_equal(label, expected["label"])
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        ["b-avg", "a-var", "b-var"],  # 連続する列はビュー
+        ["a-max", "a-avg"],  # 並べ替えた列
+        ["a-var"],
+    ],
+)
+def test_column_subset(tmp_path, blocks, columns):
+    path = str(tmp_path / "x.features")
+    write_features(blocks, path)
+
+    df = read_features(path, columns=columns)
+    expected = pd.concat(blocks, ignore_index=True)[[*columns, "label"]]
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    with pytest.raises(KeyError):
+        read_feature_arrays(path, columns=["unknown"])
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "empty.features")
+    write_features([], path)
+
+    assert read_schema(path)["rows"] == 0
+    assert read_features(path).empty
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_csv_reads_like_store(tmp_path, blocks):
+    store_path = str(tmp_path / "x.features")
+    csv_path = str(tmp_path / "output.csv")
+    write_features(blocks, store_path)
+    export_csv_blocks(blocks, csv_path)
+
+    pd.testing.assert_frame_equal(
+        read_features_csv(csv_path), read_features(store_path)
+    )
+    pd.testing.assert_frame_equal(
+        read_features_csv(csv_path, columns=["a-max", "a-avg"]),
+        read_features(store_path, columns=["a-max", "a-avg"]),
+    )
+
+    empty_path = str(tmp_path / "empty.csv")
+    export_csv_blocks([], empty_path)
+    assert read_features_csv(empty_path).empty
+
+
+def test_train_load_data_reads_store_and_csv(tmp_path, blocks):
+    import train
+
+    write_features(blocks, str(tmp_path / "4" / "output.features"))
+    export_csv_blocks(blocks, str(tmp_path / "5" / "output.csv"))
+    os.makedirs(tmp_path / "6")
+
+    data = train.load_data(str(tmp_path), columns=["a-avg"])
+
+    assert sorted(data) == ["4", "5"]
+    pd.testing.assert_frame_equal(data["4"], data["5"])
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.common.labels import Labels, label_timeline
+
+LABEL_NAMES = ["ねぎを洗う", "ねぎを切る", "卵を割る", "卵をまぜる", "炒める"]
+GROUPS = {"卵": ["卵を割る", "卵をまぜる"]}
+
+
+@pytest.fixture
+def labels_path(tmp_path):
+    path = tmp_path / "labels.csv"
+    # 重複と「不要」は追加されない
+    path.write_text("\n".join(LABEL_NAMES + ["炒める", "不要"]) + "\n")
+    return str(path)
+
+
+def reference_timeline(tricks, labels, frames, frame_rate):
+    # 以前の preprocess.py の実装 (区間ごとに .loc で塗る)
+    df = pd.DataFrame(index=range(frames))
+    df["label"] = labels.other_id()
+    for trick in tricks:
+        start = int(trick["start"] * frame_rate)
+        end = int(trick["end"] * frame_rate)
+        df.loc[start:end, "label"] = labels.id(trick["labels"][0])
+    return df["label"].to_numpy()
+
+
+def test_ids_follow_file_order(labels_path):
+    labels = Labels(labels_path)
+
+    assert list(labels) == ["その他"] + LABEL_NAMES
+    assert labels.other_id() == 0
+    assert [labels.id(name) for name in LABEL_NAMES] == [1, 2, 3, 4, 5]
+    assert labels.id("未知のラベル") == labels.other_id()
+    assert labels.id("不要") == labels.other_id()
+
+
+def test_group_labels_share_the_group_id(labels_path):
+    labels = Labels(labels_path, group_labels=GROUPS)
+
+    # グループはメンバーが最初に現れた位置に1つだけ追加される
+    assert list(labels) == ["その他", "ねぎを洗う", "ねぎを切る", "卵", "炒める"]
+    assert labels.id("卵を割る") == labels.id("卵をまぜる") == labels.id("卵") == 3
+
+
+def test_setitem_updates_index(labels_path):
+    labels = Labels(labels_path)
+    labels[1] = "ねぎを洗い直す"
+
+    assert labels.id("ねぎを洗い直す") == 1
+    assert labels.id("ねぎを洗う") == labels.other_id()
+
+
+@pytest.mark.parametrize("group_labels", [{}, GROUPS])
+def test_ids_match_id(labels_path, group_labels):
+    labels = Labels(labels_path, group_labels=group_labels)
+    names = np.random.default_rng(0).choice(
+        LABEL_NAMES + ["卵", "未知のラベル", "不要"], size=(20, 3)
+    )
+
+    ids = labels.ids(names)
+    assert ids.dtype == np.int64
+    np.testing.assert_array_equal(
+        ids, [[labels.id(name) for name in row] for row in names]
+    )
+    assert labels.ids([]).shape == (0,)
+
+
+def test_later_trick_wins_on_overlap(labels_path):
+    labels = Labels(labels_path)
+    tricks = [
+        {"start": 0.0, "end": 0.5, "labels": ["ねぎを洗う"]},
+        {"start": 0.3, "end": 0.4, "labels": ["炒める"]},
+        {"start": 0.4, "end": 0.6, "labels": ["ねぎを切る"]},
+    ]
+
+    timeline = label_timeline(tricks, labels, 10, 10)
+
+    # end のフレームを含む. 後に書かれた区間が前の区間を上書きする
+    np.testing.assert_array_equal(timeline, [1, 1, 1, 5, 2, 2, 2, 0, 0, 0])
+
+
+def test_out_of_range_and_unknown_tricks(labels_path):
+    labels = Labels(labels_path, group_labels=GROUPS)
+    tricks = [
+        {"start": -1.0, "end": 0.1, "labels": ["卵を割る"]},
+        {"start": 0.5, "end": 3.0, "labels": ["未知のラベル"]},
+        {"start": 0.8, "end": 5.0, "labels": ["炒める"]},
+        {"start": 2.0, "end": 3.0, "labels": ["ねぎを切る"]},
+    ]
+
+    timeline = label_timeline(tricks, labels, 10, 10)
+
+    np.testing.assert_array_equal(timeline, [3, 3, 0, 0, 0, 0, 0, 0, 4, 4])
+    assert len(label_timeline([], labels, 10, 10)) == 10
+
+
+@pytest.mark.parametrize("group_labels", [{}, GROUPS])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_reference(labels_path, group_labels, seed):
+    labels = Labels(labels_path, group_labels=group_labels)
+    rng = np.random.default_rng(seed)
+    frames, frame_rate = 500, 60
+
+    # 重なる区間, 収録の前後にはみ出す区間, 未知のラベルを含む
+    starts = rng.uniform(-1, frames / frame_rate, size=40)
+    tricks = [
+        {
+            "start": float(start),
+            "end": float(start + rng.uniform(0, 2)),
+            "labels": [str(rng.choice(LABEL_NAMES + ["未知のラベル"]))],
+        }
+        for start in starts
+    ]
+
+    np.testing.assert_array_equal(
+        label_timeline(tricks, labels, frames, frame_rate),
+        reference_timeline(tricks, labels, frames, frame_rate),
+    )
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.estimation.model import Model
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(200, 4)), columns=["a", "b", "c", "d"])
+    y = (x["b"] > 0).astype(int)
+    return x, y
+
+
+@pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+def test_subset_selects_dataframe_columns(data):
+    x, y = data
+    model = Model("randomforest", num_class=2, feature_columns=["b", "d"], n_jobs=1)
+    model.fit(x, y)
+
+    np.testing.assert_array_equal(
+        model.predict(x), model.predict(x[["b", "d"]].to_numpy())
+    )
+
+
+def test_subset_rejects_full_array(data):
+    x, y = data
+    model = Model("randomforest", num_class=2, feature_columns=["b", "d"], n_jobs=1)
+    model.fit(x, y)
+
+    with pytest.raises(ValueError):
+        model.predict(x.to_numpy())
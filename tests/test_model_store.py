@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.estimation import model_store
+from modules.estimation.model import Model
+from modules.estimation.model_store import load_estimator, save_estimator
+
+NUM_CLASS = 4
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    x = pd.DataFrame(rng.normal(size=(400, 5)), columns=["a", "b", "c", "d", "e"])
+    y = np.digitize(x["a"] + 0.5 * x["b"], [-0.7, 0, 0.7])
+    return x, y
+
+
+@pytest.fixture(scope="module", params=["randomforest", "xgboost", "lightgbm"])
+def fitted(request, data):
+    x, y = data
+    model = Model(request.param, num_class=NUM_CLASS, n_jobs=1)
+    model.fit(x, y)
+    return model
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_estimator(fitted, data, tmp_path, mmap):
+    x, _ = data
+    estimator = fitted.model
+    files = save_estimator(estimator, fitted.type, str(tmp_path))
+    assert all((tmp_path / file).exists() for file in files)
+
+    meta = {
+        "type": fitted.type,
+        "classes": np.asarray(estimator.classes_).tolist(),
+        "feature_names": list(x.columns),
+    }
+    loaded = load_estimator(str(tmp_path), meta, mmap=mmap, n_jobs=1)
+
+    np.testing.assert_array_equal(loaded.predict(x), estimator.predict(x))
+    np.testing.assert_allclose(
+        loaded.predict_proba(x), estimator.predict_proba(x), rtol=1e-12, atol=1e-15
+    )
+
+
+def test_model_save_and_open(fitted, data, tmp_path):
+    x, _ = data
+    path = str(tmp_path / f"fold{model_store.MODEL_STORE_SUFFIX}")
+    fitted.save(path, labels=["a", "b", "c", "d"])
+
+    opened = Model.open(path, n_jobs=1)
+    expected_pred, expected_proba = fitted.predict_with_proba(x)
+    pred, pred_proba = opened.predict_with_proba(x)
+
+    assert opened.type == fitted.type
+    assert opened.num_class == NUM_CLASS
+    np.testing.assert_array_equal(pred, expected_pred)
+    np.testing.assert_allclose(pred_proba, expected_proba, rtol=1e-12, atol=1e-15)
+
+
+def test_forest_matches_predict_proba_exactly(data, tmp_path):
+    x, y = data
+    model = Model("randomforest", num_class=NUM_CLASS, n_jobs=1)
+    model.fit(x, y)
+    model_store._save_forest(model.model, str(tmp_path))
+
+    forest = model_store.NativeForest(str(tmp_path), list(x.columns))
+    np.testing.assert_array_equal(forest.predict_proba(x), model.model.predict_proba(x))
+
+
+def test_leaf_counts_are_normalized(data, monkeypatch):
+    # sklearn 1.4 より前の tree_.value (サンプル数) を再現する
+    x, y = data
+    model = Model("randomforest", num_class=NUM_CLASS, n_jobs=1)
+    model.fit(x, y)
+    tree = model.model.estimators_[0].tree_
+    counts = tree.value[:, 0, :] * tree.weighted_n_node_samples[:, np.newaxis]
+
+    monkeypatch.setattr(model_store, "_tree_value_is_proba", lambda: False)
+    np.testing.assert_allclose(
+        model_store._leaf_proba(counts), tree.value[:, 0, :], rtol=1e-12
+    )
+
+    monkeypatch.setattr(model_store, "_tree_value_is_proba", lambda: True)
+    np.testing.assert_array_equal(
+        model_store._leaf_proba(tree.value[:, 0, :]), tree.value[:, 0, :]
+    )
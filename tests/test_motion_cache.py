@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_recording
+from modules.common import motion_cache
+from modules.common.bvh import parse_bvh, to_motion_df
+
+
+@pytest.fixture
+def motion_path(tmp_path):
+    write_recording(str(tmp_path / "rec"), frames=120, label_names=["a", "b"])
+    return str(tmp_path / "rec" / "motion.bvh")
+
+
+def forbid_parse(monkeypatch):
+    def parse_bvh(path):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(motion_cache, "parse_bvh", parse_bvh)
+
+
+def test_cache_hit_matches_fresh_parse(tmp_path, motion_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    miss_df, miss_frame_time = motion_cache.load_motion_df(motion_path, cache_dir)
+
+    forbid_parse(monkeypatch)
+    hit_df, hit_frame_time = motion_cache.load_motion_df(motion_path, cache_dir)
+
+    pd.testing.assert_frame_equal(hit_df, miss_df)
+    assert hit_frame_time == miss_frame_time
+
+    # キャッシュは float32 で保存する
+    values, columns, frame_time = parse_bvh(motion_path)
+    fresh_df = to_motion_df(values.astype(np.float32), columns, frame_time)
+    pd.testing.assert_frame_equal(hit_df, fresh_df)
+    assert hit_frame_time == frame_time
+
+
+def test_touch_without_change_reuses_entry(tmp_path, motion_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    motion_cache.load_motion(motion_path, cache_dir)
+
+    stat = os.stat(motion_path)
+    os.utime(motion_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    # 更新日時が変わるとハッシュを計算し直すが, 内容が同じならパースしない
+    forbid_parse(monkeypatch)
+    motion_cache.load_motion(motion_path, cache_dir)
+
+
+def replace_first_value(path, new):
+    with open(path) as f:
+        lines = f.read().split("\n")
+    index = lines.index("MOTION") + 3
+    first, rest = lines[index].split(" ", 1)
+    lines[index] = f"{new} {rest}"
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+    return float(first)
+
+
+@pytest.mark.parametrize("same_size", [True, False])
+def test_edit_invalidates_entry(tmp_path, motion_path, same_size):
+    cache_dir = str(tmp_path / "cache")
+    before, _, _ = motion_cache.load_motion(motion_path, cache_dir)
+    before = np.array(before)
+
+    stat = os.stat(motion_path)
+    first = replace_first_value(motion_path, "0.000000" if same_size else "12.5")
+    if same_size:
+        assert os.stat(motion_path).st_size == stat.st_size
+        assert first != 0.0
+    # 同じ時刻に書き換えても更新日時で気付けるようにずらす
+    os.utime(motion_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    after, _, _ = motion_cache.load_motion(motion_path, cache_dir)
+    expected = 0.0 if same_size else 12.5
+    assert after[0, 0] == np.float32(expected)
+    np.testing.assert_array_equal(after[1:], before[1:])
+    assert motion_cache.motion_hash(motion_path, cache_dir) == motion_cache.file_sha1(
+        motion_path
+    )
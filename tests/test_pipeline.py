@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+import pipeline
+from modules.common.labels import Labels
+
+
+class RecordingRenderer:
+    # 描画せずに submit の引数を記録する
+    def __init__(self):
+        self.file_paths = []
+
+    def submit(self, func, *args, file_path=None, **kwargs):
+        self.file_paths.append(file_path)
+
+
+def test_plot_fold_writes_one_file_per_window(tmp_path):
+    labels_path = tmp_path / "labels.csv"
+    labels_path.write_text("a\nb\nc\n")
+    rng = np.random.default_rng(0)
+    pred_proba = rng.dirichlet(np.ones(4), size=3000)
+    y_test = pd.Series(rng.integers(0, 4, size=3000), name="label")
+
+    renderer = RecordingRenderer()
+    pipeline.plot_fold(
+        renderer,
+        "xgboost",
+        120,
+        10,
+        pred_proba,
+        y_test,
+        {60: 6, 360: 36},
+        Labels(str(labels_path)),
+    )
+
+    assert renderer.file_paths == [
+        "./images/xgboost_segmentw120_segmentgap10_smoothw60_top1_top3.png",
+        "./images/xgboost_segmentw120_segmentgap10_smoothw360_top1_top3.png",
+    ]
+
+
+def test_prediction_is_reused_only_for_the_same_features(tmp_path):
+    pred = np.arange(5)
+    pred_proba = np.eye(5)
+    meta = {"feature_columns": None, "data": "a"}
+    pipeline.save_prediction(pred, pred_proba, str(tmp_path), ["4", "5"], meta)
+
+    loaded = pipeline.load_prediction(str(tmp_path), ["4", "5"], meta)
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded[0], pred)
+    np.testing.assert_array_equal(loaded[1], pred_proba)
+
+    subset = {"feature_columns": ["x_avg"], "data": "a"}
+    assert pipeline.load_prediction(str(tmp_path), ["4", "5"], subset) is None
+    changed = {"feature_columns": None, "data": "b"}
+    assert pipeline.load_prediction(str(tmp_path), ["4", "5"], changed) is None
+
+
+def test_feature_subset_has_its_own_feature_dir():
+    full = pipeline.feature_dir(120, 10)
+    subset = pipeline.feature_dir(120, 10, ["x-avg", "y-var"])
+
+    assert subset != full
+    assert subset == pipeline.feature_dir(120, 10, ["x-avg", "y-var"])
+    assert subset != pipeline.feature_dir(120, 10, ["x-avg"])
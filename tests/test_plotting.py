@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from modules.common.plotting import run_lengths
+
+
+def reference_run_lengths(values):
+    # 1つずつ比べて区間に分ける
+    starts, lengths, run_values = [], [], []
+    for i, value in enumerate(values):
+        if i > 0 and value == values[i - 1]:
+            lengths[-1] += 1
+        else:
+            starts.append(i)
+            lengths.append(1)
+            run_values.append(value)
+    return starts, lengths, run_values
+
+
+def test_empty():
+    starts, lengths, run_values = run_lengths(np.array([], dtype=np.int64))
+
+    assert len(starts) == len(lengths) == len(run_values) == 0
+    assert starts.dtype == lengths.dtype == np.int64
+    assert run_values.dtype == np.int64
+
+
+def test_one_run():
+    starts, lengths, run_values = run_lengths([3] * 7)
+
+    np.testing.assert_array_equal(starts, [0])
+    np.testing.assert_array_equal(lengths, [7])
+    np.testing.assert_array_equal(run_values, [3])
+
+
+def test_alternating_values():
+    values = np.tile([1, 2], 5)
+    starts, lengths, run_values = run_lengths(values)
+
+    np.testing.assert_array_equal(starts, np.arange(10))
+    np.testing.assert_array_equal(lengths, np.ones(10))
+    np.testing.assert_array_equal(run_values, values)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    values = np.repeat(rng.integers(0, 4, size=50), rng.integers(1, 6, size=50))
+    starts, lengths, run_values = run_lengths(values)
+
+    expected = reference_run_lengths(values.tolist())
+    np.testing.assert_array_equal(starts, expected[0])
+    np.testing.assert_array_equal(lengths, expected[1])
+    np.testing.assert_array_equal(run_values, expected[2])
+    np.testing.assert_array_equal(np.repeat(run_values, lengths), values)
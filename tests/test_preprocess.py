@@ -0,0 +1,94 @@
+import os
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from modules.common.labels import Labels
+from modules.common.parallel import ordered_map
+from preprocess import export_csv_blocks, get_data_files, preprocess_recording
+
+
+def failing_blocks():
+    yield pd.DataFrame({"a": [1.0, 2.0], "label": [0, 1]})
+    raise RuntimeError("feature extraction failed")
+
+
+def test_export_csv_blocks_removes_partial_file(tmp_path):
+    output_path = str(tmp_path / "out" / "output.csv")
+
+    with pytest.raises(RuntimeError):
+        export_csv_blocks(failing_blocks(), output_path)
+
+    assert os.listdir(tmp_path / "out") == []
+
+
+def test_export_csv_blocks_keeps_previous_output_on_failure(tmp_path):
+    output_path = str(tmp_path / "output.csv")
+    export_csv_blocks([pd.DataFrame({"a": [3.0], "label": [2]})], output_path)
+    with open(output_path) as f:
+        previous = f.read()
+
+    with pytest.raises(RuntimeError):
+        export_csv_blocks(failing_blocks(), output_path)
+
+    assert sorted(os.listdir(tmp_path)) == ["output.csv"]
+    with open(output_path) as f:
+        assert f.read() == previous
+
+
+def test_export_csv_blocks_matches_concat(tmp_path):
+    blocks = [
+        pd.DataFrame({"a": [1.5, 2.0], "label": [0, 1]}),
+        pd.DataFrame({"a": [0.25], "label": [2]}),
+    ]
+    output_path = str(tmp_path / "output.csv")
+    export_csv_blocks(blocks, output_path)
+
+    pd.testing.assert_frame_equal(
+        pd.read_csv(output_path), pd.concat(blocks, ignore_index=True)
+    )
+
+
+def read_tree(path):
+    # ディレクトリ内のすべてのファイルの内容 (相対パス -> バイト列)
+    contents = {}
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            with open(file_path, "rb") as f:
+                contents[os.path.relpath(file_path, path)] = f.read()
+    return contents
+
+
+@pytest.mark.parametrize("suffix", [".features", ".csv"])
+def test_workers_give_identical_outputs(synthetic_dir, tmp_path, suffix):
+    labels = Labels(os.path.join(synthetic_dir, "labels.csv"))
+    data_files_list = sorted(get_data_files(synthetic_dir), key=lambda d: d["name"])
+
+    outputs = {}
+    for workers in [1, 2]:
+        output_dir = tmp_path / f"workers{workers}"
+        output_paths = [
+            str(output_dir / f"{data_files['name']}{suffix}")
+            for data_files in data_files_list
+        ]
+        results = ordered_map(
+            partial(
+                preprocess_recording,
+                labels=labels,
+                window_size_frame=60,
+                gap_size_frame=10,
+                use_cache=False,
+            ),
+            data_files_list,
+            output_paths,
+            workers=workers,
+            threads=1,
+        )
+        # 結果は入力と同じ順に返る
+        assert list(results) == output_paths
+        outputs[workers] = read_tree(output_dir)
+
+    assert len(outputs[1]) > 0
+    assert outputs[1] == outputs[2]
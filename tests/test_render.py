@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from modules.common import profiling
+from modules.common.render import RenderQueue
+
+
+def save_figure(file_path):
+    from matplotlib import pyplot as plt
+
+    plt.figure(figsize=(2, 2))
+    plt.plot([0, 1], [1, 0])
+    plt.savefig(file_path)
+
+
+def test_plotting_is_recorded_in_the_render_process(tmp_path, monkeypatch):
+    log_path = tmp_path / "profile.jsonl"
+    monkeypatch.delenv(profiling.PROFILE_STAGE_ENV, raising=False)
+    monkeypatch.setenv(profiling.PROFILE_LOG_ENV, str(log_path))
+
+    with RenderQueue(workers=1) as renderer:
+        with profiling.context(model="xgboost", fold="4_5"):
+            renderer.submit(save_figure, file_path=str(tmp_path / "a.png"))
+
+    records = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [record["stage"] for record in records] == ["plotting"]
+    # submit した時点の context のキーが付き, 描画したプロセスで計測される
+    assert records[0]["model"] == "xgboost"
+    assert records[0]["fold"] == "4_5"
+    assert records[0]["pid"] != os.getpid()
+
+
+def fail_to_render(file_path):
+    raise RuntimeError(f"cannot render {file_path}")
+
+
+def test_files_exist_after_close(tmp_path):
+    renderer = RenderQueue(workers=1)
+    futures = [
+        renderer.submit(save_figure, file_path=str(tmp_path / f"{i}.png"))
+        for i in range(3)
+    ]
+    assert all(future is not None for future in futures)
+
+    renderer.close()
+
+    assert all(future.done() for future in futures)
+    assert sorted(os.listdir(tmp_path)) == ["0.png", "1.png", "2.png"]
+
+
+def test_worker_exception_is_raised_on_close(tmp_path):
+    with pytest.raises(RuntimeError, match="cannot render"):
+        with RenderQueue(workers=1) as renderer:
+            renderer.submit(save_figure, file_path=str(tmp_path / "ok.png"))
+            renderer.submit(fail_to_render, file_path=str(tmp_path / "ng.png"))
+
+    assert os.path.exists(tmp_path / "ok.png")
+    assert not os.path.exists(tmp_path / "ng.png")
+
+
+def test_disabled_queue_does_not_render(tmp_path):
+    with RenderQueue(workers=0) as renderer:
+        assert not renderer.enabled
+        assert renderer.submit(save_figure, file_path=str(tmp_path / "a.png")) is None
+
+    assert os.listdir(tmp_path) == []
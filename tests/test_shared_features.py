@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.common.feature_store import read_features, write_features
+from modules.common.parallel import ordered_map
+from modules.common.shared_features import SharedFeatureMatrix
+
+NAMES = ["10", "11", "12", "13", "4", "5", "6", "7", "8", "9"]
+FOLDS = [["4", "5"], ["6", "7"], ["8", "9"], ["10", "11"], ["12", "13"]]
+COLUMNS = ["a-avg", "b-avg", "a-var"]
+
+
+def write_store(data_dir, name, rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(rows, len(COLUMNS))), columns=COLUMNS)
+    df["label"] = rng.integers(0, 5, size=rows)
+    write_features([df], os.path.join(data_dir, f"{name}.features"))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for i, name in enumerate(NAMES):
+        write_store(str(tmp_path), name, 20 + 7 * i, i)
+    # 行のない収録は読み込まない
+    write_store(str(tmp_path), "14", 0, 99)
+    return str(tmp_path)
+
+
+def expected_frames(data_dir, names):
+    df = pd.concat(
+        [read_features(os.path.join(data_dir, f"{name}.features")) for name in names],
+        ignore_index=True,
+    )
+    return df.drop(columns="label"), df["label"]
+
+
+def split_sums(test_data_names, handle):
+    # ワーカープロセスで共有メモリの行列を開いて分ける
+    matrix = SharedFeatureMatrix.attach(handle)
+    x_train, y_train, x_test, y_test = matrix.split(test_data_names)
+    return (
+        x_train.to_numpy().sum(axis=0),
+        int(y_train.sum()),
+        x_test.to_numpy().sum(axis=0),
+        int(y_test.sum()),
+    )
+
+
+@pytest.mark.parametrize("fold", range(len(FOLDS)))
+def test_fold_split_is_a_view(data_dir, fold):
+    test_data_names = FOLDS[fold]
+    with SharedFeatureMatrix.from_dir(data_dir, folds=FOLDS) as matrix:
+        layout = [name for names in FOLDS for name in names]
+        assert matrix.names == layout
+
+        x_train, y_train, x_test, y_test = matrix.split(test_data_names)
+
+        # 学習データはテストデータより後の収録, 前の収録の順に並ぶ
+        start, stop = 2 * fold, 2 * fold + 2
+        train_names = layout[stop:] + layout[:start]
+        expected_x, expected_y = expected_frames(data_dir, train_names)
+        np.testing.assert_array_equal(x_train.to_numpy(), expected_x.to_numpy())
+        np.testing.assert_array_equal(y_train.to_numpy(), expected_y.to_numpy())
+        assert list(x_train.columns) == COLUMNS
+        assert np.shares_memory(x_train.to_numpy(), matrix._buffer_values)
+        assert np.shares_memory(y_train.to_numpy(), matrix._buffer_label)
+
+        expected_x, expected_y = expected_frames(data_dir, sorted(test_data_names))
+        np.testing.assert_array_equal(x_test.to_numpy(), expected_x.to_numpy())
+        np.testing.assert_array_equal(y_test.to_numpy(), expected_y.to_numpy())
+
+
+def test_split_without_folds_keeps_name_order(data_dir):
+    with SharedFeatureMatrix.from_dir(data_dir) as matrix:
+        assert matrix.names == NAMES
+        x_train, y_train, x_test, y_test = matrix.split(["4", "5"])
+
+        train_names = [name for name in NAMES if name not in ["4", "5"]]
+        expected_x, expected_y = expected_frames(data_dir, train_names)
+        np.testing.assert_array_equal(x_train.to_numpy(), expected_x.to_numpy())
+        np.testing.assert_array_equal(y_train.to_numpy(), expected_y.to_numpy())
+
+        expected_x, _ = expected_frames(data_dir, ["4", "5"])
+        np.testing.assert_array_equal(x_test.to_numpy(), expected_x.to_numpy())
+
+
+def test_split_in_workers(data_dir):
+    with SharedFeatureMatrix.from_dir(data_dir, folds=FOLDS) as matrix:
+        expected = [split_sums(names, matrix.handle) for names in FOLDS]
+        results = ordered_map(
+            split_sums,
+            FOLDS,
+            [matrix.handle] * len(FOLDS),
+            workers=2,
+            threads=1,
+        )
+
+        for result, expected_result in zip(results, expected):
+            np.testing.assert_allclose(result[0], expected_result[0])
+            assert result[1] == expected_result[1]
+            np.testing.assert_allclose(result[2], expected_result[2])
+            assert result[3] == expected_result[3]
+
+
+def test_fingerprint_follows_the_stores(data_dir):
+    with SharedFeatureMatrix.from_dir(data_dir, folds=FOLDS) as matrix:
+        fingerprint = matrix.fingerprint()
+    with SharedFeatureMatrix.from_dir(data_dir, folds=FOLDS) as matrix:
+        assert matrix.fingerprint() == fingerprint
+    with SharedFeatureMatrix.from_dir(data_dir) as matrix:
+        # 並びが変わると学習データの順も変わる
+        assert matrix.fingerprint() != fingerprint
+    with SharedFeatureMatrix.from_dir(data_dir, ["a-avg"], folds=FOLDS) as matrix:
+        assert matrix.fingerprint() != fingerprint
+
+    # 特徴量ストアを書き直すと変わる
+    write_store(data_dir, "6", 34, 1234)
+    with SharedFeatureMatrix.from_dir(data_dir, folds=FOLDS) as matrix:
+        assert matrix.fingerprint() != fingerprint
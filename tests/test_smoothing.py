@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+from modules.estimation.smoothing import (
+    iter_smooth_top_k,
+    smooth_result,
+    smooth_result_batch,
+    smooth_results,
+    smooth_results_batch,
+    smooth_top_k,
+    smooth_top_k_batch,
+)
+
+
+def reference_smooth_result(pred_proba, window_size):
+    # 以前の train.py の実装 (ウィンドウごとに合計する)
+    return np.array(
+        [
+            np.argmax(np.sum(pred_proba[i : i + window_size], axis=0))
+            for i in range(len(pred_proba) - window_size)
+        ]
+    )
+
+
+def reference_smooth_results(pred_proba, window_size):
+    return np.array(
+        [
+            np.argsort(np.sum(pred_proba[i : i + window_size], axis=0))[::-1]
+            for i in range(len(pred_proba) - window_size)
+        ]
+    )
+
+
+def forest_like(n, n_classes, seed=0):
+    # ランダムフォレストのように 1/n_trees 刻みで, 0 と同点が多い確率
+    rng = np.random.default_rng(seed)
+    votes = rng.multinomial(100, rng.dirichlet(np.full(n_classes, 0.1), size=n))
+    return votes / 100
+
+
+def dense(n, n_classes, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(n_classes), size=n)
+
+
+@pytest.fixture(params=["forest_like", "dense"])
+def pred_proba(request):
+    return {"forest_like": forest_like, "dense": dense}[request.param](3000, 12)
+
+
+@pytest.mark.parametrize("window_size", [1, 2, 7, 60, 500])
+def test_matches_reference(pred_proba, window_size):
+    np.testing.assert_array_equal(
+        smooth_result(pred_proba, window_size),
+        reference_smooth_result(pred_proba, window_size),
+    )
+    np.testing.assert_array_equal(
+        smooth_results(pred_proba, window_size),
+        reference_smooth_results(pred_proba, window_size),
+    )
+
+
+def test_batch_matches_reference(pred_proba):
+    window_sizes = [3, 40, 200]
+    result = smooth_result_batch(pred_proba, window_sizes)
+    results = smooth_results_batch(pred_proba, window_sizes)
+    for window_size in window_sizes:
+        np.testing.assert_array_equal(
+            result[window_size], reference_smooth_result(pred_proba, window_size)
+        )
+        np.testing.assert_array_equal(
+            results[window_size], reference_smooth_results(pred_proba, window_size)
+        )
+
+
+def test_negative_values_match_reference():
+    pred_proba = np.random.default_rng(1).normal(size=(1000, 5))
+    for window_size in [1, 9, 100]:
+        np.testing.assert_array_equal(
+            smooth_results(pred_proba, window_size),
+            reference_smooth_results(pred_proba, window_size),
+        )
+
+
+@pytest.mark.parametrize("window_size", [1, 7, 60])
+@pytest.mark.parametrize("k", [1, 3, 12])
+def test_top_k_matches_ranking(pred_proba, window_size, k):
+    # 同点の順も smooth_results と同じになる
+    expected = reference_smooth_results(pred_proba, window_size)[:, :k]
+    np.testing.assert_array_equal(smooth_top_k(pred_proba, window_size, k), expected)
+    np.testing.assert_array_equal(
+        np.concatenate(list(iter_smooth_top_k(pred_proba, window_size, k, 700))),
+        expected,
+    )
+    np.testing.assert_array_equal(
+        smooth_top_k_batch(pred_proba, [window_size], k)[window_size], expected
+    )
+
+
+@pytest.mark.parametrize("negative", [False, True])
+def test_zero_window_matches_reference(negative):
+    pred_proba = forest_like(50, 6)
+    if negative:
+        pred_proba = pred_proba - 0.5
+
+    expected = reference_smooth_results(pred_proba, 0)
+    assert expected.shape == (50, 6)
+    np.testing.assert_array_equal(
+        smooth_result(pred_proba, 0), reference_smooth_result(pred_proba, 0)
+    )
+    np.testing.assert_array_equal(smooth_results(pred_proba, 0), expected)
+    np.testing.assert_array_equal(smooth_top_k(pred_proba, 0, 3), expected[:, :3])
+    np.testing.assert_array_equal(
+        smooth_result_batch(pred_proba, [0])[0], reference_smooth_result(pred_proba, 0)
+    )
+
+
+def test_negative_window_raises():
+    pred_proba = forest_like(50, 6)
+    for smooth in [smooth_result, smooth_results]:
+        with pytest.raises(ValueError):
+            smooth(pred_proba, -1)
+    with pytest.raises(ValueError):
+        smooth_top_k(pred_proba, -1, 3)
@@ -0,0 +1,206 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_recording
+from modules.common.bvh import BVHChunkReader, parse_bvh, to_motion_df
+
+from modules.estimation.model import Model
+from modules.estimation.smoothing import smooth_result
+from modules.estimation.streaming import (
+    ChunkedEstimator,
+    OnlineSmoother,
+    StreamingEstimator,
+)
+from modules.feature.streaming import ChunkedWindowFeatures, StreamingWindowFeatures
+from modules.feature.window import extract_window_features
+
+FRAME_TIME = 1 / 60
+NUM_CLASS = 4
+
+
+def random_motion(n_frames, n_channels, seed=0):
+    # オフセットの大きいランダムウォークのモーション
+    rng = np.random.default_rng(seed)
+    offset = 1e3 * rng.normal(size=n_channels)
+    return np.cumsum(rng.normal(size=(n_frames, n_channels)), axis=0) + offset
+
+
+def batch_features(motion, window_size_frame, gap_size_frame):
+    # to_motion_df と同じく先頭に time 列を追加する
+    values = np.column_stack([np.arange(len(motion)) * FRAME_TIME, motion])
+    features, _ = extract_window_features(
+        values, np.zeros(len(motion), dtype=np.int64), window_size_frame, gap_size_frame
+    )
+    return values, features
+
+
+@pytest.mark.parametrize(
+    "window_size_frame, gap_size_frame", [(60, 10), (40, 1), (7, 3), (19, 20), (0, 1)]
+)
+def test_streaming_features_match_batch(window_size_frame, gap_size_frame):
+    values, features = batch_features(
+        random_motion(3000, 5), window_size_frame, gap_size_frame
+    )
+
+    stream = StreamingWindowFeatures(values.shape[1], window_size_frame, gap_size_frame)
+    streamed = [f for f in (stream.push(row) for row in values) if f is not None]
+
+    assert len(streamed) == len(features)
+    np.testing.assert_allclose(
+        np.array(streamed) / np.maximum(np.abs(features), 1),
+        features / np.maximum(np.abs(features), 1),
+        rtol=0,
+        atol=1e-9,
+    )
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    output_dir = tmp_path_factory.mktemp("recording")
+    write_recording(str(output_dir), frames=700, label_names=["a", "b"])
+    return str(output_dir / "motion.bvh")
+
+
+# 61 未満のチャンクではウィンドウ (61 フレーム) が複数のチャンクにまたがる
+@pytest.mark.parametrize("chunk_rows", [1, 7, 60, 61, 250, 10000])
+def test_chunked_features_match_batch(recording, chunk_rows):
+    values, columns, frame_time = parse_bvh(recording)
+    motion_df = to_motion_df(values, columns, frame_time)
+    expected, _ = extract_window_features(
+        motion_df.to_numpy(), np.zeros(len(motion_df), dtype=np.int64), 60, 10
+    )
+
+    with BVHChunkReader(recording, chunk_rows=chunk_rows) as reader:
+        assert reader.columns == columns
+        chunks = list(reader)
+    assert all(0 < len(chunk) <= chunk_rows for chunk in chunks)
+    np.testing.assert_array_equal(np.concatenate(chunks), values)
+
+    features = ChunkedWindowFeatures(60, 10)
+    chunk_features = []
+    offset = 0
+    for chunk in chunks:
+        times = np.arange(offset, offset + len(chunk)) * frame_time
+        offset += len(chunk)
+        chunk_features.append(features.push(np.column_stack([times, chunk])))
+
+    np.testing.assert_allclose(
+        np.concatenate(chunk_features), expected, rtol=1e-12, atol=1e-12
+    )
+
+
+def test_follow_reads_appended_rows_until_idle_timeout(recording, tmp_path):
+    text = open(recording).read()
+    header, rows = text.split("Frame Time:")
+    header_lines, row_lines = rows.split("\n", 1)
+    row_lines = row_lines.splitlines(keepends=True)
+
+    # 収録中のファイル: 後半のフレームは読み始めた後に追記し, 最後の行は改行なしで終わる
+    path = tmp_path / "recording.bvh"
+    path.write_text(
+        header + "Frame Time:" + header_lines + "\n" + "".join(row_lines[:300])
+    )
+
+    def append():
+        with open(path, "a") as f:
+            f.write("".join(row_lines[300:]).rstrip("\n"))
+
+    values, _, _ = parse_bvh(recording)
+    writer = threading.Timer(0.2, append)
+    start = time.monotonic()
+    writer.start()
+    try:
+        with BVHChunkReader(
+            str(path), chunk_rows=64, follow=True, poll_interval=0.01, idle_timeout=0.5
+        ) as reader:
+            chunks = list(reader)
+    finally:
+        writer.join()
+    elapsed = time.monotonic() - start
+
+    np.testing.assert_array_equal(np.concatenate(chunks), values)
+    # 追記が終わってから idle_timeout 秒ほどで終了する
+    assert 0.7 <= elapsed < 5
+
+
+@pytest.mark.parametrize("kind", ["forest_like", "dense", "negative"])
+@pytest.mark.parametrize("window_size", [1, 3, 12, 100])
+def test_online_smoother_matches_smooth_result(kind, window_size):
+    rng = np.random.default_rng(2)
+    if kind == "forest_like":
+        # 1/100 刻みで同点の多い確率
+        votes = rng.multinomial(100, rng.dirichlet(np.full(NUM_CLASS, 0.3), size=5000))
+        pred_proba = votes / 100
+    elif kind == "dense":
+        pred_proba = rng.dirichlet(np.ones(NUM_CLASS), size=5000)
+    else:
+        pred_proba = rng.normal(size=(5000, NUM_CLASS))
+
+    smoother = OnlineSmoother(window_size, NUM_CLASS)
+    smoothed = [smoother.push(p) for p in pred_proba]
+
+    assert smoothed[: window_size - 1] == [None] * (window_size - 1)
+    # smooth_result は最後のウィンドウを含まない
+    np.testing.assert_array_equal(
+        smoothed[window_size - 1 : -1], smooth_result(pred_proba, window_size)
+    )
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    window_size_frame, gap_size_frame = 60, 10
+    motion = random_motion(4000, 6)
+    _, features = batch_features(motion, window_size_frame, gap_size_frame)
+    columns = [f"ch{i}" for i in range(motion.shape[1])]
+
+    model = Model("randomforest", num_class=NUM_CLASS, n_jobs=1)
+    estimator = StreamingEstimator(
+        model, columns, window_size_frame, gap_size_frame, 12, FRAME_TIME, NUM_CLASS
+    )
+    x = pd.DataFrame(features, columns=estimator.feature_columns)
+    labels = (np.arange(len(features)) // 40) % NUM_CLASS
+    model.fit(x, labels)
+    pred, pred_proba = model.predict_with_proba(x)
+
+    return model, columns, motion, pred, pred_proba
+
+
+def test_streaming_estimator_matches_batch(fitted):
+    model, columns, motion, pred, pred_proba = fitted
+    estimator = StreamingEstimator(model, columns, 60, 10, 12, FRAME_TIME, NUM_CLASS)
+
+    stream_pred = []
+    stream_smoothed_pred = []
+    for frame in motion:
+        result = estimator.push(frame)
+        if result is None:
+            continue
+        stream_pred.append(result[0])
+        if result[2] is not None:
+            stream_smoothed_pred.append(result[2])
+
+    smoothed_pred = smooth_result(pred_proba, window_size=12)
+    np.testing.assert_array_equal(stream_pred, pred)
+    # smooth_result は最後のウィンドウを含まない
+    np.testing.assert_array_equal(
+        stream_smoothed_pred[: len(smoothed_pred)], smoothed_pred
+    )
+
+
+def test_chunked_estimator_matches_batch(fitted):
+    model, columns, motion, pred, pred_proba = fitted
+    estimator = ChunkedEstimator(model, columns, 60, 10, 12, FRAME_TIME, NUM_CLASS)
+
+    results = [estimator.push(chunk) for chunk in np.array_split(motion, 37)]
+    chunk_pred = np.concatenate([result[0] for result in results])
+    chunk_smoothed_pred = np.concatenate([result[2] for result in results])
+
+    smoothed_pred = smooth_result(pred_proba, window_size=12)
+    np.testing.assert_array_equal(chunk_pred, pred)
+    np.testing.assert_array_equal(
+        chunk_smoothed_pred[: len(smoothed_pred)], smoothed_pred
+    )
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+from modules.common import threads
+from modules.common.threads import THREAD_ENV_VARS, limit_threads, split_threads
+
+
+@pytest.mark.parametrize("total", [1, 2, 3, 8, 12])
+@pytest.mark.parametrize("workers", [1, 2, 3, 4, 16])
+def test_split_threads_fits_in_cpus(workers, total):
+    n_workers, n_threads = split_threads(workers, total)
+
+    # 希望より多くのプロセスは作らず, コア数を超えるプロセス数は切り詰める
+    assert n_workers == min(workers, total)
+    assert n_threads >= 1
+    assert n_workers * n_threads <= total
+    # 余ったコアが1プロセス分以上残らない
+    assert total - n_workers * n_threads < n_workers
+
+
+def test_split_threads_caps_workers():
+    assert split_threads(16, 4) == (4, 1)
+    assert split_threads(0, 4) == (1, 4)
+    assert split_threads(3, 8) == (3, 2)
+
+
+def test_split_threads_uses_available_cpus(monkeypatch):
+    monkeypatch.setattr(threads, "available_cpus", lambda: 6)
+    assert split_threads(4) == (4, 1)
+    assert split_threads(2) == (2, 3)
+
+
+@pytest.fixture
+def thread_env(monkeypatch):
+    # limit_threads が書き換える環境変数をテスト後に戻す
+    for name in THREAD_ENV_VARS:
+        monkeypatch.setenv(name, "99")
+
+
+def test_limit_threads_sets_env_vars(thread_env, monkeypatch):
+    threadpoolctl = pytest.importorskip("threadpoolctl")
+    calls = []
+    monkeypatch.setattr(
+        threadpoolctl, "threadpool_limits", lambda limits: calls.append(limits)
+    )
+
+    limit_threads(3)
+
+    assert {name: os.environ[name] for name in THREAD_ENV_VARS} == {
+        name: "3" for name in THREAD_ENV_VARS
+    }
+    assert calls == [3]
+
+
+def test_limit_threads_without_threadpoolctl(thread_env, monkeypatch):
+    monkeypatch.setitem(sys.modules, "threadpoolctl", None)
+
+    limit_threads(2)
+
+    assert all(os.environ[name] == "2" for name in THREAD_ENV_VARS)
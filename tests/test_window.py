@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.common.feature_store import read_features
+from modules.common.labels import Labels
+from modules.feature.window import (
+    FEATURE_STATS,
+    FeatureSubset,
+    extract_multi_window_features,
+    extract_window_features,
+    feature_name,
+)
+from preprocess import (
+    get_data_files,
+    get_index_names,
+    preprocess_recording,
+    preprocess_recording_multi,
+    segment_and_extract_feature,
+)
+
+
+def reference_segment_and_extract_feature(
+    df: pd.DataFrame, window_size_frame: int, gap_size_frame: int
+) -> pd.DataFrame:
+    # ベクトル化する前の実装 (ウィンドウごとに pandas で集計する)
+    feature_values_df = pd.DataFrame()
+
+    end = len(df) - window_size_frame
+    for i in range(0, end, gap_size_frame):
+        label_df = df.iloc[i : i + window_size_frame + 1]["label"]
+        part_df = df.iloc[i : i + window_size_frame + 1].drop(columns=["label"])
+        stats = [
+            (part_df.mean(), "pos-avg"),
+            (part_df.var(), "pos-var"),
+            (part_df.std(), "pos-std"),
+            (part_df.max(), "pos-max"),
+            (part_df.min(), "pos-min"),
+        ]
+
+        line = pd.concat([values for values, _ in stats]).to_frame().T
+        line.columns = sum(
+            [get_index_names(values.index, suffix) for values, suffix in stats], []
+        )
+        line["label"] = label_df.mode().iloc[0]
+
+        feature_values_df = pd.concat([feature_values_df, line])
+
+    return feature_values_df
+
+
+@pytest.fixture(scope="module")
+def motion_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n_frames, n_columns = 600, 12
+    df = pd.DataFrame(
+        rng.normal(size=(n_frames, n_columns)) * 50 + 100,
+        columns=[f"joint_{i}_Xrotation" for i in range(n_columns)],
+    )
+    df.insert(0, "time", np.arange(n_frames) / 60)
+    # 区間ごとのラベル (同数のウィンドウでは小さいラベルが選ばれることも確かめる)
+    df["label"] = np.repeat(rng.integers(0, 5, size=n_frames // 20), 20)
+    return df
+
+
+@pytest.mark.parametrize(
+    "window_size_frame, gap_size_frame",
+    [(60, 1), (40, 10), (7, 3), (19, 2), (599, 1), (600, 1), (1000, 2)],
+)
+def test_segment_and_extract_feature_matches_reference(
+    motion_df, window_size_frame, gap_size_frame
+):
+    expected = reference_segment_and_extract_feature(
+        motion_df, window_size_frame, gap_size_frame
+    )
+    actual = segment_and_extract_feature(motion_df, window_size_frame, gap_size_frame)
+
+    if len(expected) == 0:
+        # ウィンドウがグループより長い場合は行がない
+        assert len(actual) == 0
+        return
+
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(
+        actual.drop(columns="label").to_numpy(dtype=np.float64),
+        expected.drop(columns="label").to_numpy(dtype=np.float64),
+        rtol=1e-9,
+        atol=1e-9,
+    )
+    np.testing.assert_array_equal(
+        actual["label"].to_numpy(), expected["label"].to_numpy()
+    )
+    assert actual["label"].dtype == expected["label"].dtype
+
+
+WINDOWS = [(60, 10), (40, 1), (7, 3), (599, 1), (1000, 2)]
+
+
+def test_multi_window_matches_separate_windows(motion_df):
+    values = motion_df.drop(columns="label").to_numpy(dtype=np.float64)
+    label_ids = motion_df["label"].to_numpy()
+
+    multi = extract_multi_window_features(values, label_ids, WINDOWS)
+
+    assert list(multi) == WINDOWS
+    for window, (features, window_labels) in multi.items():
+        expected_features, expected_labels = extract_window_features(
+            values, label_ids, *window
+        )
+        np.testing.assert_array_equal(features, expected_features)
+        np.testing.assert_array_equal(window_labels, expected_labels)
+
+
+def test_multi_window_subset_matches_full_columns(motion_df):
+    value_df = motion_df.drop(columns="label")
+    columns = list(value_df.columns)
+    full_columns = [feature_name(c, stat) for stat in FEATURE_STATS for c in columns]
+    feature_columns = full_columns[5:9] + full_columns[-3:] + full_columns[30:31]
+    subset = FeatureSubset(columns, feature_columns)
+
+    values = value_df.to_numpy(dtype=np.float64)
+    label_ids = motion_df["label"].to_numpy()
+    multi = extract_multi_window_features(values, label_ids, WINDOWS, subset)
+
+    for window, (features, window_labels) in multi.items():
+        full, expected_labels = extract_window_features(values, label_ids, *window)
+        index = [full_columns.index(c) for c in subset.columns]
+        np.testing.assert_allclose(features, full[:, index], rtol=1e-12, atol=0)
+        np.testing.assert_array_equal(window_labels, expected_labels)
+
+
+def test_preprocess_recording_multi_matches_single_window(synthetic_dir, tmp_path):
+    labels = Labels(os.path.join(synthetic_dir, "labels.csv"))
+    data_files = get_data_files(synthetic_dir)[0]
+    windows = [(60, 10), (120, 10), (30, 1)]
+
+    preprocess_recording_multi(
+        data_files,
+        {
+            window: str(tmp_path / f"multi_{window[0]}_{window[1]}")
+            for window in windows
+        },
+        labels,
+        use_cache=False,
+    )
+    for window in windows:
+        path = str(tmp_path / f"single_{window[0]}_{window[1]}")
+        preprocess_recording(data_files, path, labels, *window, use_cache=False)
+
+        pd.testing.assert_frame_equal(
+            read_features(str(tmp_path / f"multi_{window[0]}_{window[1]}")),
+            read_features(path),
+        )
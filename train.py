@@ -4,28 +4,33 @@ import glob
 import shutil
 import numpy as np
 import pandas as pd
-from sklearn.metrics import classification_report
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
 import argparse
-import japanize_matplotlib
-from sklearn.model_selection import train_test_split
 
+from modules.common import profiling
+from modules.common.feature_store import (
+    FEATURE_STORE_SUFFIX,
+    read_features,
+    read_features_csv,
+)
 from modules.common.labels import Labels
+from modules.common.plotting import plot_label_spans, plot_result, pyplot
+from modules.common.render import RenderQueue
+from modules.estimation.evaluation import classification_report, top_k_hits
 from modules.estimation.model import Model, ModelType
+from modules.estimation.smoothing import smooth_result, smooth_results
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--key", type=str, default="default")
-args = parser.parse_args()
-
-KEY = args.key
+# コマンドライン引数 (__main__ で上書きする)
+KEY = "default"
+PLOTS = True
 
 TRAIN_DIR = os.path.join("./data/output/", KEY)
 LABELS_FILE = os.path.join("./data/input/", KEY, "labels.csv")
 MODEL_DIR = os.path.join("./models/", KEY)
 
 
-def load_data(dir: str, filename="output.csv") -> dict[str, pd.DataFrame]:
+def load_data(
+    dir: str, filename=f"output{FEATURE_STORE_SUFFIX}", columns=None
+) -> dict[str, pd.DataFrame]:
     """
     指定したディレクトリ内のデータを読み込む
 
@@ -34,7 +39,10 @@ def load_data(dir: str, filename="output.csv") -> dict[str, pd.DataFrame]:
     dir : str
         データが保存されているディレクトリのパス
     filename : str
-        データのファイル名
+        データのファイル名 (特徴量ストア). ない場合は preprocess --format csv で
+        出力した output.csv を読み込む
+    columns : list[str], optional
+        読み込む特徴量の列. None の場合はすべての列
 
     Returns
     -------
@@ -49,11 +57,19 @@ def load_data(dir: str, filename="output.csv") -> dict[str, pd.DataFrame]:
     for dir in dirs:
         data_name = os.path.basename(dir)
         data_path = os.path.join(dir, filename)
-        try:
-            data[data_name] = pd.read_csv(data_path)
-        except pd.errors.EmptyDataError:
+        csv_path = os.path.join(dir, "output.csv")
+        if os.path.exists(data_path):
+            df = read_features(data_path, columns=columns)
+        elif os.path.exists(csv_path):
+            df = read_features_csv(csv_path, columns=columns)
+        else:
             continue
 
+        if df.empty:
+            continue
+
+        data[data_name] = df
+
     return data
 
 
@@ -101,15 +117,17 @@ def train_and_test(
 
     # 学習
     print(f"train data: {len(x_train)}")
-    clf.fit(x_train, y_train)
+    with profiling.stage("fit", rows=len(x_train)):
+        clf.fit(x_train, y_train)
 
     # テスト
     print(f"test data: {len(x_test)}")
-    pred = clf.predict(x_test)
-    pred_proba = clf.predict_proba(x_test)
+    with profiling.stage("predict", rows=len(x_test)):
+        pred, pred_proba = clf.predict_with_proba(x_test)
 
     # スムージング
-    smoothed_pred_proba = smooth_result(pred_proba, window_size=smooth_window_size)
+    with profiling.stage("smoothing", rows=len(pred_proba)):
+        smoothed_pred_proba = smooth_result(pred_proba, window_size=smooth_window_size)
 
     # 評価
     accuracy = np.mean(pred == y_test)
@@ -117,46 +135,21 @@ def train_and_test(
     return pred, pred_proba, smoothed_pred_proba, accuracy, y_test
 
 
-def smooth_result(pred_proba, window_size=1 * 60):
-    result = []
-
-    for i in range(len(pred_proba) - window_size):
-        part = pred_proba[i : i + window_size]
-        # 縦方向に足す
-        part_sum = np.sum(part, axis=0)
-        # 最大値のインデックスを取得
-        max_index = np.argmax(part_sum)
-        result.append(max_index)
-
-    return np.array(result)
-
-
-def smooth_results(pred_proba: np.ndarray, window_size=1 * 60):
-    result: list[list[int]] = []
-
-    for i in range(len(pred_proba) - window_size):
-        part = pred_proba[i : i + window_size]
-        # 縦方向に足す
-        part_sum = np.sum(part, axis=0)
-        # 大きい順に追加
-        result.append(list(np.argsort(part_sum)[::-1]))
-
-    return np.array(result)
-
-
 def print_classification_report(y_test, pred):
-    print(classification_report(y_test, pred, zero_division=0))
+    print(classification_report(y_test, pred))
 
 
 def print_top_k_precision(y_true, pred_proba, k=3):
-    top_k_preds = np.argsort(pred_proba, axis=1)[:, -k:]
-    correct_preds = np.array([y_true[i] in top_k_preds[i] for i in range(len(y_true))])
+    correct_preds = top_k_hits(pred_proba, y_true, [k])[k]
     print(f"top-{k} precision: {np.mean(correct_preds)}")
 
 
 def plot_color_map(labels: Labels, filename="color_map.png"):
+    import matplotlib.patches as mpatches
+
     color_dict = labels.color_dict()
 
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(8, 8))
     ax.set_xlim(0, 1)
     ax.set_ylim(0, len(color_dict))
@@ -172,48 +165,28 @@ def plot_color_map(labels: Labels, filename="color_map.png"):
     plt.savefig(filename)
 
 
-def plot_result(y_test, pred: np.ndarray, labels: Labels, file_path="result.png"):
-    plt.figure(figsize=(10, 3))
-    plt.xlim(0, len(y_test))
-    plt.ylim(0, 1)
-
-    for i, label_id in enumerate(y_test):
-        # y_testに合わせて背景色を設定
-        plt.axvspan(i, i + 1, 0.5, 1, color=labels.color_by_id(label_id), alpha=0.5)
-
-    # 予測結果をプロット
-    for i, label_id in enumerate(pred):
-        plt.axvspan(i, i + 1, 0, 0.5, color=labels.color_by_id(label_id))
-
-    print(f"export: {file_path}")
-    plt.savefig(file_path)
-
-
 def plot_result_top_k(y_test, pred_proba, labels: Labels, k=3, filename="result.png"):
     top_k_preds = np.argsort(pred_proba, axis=1)[:, -k:]
 
+    plt = pyplot()
     plt.figure(figsize=(10, 3))
     plt.xlim(0, len(y_test))
     plt.ylim(0, 1)
 
     split_range = 1 / (k + 1)
 
-    for i, label_id in enumerate(y_test):
-        # y_testに合わせて背景色を設定
-        plt.axvspan(
-            i, i + 1, 0, split_range, color=labels.color_by_id(label_id), alpha=0.5
-        )
+    # y_testに合わせて背景色を設定
+    plot_label_spans(plt.gca(), y_test, labels, 0, split_range, alpha=0.5)
 
     # 予測結果をプロット
     for i in range(k):
-        for j, label_id in enumerate(top_k_preds[:, i]):
-            plt.axvspan(
-                j,
-                j + 1,
-                split_range * (i + 1),
-                split_range * (i + 2),
-                color=labels.color_by_id(label_id),
-            )
+        plot_label_spans(
+            plt.gca(),
+            top_k_preds[:, i],
+            labels,
+            split_range * (i + 1),
+            split_range * (i + 2),
+        )
 
     print(f"export: {filename}")
     plt.savefig(filename)
@@ -221,36 +194,44 @@ def plot_result_top_k(y_test, pred_proba, labels: Labels, k=3, filename="result.
 
 def main():
     labels = Labels(LABELS_FILE)
-    data = load_data(TRAIN_DIR)
-
-    print(f"--- COLOR MAP ---")
-    plot_color_map(labels, filename=f"zzz/{KEY}color_map.png")
-    color_dict = labels.color_dict()
-    for label, color in color_dict.items():
-        print(f"- {label}: {color}")
-
-    # model_types = ["randomforest"]
-    model_types = ["randomforest", "xgboost", "lightgbm"]
-    for i, model_type in enumerate(model_types):
-        print(f"--- {model_type}[{i+1}/{len(model_types)}] ---")
-        data_name = "4"
-
-        pred, pred_proba, smoothed_pred_proba, accuracy, y_test = train_and_test(
-            data, labels, model_type, data_name
-        )
-        print(f"accuracy: {accuracy}")
-        plot_result(
-            y_test,
-            pred,
-            labels,
-            filename=f"zzz/{KEY}/result_{model_type}_{data_name}.png",
-        )
-        plot_result(
-            y_test,
-            smoothed_pred_proba,
-            labels,
-            filename=f"zzz/{KEY}/smoothed_result_{model_type}_{data_name}.png",
-        )
+    with profiling.stage("load_features") as record:
+        data = load_data(TRAIN_DIR)
+        record["rows"] = sum(len(df) for df in data.values())
+
+    # 図は学習と並行してバックグラウンドで描画する
+    with RenderQueue(workers=1 if PLOTS else 0) as renderer:
+        print(f"--- COLOR MAP ---")
+        renderer.submit(plot_color_map, labels, filename=f"zzz/{KEY}color_map.png")
+        color_dict = labels.color_dict()
+        for label, color in color_dict.items():
+            print(f"- {label}: {color}")
+
+        # model_types = ["randomforest"]
+        model_types = ["randomforest", "xgboost", "lightgbm"]
+        for i, model_type in enumerate(model_types):
+            print(f"--- {model_type}[{i+1}/{len(model_types)}] ---")
+            data_name = "4"
+
+            with profiling.context(model=model_type, fold=data_name):
+                pred, pred_proba, smoothed_pred_proba, accuracy, y_test = (
+                    train_and_test(data, labels, model_type, data_name)
+                )
+                print(f"accuracy: {accuracy}")
+                # 描画の時間は renderer のプロセスで plotting として計測する
+                renderer.submit(
+                    plot_result,
+                    np.asarray(y_test),
+                    pred,
+                    labels,
+                    file_path=f"zzz/{KEY}/result_{model_type}_{data_name}.png",
+                )
+                renderer.submit(
+                    plot_result,
+                    np.asarray(y_test),
+                    smoothed_pred_proba,
+                    labels,
+                    file_path=f"zzz/{KEY}/smoothed_result_{model_type}_{data_name}.png",
+                )
 
 
 def remove_output_dir():
@@ -260,5 +241,20 @@ def remove_output_dir():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--key", type=str, default=KEY)
+    parser.add_argument("--profile-log", type=str)
+    parser.add_argument("--profile-stage", type=str)
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    KEY = args.key
+    PLOTS = not args.no_plots
+    TRAIN_DIR = os.path.join("./data/output/", KEY)
+    LABELS_FILE = os.path.join("./data/input/", KEY, "labels.csv")
+    MODEL_DIR = os.path.join("./models/", KEY)
+
+    profiling.configure(args.profile_log, args.profile_stage)
     remove_output_dir()
-    main()
+    with profiling.stage("train"):
+        main()